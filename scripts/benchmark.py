@@ -0,0 +1,362 @@
+"""
+Benchmarks hors ligne des chemins critiques du RAG
+Exécuter: python scripts/benchmark.py [--only search,chat] [--sizes 1000,10000] [--write-baseline]
+
+Un serveur Ollama factice (scripts/stub_ollama.py) remplace Ollama: aucun
+accès réseau ni modèle n'est nécessaire. Les résultats sont écrits en JSON
+puis comparés à une référence; le code de sortie vaut 1 en cas de
+régression au-delà de la tolérance.
+
+Les temps dépendent de la machine: aucune référence n'est versionnée. En
+CI, la référence est produite dans le même job sur la branche de base
+(--write-baseline), puis la branche testée y est comparée (voir README).
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import contextlib
+from datetime import datetime
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent))
+
+from stub_ollama import StubConfig, start_stub_server
+
+BENCHMARKS = ('splitter', 'loader', 'embed', 'search', 'chat')
+DEFAULT_OUTPUT = './data/benchmarks/latest.json'
+DEFAULT_BASELINE = './data/benchmarks/baseline.json'
+# Paramètres qui doivent être identiques pour comparer deux exécutions
+COMPARABLE_ARGS = ('sizes', 'dimension', 'queries', 'corpus_mb', 'loader_files', 'embed_texts',
+                   'chat_requests', 'embed_latency', 'embed_latency_per_text', 'generate_latency', 'token_latency')
+
+def metric(value: float, unit: str, better: str = 'lower') -> dict:
+    return {"value": round(value, 6), "unit": unit, "better": better}
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+@contextlib.contextmanager
+def quiet():
+    """Masquer les print du code mesuré (l'affichage fausserait les temps)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def raw_texts(data_dir: str) -> list:
+    texts = [path.read_text(encoding='utf-8') for path in sorted(Path(data_dir).glob("*.txt"))]
+    if not texts:
+        raise SystemExit(f"❌ Aucun fichier .txt dans {data_dir} (corpus des benchmarks)")
+    return texts
+
+def synthetic_texts(data_dir: str, count: int, words: int = 60) -> list:
+    """Textes de la taille d'un chunk, tirés du vocabulaire du corpus (déterministes)"""
+    import numpy as np
+
+    vocabulary = sorted({word for text in raw_texts(data_dir) for word in text.split()})
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(vocabulary), size=(count, words))
+    return [" ".join(vocabulary[i] for i in row) for row in picks]
+
+# ==========================================
+# BENCHMARKS
+# ==========================================
+
+def bench_splitter(args) -> dict:
+    from src.rag import Document, TextSplitter
+
+    texts = raw_texts(args.data_dir)
+    documents = []
+    size = 0
+    while size < args.corpus_mb * 1_000_000:
+        for text in texts:
+            documents.append(Document(text, {"source": f"doc_{len(documents)}.txt"}))
+            size += len(text.encode('utf-8'))
+
+    results = {}
+    for mode in ('structured', 'fixed'):
+        with quiet():
+            splitter = TextSplitter(mode=mode)
+            start = time.perf_counter()
+            chunks = splitter.split_documents(documents)
+            elapsed = time.perf_counter() - start
+        results[f"splitter_{mode}_mb_per_s"] = metric(size / 1_000_000 / elapsed, "MB/s", 'higher')
+        results[f"splitter_{mode}_chunks_per_s"] = metric(len(chunks) / elapsed, "chunks/s", 'higher')
+    return results
+
+def bench_loader(args) -> dict:
+    from src.rag import DocumentLoader
+
+    sources = sorted(Path(args.data_dir).glob("*.txt")) + sorted(Path(args.data_dir).glob("*.pdf"))
+    directory = tempfile.mkdtemp(prefix="bench_loader_")
+    try:
+        size = 0
+        for i in range(args.loader_files):
+            source = sources[i % len(sources)]
+            target = Path(directory) / f"{i:05d}_{source.name}"
+            shutil.copyfile(source, target)
+            size += target.stat().st_size
+
+        files = DocumentLoader.list_files(directory)
+        start = time.perf_counter()
+        results = list(DocumentLoader.iter_load(files))
+        elapsed = time.perf_counter() - start
+        errors = [result for result in results if not result.ok]
+        if errors:
+            print(f"⚠️ {len(errors)} fichiers en erreur pendant le benchmark du loader")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "loader_files_per_s": metric(len(files) / elapsed, "files/s", 'higher'),
+        "loader_mb_per_s": metric(size / 1_000_000 / elapsed, "MB/s", 'higher'),
+    }
+
+def bench_embed(args) -> dict:
+    from src.rag import OllamaEmbeddings
+
+    texts = synthetic_texts(args.data_dir, args.embed_texts)
+    with quiet():
+        embeddings = OllamaEmbeddings()
+        start = time.perf_counter()
+        vectors = embeddings.embed_documents(texts)
+        elapsed = time.perf_counter() - start
+    assert len(vectors) == len(texts)
+    return {"embed_documents_texts_per_s": metric(len(texts) / elapsed, "texts/s", 'higher')}
+
+def bench_search(args) -> dict:
+    import numpy as np
+    from src.rag import Document, OllamaEmbeddings, FAISSVectorStore
+
+    with quiet():
+        embedding_function = OllamaEmbeddings()
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((args.queries, args.dimension)).astype('float32')
+    query_texts = synthetic_texts(args.data_dir, args.queries, words=8)
+    results = {}
+
+    for size in args.sizes:
+        vectors = rng.standard_normal((size, args.dimension)).astype('float32')
+        documents = [
+            Document(text, {"source": f"doc_{i // 20}.txt", "page": i % 20 + 1})
+            for i, text in enumerate(synthetic_texts(args.data_dir, size))
+        ]
+
+        with quiet():
+            store = FAISSVectorStore(embedding_function, dimension=args.dimension)
+            start = time.perf_counter()
+            store.add_documents(documents, vectors)
+            results[f"index_build_{size}_s"] = metric(time.perf_counter() - start, "s")
+
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                store.similarity_search("", k=5, query_embedding=query)
+                latencies.append((time.perf_counter() - start) * 1000)
+            results[f"similarity_search_{size}_p50_ms"] = metric(percentile(latencies, 0.5), "ms")
+            results[f"similarity_search_{size}_p95_ms"] = metric(percentile(latencies, 0.95), "ms")
+
+            latencies = []
+            for text in query_texts:
+                start = time.perf_counter()
+                store.lexical_search(text, k=5)
+                latencies.append((time.perf_counter() - start) * 1000)
+            results[f"lexical_search_{size}_p50_ms"] = metric(percentile(latencies, 0.5), "ms")
+
+            directory = tempfile.mkdtemp(prefix="bench_store_")
+            try:
+                start = time.perf_counter()
+                store.save(directory)
+                results[f"save_{size}_s"] = metric(time.perf_counter() - start, "s")
+
+                loaded = FAISSVectorStore(embedding_function, dimension=args.dimension)
+                start = time.perf_counter()
+                loaded.load(directory)
+                results[f"load_{size}_s"] = metric(time.perf_counter() - start, "s")
+                del loaded
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+        del store, documents, vectors
+        print(f"   {size} chunks: p50 {results[f'similarity_search_{size}_p50_ms']['value']:.3f} ms")
+    return results
+
+def bench_chat(args) -> dict:
+    import httpx
+    from src.rag import OllamaEmbeddings, TextSplitter, FAISSVectorStore, Retriever, Document
+    from src.api.main import app
+    from src.api.routes import initialize_rag_system
+
+    with quiet():
+        embedding_function = OllamaEmbeddings()
+        store = FAISSVectorStore(embedding_function, dimension=args.dimension)
+        documents = [
+            Document(text, {"source": f"doc_{i}.txt"})
+            for i, text in enumerate(raw_texts(args.data_dir))
+        ]
+        store.add_documents(TextSplitter().split_documents(documents))
+        initialize_rag_system(store, Retriever(store))
+
+    questions = [f"Quelles sont les conditions d'admission ? ({i})" for i in range(args.chat_requests)]
+
+    async def run() -> dict:
+        latencies, stream_latencies = [], []
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                for question in questions:
+                    start = time.perf_counter()
+                    response = await client.post("/api/chat/", json={"message": question})
+                    response.raise_for_status()
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+                # ASGITransport rend la réponse une fois complète: on mesure
+                # tout le flux SSE, pas le premier token
+                for question in questions:
+                    start = time.perf_counter()
+                    response = await client.post("/api/chat/", json={"message": question, "stream": True})
+                    response.raise_for_status()
+                    if "event: done" not in response.text:
+                        raise RuntimeError(f"Flux SSE incomplet: {response.text[-200:]}")
+                    stream_latencies.append((time.perf_counter() - start) * 1000)
+        return {
+            "chat_p50_ms": metric(percentile(latencies, 0.5), "ms"),
+            "chat_p95_ms": metric(percentile(latencies, 0.95), "ms"),
+            "chat_stream_p50_ms": metric(percentile(stream_latencies, 0.5), "ms"),
+        }
+
+    with quiet():
+        return asyncio.run(run())
+
+# ==========================================
+# COMPARAISON
+# ==========================================
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Afficher l'écart à la référence; retourne les métriques en régression"""
+    base_args = baseline.get("args", {})
+    current_args = results.get("args", {})
+    different = [key for key in COMPARABLE_ARGS if base_args.get(key) != current_args.get(key)]
+    if different:
+        print(f"⚠️ Paramètres différents de la référence ({', '.join(different)}): comparaison indicative")
+
+    regressions = []
+    print(f"\n{'métrique':<42}{'référence':>14}{'actuel':>14}{'écart':>9}")
+    for name, current in sorted(results["metrics"].items()):
+        reference = baseline.get("metrics", {}).get(name)
+        if reference is None or not reference["value"]:
+            print(f"{name:<42}{'—':>14}{current['value']:>14.4g}")
+            continue
+        ratio = current["value"] / reference["value"]
+        worse = ratio > 1 + tolerance if current["better"] == 'lower' else ratio < 1 - tolerance
+        if worse:
+            regressions.append(name)
+        status = "❌" if worse else "✅"
+        print(f"{name:<42}{reference['value']:>14.4g}{current['value']:>14.4g}{(ratio - 1) * 100:>+8.1f}% {status}")
+    return regressions
+
+def write_json(path: str, payload: dict):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne du RAG (Ollama factice)")
+    parser.add_argument("--only", default=",".join(BENCHMARKS),
+                        help=f"Benchmarks à lancer parmi: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--data-dir", default=os.getenv('DATA_DIR', './data/raw'),
+                        help="Dossier des .txt servant de corpus")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="Tailles d'index (chunks) pour la recherche et save/load")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200, help="Requêtes par taille d'index")
+    parser.add_argument("--corpus-mb", type=float, default=5.0, help="Taille du corpus du splitter")
+    parser.add_argument("--loader-files", type=int, default=300)
+    parser.add_argument("--embed-texts", type=int, default=2000)
+    parser.add_argument("--chat-requests", type=int, default=50)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Latence simulée par requête d'embedding (s)")
+    parser.add_argument("--embed-latency-per-text", type=float, default=0.0, help="Latence simulée par texte (s)")
+    parser.add_argument("--generate-latency", type=float, default=0.0, help="Latence simulée avant le 1er token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Latence simulée par token (s)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Fichier JSON des résultats")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Fichier JSON de référence")
+    parser.add_argument("--write-baseline", "--save-baseline", dest="save_baseline", action="store_true", help="Enregistrer les résultats comme référence")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Écart toléré avant régression (0.25 = 25%%)")
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Benchmarks inconnus: {', '.join(sorted(unknown))}")
+
+    server = start_stub_server(0, StubConfig(
+        dimension=args.dimension,
+        embed_latency=args.embed_latency,
+        embed_latency_per_text=args.embed_latency_per_text,
+        generate_latency=args.generate_latency,
+        token_latency=args.token_latency
+    ))
+    # Avant tout import de src: la configuration est lue à l'import / à la construction
+    os.environ.update({
+        "OLLAMA_BASE_URL": f"http://127.0.0.1:{server.server_address[1]}",
+        "OLLAMA_MODEL": "stub",
+        "OLLAMA_EMBEDDING_MODEL": "stub-embed",
+        "EMBEDDING_CACHE_ENABLED": "false",
+        "ANSWER_CACHE_ENABLED": "false",
+        "CONVERSATION_STORE": "memory",
+    })
+
+    functions = {
+        'splitter': bench_splitter,
+        'loader': bench_loader,
+        'embed': bench_embed,
+        'search': bench_search,
+        'chat': bench_chat,
+    }
+    metrics = {}
+    for name in selected:
+        print(f"⏱️ {name}...")
+        start = time.perf_counter()
+        metrics.update(functions[name](args))
+        print(f"   terminé en {time.perf_counter() - start:.1f}s")
+    server.shutdown()
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "args": {key: value for key, value in vars(args).items() if key in COMPARABLE_ARGS},
+        "metrics": metrics
+    }
+    write_json(args.output, results)
+    print(f"\n💾 Résultats: {args.output}")
+
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"📌 Référence enregistrée: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️ Pas de référence ({args.baseline}): lancer avec --write-baseline pour en créer une")
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} régression(s): {', '.join(regressions)}")
+        sys.exit(1)
+    print("\n✅ Aucune régression")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Évaluer les encodages de l'index (float32, float16, int8, pq) sur le corpus indexé
+Exécuter: python scripts/evaluate_storage.py [--apply int8]
+
+Affiche, pour chaque encodage, la taille par vecteur et le rappel@k par
+rapport à la recherche exacte, avec et sans re-scoring. `--apply` recode
+l'index existant (VECTOR_STORAGE ne s'applique qu'aux nouveaux index).
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+from dotenv import load_dotenv
+
+from src.rag import OllamaEmbeddings, FAISSVectorStore
+from src.rag.index_factory import DEFAULT_PQ_M, STORAGE_MODES
+from src.rag.quantization import evaluate_storage
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description="Évaluer la compression des vecteurs de l'index")
+    parser.add_argument("--index-path", default=os.getenv('VECTOR_DB_PATH', './data/embeddings/faiss_index'),
+                        help="Dossier de l'index FAISS")
+    parser.add_argument("--modes", nargs="+", default=list(STORAGE_MODES), choices=STORAGE_MODES)
+    parser.add_argument("--k", type=int, default=int(os.getenv('RAG_TOP_K', 5)) * 2)
+    parser.add_argument("--queries", type=int, default=200, help="Requêtes tirées du corpus")
+    parser.add_argument("--max-vectors", type=int, default=100_000, help="Échantillon maximal du corpus")
+    parser.add_argument("--rescore-factor", type=int, default=int(os.getenv('VECTOR_RESCORE_FACTOR', 4)))
+    parser.add_argument("--pq-m", type=int, default=int(os.getenv('VECTOR_INDEX_PQ_M', DEFAULT_PQ_M)))
+    parser.add_argument("--json", help="Écrire les résultats dans ce fichier")
+    parser.add_argument("--apply", choices=STORAGE_MODES, help="Recoder l'index avec cet encodage puis sauvegarder")
+    args = parser.parse_args()
+
+    vector_store = FAISSVectorStore(OllamaEmbeddings())
+    vector_store.load(args.index_path)
+    # Lignes des chunks encore présents (hors suppressions non compactées)
+    deleted = np.fromiter(vector_store._tombstones, dtype='int64', count=len(vector_store._tombstones))
+    rows = np.flatnonzero(~np.isin(vector_store.row_ids, deleted))
+    n = len(rows)
+    if n == 0:
+        print("⚠️ Index vide: rien à évaluer")
+        return
+
+    if n > args.max_vectors:
+        rows = np.sort(np.random.default_rng(0).choice(rows, args.max_vectors, replace=False))
+    vectors = vector_store.embeddings.rows(rows)
+
+    print(f"\n📏 Évaluation sur {len(vectors)} vecteurs (dim={vectors.shape[1]}, rappel@{args.k})")
+    results = evaluate_storage(
+        vectors,
+        metric=vector_store.index_spec['metric'],
+        modes=args.modes,
+        k=args.k,
+        n_queries=args.queries,
+        rescore_factor=args.rescore_factor,
+        pq_m=args.pq_m
+    )
+
+    print(f"\n{'stockage':<10}{'octets/vect.':>14}{'compression':>13}{'rappel':>9}{'re-scoré':>10}{'ms/requête':>12}{'index (Mo)':>12}")
+    for row in results:
+        if "skipped" in row:
+            print(f"{row['storage']:<10}  ignoré ({row['skipped']})")
+            continue
+        rescored = f"{row['recall_rescored']:.4f}" if "recall_rescored" in row else "-"
+        print(
+            f"{row['storage']:<10}{row['bytes_per_vector']:>14}{row['compression']:>12}x"
+            f"{row['recall']:>9.4f}{rescored:>10}{row['search_ms']:>12.3f}"
+            f"{n * row['bytes_per_vector'] / 1e6:>12.1f}"
+        )
+    print("\nHors graphe HNSW / listes IVF; 're-scoré': VECTOR_RESCORE=true")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"vectors": len(vectors), "k": args.k, "results": results}, f, indent=2)
+        print(f"💾 Résultats: {args.json}")
+
+    if args.apply:
+        print(f"\n🔁 Recodage de l'index en {args.apply}...")
+        vector_store.set_storage(args.apply)
+        vector_store.save(args.index_path)
+
+if __name__ == "__main__":
+    main()
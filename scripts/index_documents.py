@@ -0,0 +1,50 @@
+"""
+Script d'indexation incrémentale des documents
+Exécuter: python scripts/index_documents.py [--full]
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+from src.rag import OllamaEmbeddings, TextSplitter, FAISSVectorStore
+from src.rag.indexer import Indexer
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexer les documents de l'ENSA")
+    parser.add_argument("--data-dir", default=os.getenv('DATA_DIR', './data/raw'),
+                        help="Dossier des documents sources")
+    parser.add_argument("--index-path", default=os.getenv('VECTOR_DB_PATH', './data/embeddings/faiss_index'),
+                        help="Dossier de l'index FAISS")
+    parser.add_argument("--full", action="store_true",
+                        help="Ré-indexer tous les fichiers, même inchangés")
+    args = parser.parse_args()
+
+    start = time.time()
+    print("\n🔧 Indexation des documents...")
+
+    vector_store = FAISSVectorStore(OllamaEmbeddings())
+    if FAISSVectorStore.exists(args.index_path):
+        vector_store.load(args.index_path)
+
+    indexer = Indexer(vector_store, TextSplitter(), args.data_dir, args.index_path)
+    stats = indexer.run(full=args.full)
+
+    print(
+        f"\n✅ Indexation terminée en {time.time() - start:.1f}s: "
+        f"{stats['added']} ajoutés, {stats['updated']} modifiés, "
+        f"{stats['deleted']} supprimés, {stats['unchanged']} inchangés "
+        f"(+{stats['chunks_added']} / -{stats['chunks_removed']} chunks)"
+    )
+    for error in stats["errors"]:
+        print(f"   ❌ {error['file']}: {error['error']}")
+
+if __name__ == "__main__":
+    main()
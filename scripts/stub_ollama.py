@@ -0,0 +1,169 @@
+"""
+Serveur Ollama factice pour les benchmarks (aucun accès réseau, aucun modèle)
+Exécuter: python scripts/stub_ollama.py [--port 11435] [--embed-latency 0.02]
+
+Endpoints: /api/embed, /api/embeddings, /api/generate, /api/chat, /api/tags.
+Les embeddings sont déterministes (dérivés du hash du texte) et normalisés;
+les latences sont configurables pour simuler un vrai serveur.
+"""
+
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = (
+    "Selon les documents de l'ENSA El Jadida, l'admission au cycle ingénieur "
+    "se fait sur concours après étude du dossier. Contactez le service de "
+    "scolarité pour plus d'informations."
+)
+
+class StubConfig:
+    """Latences (secondes) et forme des réponses du serveur factice"""
+
+    def __init__(
+        self,
+        dimension: int = 768,
+        embed_latency: float = 0.0,
+        embed_latency_per_text: float = 0.0,
+        generate_latency: float = 0.0,
+        token_latency: float = 0.0,
+        answer: str = DEFAULT_ANSWER
+    ):
+        self.dimension = dimension
+        self.embed_latency = embed_latency
+        self.embed_latency_per_text = embed_latency_per_text
+        self.generate_latency = generate_latency
+        self.token_latency = token_latency
+        self.answer = answer
+
+def stub_embedding(text: str, dimension: int) -> list:
+    """Vecteur unitaire déterministe pour un texte"""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'big')
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimension)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    config = StubConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Silencieux: les benchmarks mesurent, ils n'affichent pas
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": "stub:latest"}]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        config = self.config
+        request = self._read_json()
+
+        if self.path == "/api/embed":
+            texts = request.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            time.sleep(config.embed_latency + config.embed_latency_per_text * len(texts))
+            self._send_json({
+                "model": request.get("model"),
+                "embeddings": [stub_embedding(text, config.dimension) for text in texts]
+            })
+        elif self.path == "/api/embeddings":
+            time.sleep(config.embed_latency + config.embed_latency_per_text)
+            self._send_json({"embedding": stub_embedding(request.get("prompt", ""), config.dimension)})
+        elif self.path in ("/api/generate", "/api/chat"):
+            self._generate(request, chat=self.path == "/api/chat")
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _generate(self, request: dict, chat: bool):
+        config = self.config
+        time.sleep(config.generate_latency)
+        prompt = request.get("prompt", "") if not chat else json.dumps(request.get("messages", []))
+        tokens = config.answer.split(" ")
+        final = {
+            "model": request.get("model"),
+            "done": True,
+            "prompt_eval_count": len(prompt.split()),
+            "eval_count": len(tokens)
+        }
+
+        def fragment(text: str) -> dict:
+            if chat:
+                return {"message": {"role": "assistant", "content": text}}
+            return {"response": text}
+
+        if not request.get("stream", True):
+            time.sleep(config.token_latency * len(tokens))
+            self._send_json({**fragment(config.answer), **final})
+            return
+
+        # Streaming NDJSON en chunked transfer encoding, comme Ollama
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            time.sleep(config.token_latency)
+            text = token if i == 0 else " " + token
+            self._write_chunk({**fragment(text), "done": False})
+        self._write_chunk({**fragment(""), **final})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, payload: dict):
+        data = (json.dumps(payload) + "\n").encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+def start_stub_server(port: int = 0, config: StubConfig = None) -> ThreadingHTTPServer:
+    """Démarrer le serveur dans un thread; `server.server_address[1]` donne le port"""
+    handler = type("ConfiguredStubHandler", (StubOllamaHandler,), {"config": config or StubConfig()})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur Ollama factice (benchmarks hors ligne)")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Secondes par requête d'embedding")
+    parser.add_argument("--embed-latency-per-text", type=float, default=0.0, help="Secondes par texte embeddé")
+    parser.add_argument("--generate-latency", type=float, default=0.0, help="Secondes avant le premier token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Secondes par token généré")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        dimension=args.dimension,
+        embed_latency=args.embed_latency,
+        embed_latency_per_text=args.embed_latency_per_text,
+        generate_latency=args.generate_latency,
+        token_latency=args.token_latency
+    )
+    server = start_stub_server(args.port, config)
+    print(f"🧪 Ollama factice sur http://127.0.0.1:{server.server_address[1]} (Ctrl+C pour arrêter)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os
+import json
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, Iterator
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -29,7 +30,8 @@ class BaseAgent:
                         "num_predict": self.max_tokens
                     }
                 },
-                timeout=60
+                timeout=60,
+                stream=stream
             )
             response.raise_for_status()
             
@@ -42,20 +44,41 @@ class BaseAgent:
             print(f"❌ Erreur génération: {e}")
             return "Désolé, une erreur s'est produite. Veuillez réessayer."
     
-    def _handle_stream(self, response):
-        """Gérer les réponses en streaming"""
-        full_response = ""
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        """Générer une réponse token par token, dès qu'ils arrivent"""
+        response = requests.post(
+            f"{self.base_url}/api/generate",
+            json={
+                "model": self.model_name,
+                "prompt": prompt,
+                "stream": True,
+                "options": {
+                    "temperature": self.temperature,
+                    "num_predict": self.max_tokens
+                }
+            },
+            timeout=60,
+            stream=True
+        )
+        response.raise_for_status()
+        yield from self._iter_stream(response)
+    
+    def _iter_stream(self, response) -> Iterator[str]:
+        """Extraire les tokens d'une réponse Ollama en streaming"""
         for line in response.iter_lines():
             if line:
-                data = line.decode('utf-8')
-                import json
                 try:
-                    chunk = json.loads(data)
-                    if 'response' in chunk:
-                        full_response += chunk['response']
-                except:
+                    chunk = json.loads(line.decode('utf-8'))
+                except ValueError:
                     continue
-        return full_response
+                if chunk.get('response'):
+                    yield chunk['response']
+                if chunk.get('done'):
+                    break
+    
+    def _handle_stream(self, response):
+        """Gérer les réponses en streaming"""
+        return "".join(self._iter_stream(response))
     
     def chat(self, messages: list) -> str:
         """Mode chat avec historique"""
@@ -22,7 +22,8 @@ class QAAgent(BaseAgent):
             results = self.retriever.retrieve(question)
             
             if results:
-                context = self.retriever.format_context(results)
+                # Seuls les chunks retenus dans le budget sont cités
+                context, results, _ = self.retriever.pack_context(results)
                 sources = [
                     {
                         "source": doc.metadata.get("source", "Unknown"),
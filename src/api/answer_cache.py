@@ -0,0 +1,142 @@
+"""
+Cache sémantique des réponses du chat
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class CachedAnswer:
+    """Réponse mémorisée pour une question"""
+
+    def __init__(self, question: str, answer: str, sources: List[Dict], expires_at: float):
+        self.question = question
+        self.answer = answer
+        self.sources = sources
+        self.source_names = {source.get('source') for source in sources or []}
+        self.expires_at = expires_at
+
+class SemanticAnswerCache:
+    """Cache LRU + TTL des réponses, interrogé par similarité d'embedding
+
+    Les embeddings des questions sont rangés dans une matrice float32
+    (un slot par entrée): une recherche est un seul produit matrice-vecteur.
+    Une entrée est invalidée dès qu'un document qu'elle cite est réindexé
+    ou supprimé; les réponses sans source le sont à chaque ajout de document.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_seconds: float = None, threshold: float = None):
+        self.enabled = os.getenv('ANSWER_CACHE_ENABLED', 'True').lower() == 'true'
+        self.max_entries = max_entries or int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 512))
+        self.ttl_seconds = ttl_seconds or float(os.getenv('ANSWER_CACHE_TTL', 3600))
+        self.threshold = threshold or float(os.getenv('ANSWER_CACHE_THRESHOLD', 0.95))
+        self._entries = OrderedDict()  # slot -> CachedAnswer (ordre LRU)
+        self._vectors = None           # (max_entries, dimension)
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype='float32').ravel()
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, embedding: List[float]) -> Optional[CachedAnswer]:
+        """Réponse d'une question assez proche, ou None"""
+        if not self.enabled:
+            return None
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._drop_expired()
+            if not self._entries or self._vectors is None or self._vectors.shape[1] != len(vector):
+                self.misses += 1
+                return None
+
+            slots = np.fromiter(self._entries.keys(), dtype='int64', count=len(self._entries))
+            similarities = self._vectors[slots] @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            slot = int(slots[best])
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return self._entries[slot]
+
+    def put(self, embedding: List[float], question: str, answer: str, sources: List[Dict]):
+        """Mémoriser la réponse à une question"""
+        if not self.enabled or not answer:
+            return
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != len(vector):
+                # Première entrée (ou changement de modèle d'embedding)
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype='float32')
+                self._entries.clear()
+                self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+            self._drop_expired()
+            if not self._free_slots:
+                slot, _ = self._entries.popitem(last=False)
+                self._free_slots.append(slot)
+                self.evictions += 1
+
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._entries[slot] = CachedAnswer(
+                question, answer, sources, time.monotonic() + self.ttl_seconds
+            )
+
+    def invalidate_source(self, source: str) -> int:
+        """Retirer les réponses qui citent `source` ou n'ont aucune source"""
+        with self._lock:
+            stale = [
+                slot for slot, entry in self._entries.items()
+                if source in entry.source_names or not entry.source_names
+            ]
+            self._remove(stale)
+            self.invalidations += len(stale)
+        if stale:
+            print(f"♻️ Cache de réponses: {len(stale)} entrées invalidées ({source})")
+        return len(stale)
+
+    def clear(self):
+        """Vider le cache"""
+        with self._lock:
+            self._remove(list(self._entries.keys()))
+
+    def _drop_expired(self):
+        now = time.monotonic()
+        self._remove([slot for slot, entry in self._entries.items() if entry.expires_at <= now])
+
+    def _remove(self, slots: List[int]):
+        for slot in slots:
+            del self._entries[slot]
+            self._free_slots.append(slot)
+
+    def stats(self) -> Dict:
+        """Statistiques du cache"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries
+        }
+
+
+# Instance partagée par les routes et la file d'ingestion
+answer_cache = SemanticAnswerCache()
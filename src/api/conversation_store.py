@@ -0,0 +1,267 @@
+"""
+Stockage de l'historique des conversations
+"""
+
+import os
+import time
+import uuid
+import asyncio
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class ConversationStore(ABC):
+    """Interface d'un stockage de conversations
+
+    Les messages sont des dicts {"role", "content", "timestamp"}, du plus
+    ancien au plus récent.
+    """
+
+    def __init__(self, max_messages: int = None, ttl_seconds: float = None):
+        # Messages gardés par conversation (le prompt n'utilise que les derniers)
+        self.max_messages = max_messages or int(os.getenv('CONVERSATION_MAX_MESSAGES', 20))
+        # Conversation oubliée après cette durée d'inactivité
+        self.ttl_seconds = ttl_seconds or float(os.getenv('CONVERSATION_TTL', 86400))
+
+    async def start(self):
+        """Démarrer les tâches de fond éventuelles"""
+
+    async def close(self):
+        """Écrire ce qui est en attente et libérer les ressources"""
+
+    @abstractmethod
+    async def get_history(self, conv_id: str, limit: int = None) -> List[Dict]:
+        """Derniers messages d'une conversation (`limit` au plus)"""
+
+    @abstractmethod
+    async def append(self, conv_id: str, role: str, content: str):
+        """Ajouter un message à une conversation"""
+
+    async def save_exchange(self, conv_id: str, message: str, response_text: str):
+        """Ajouter une question et sa réponse"""
+        await self.append(conv_id, "user", message)
+        await self.append(conv_id, "assistant", response_text)
+
+class InMemoryConversationStore(ConversationStore):
+    """Conversations en mémoire du processus, bornées
+
+    - au plus `max_conversations` conversations (LRU)
+    - au plus `max_messages` messages par conversation
+    - conversations inactives depuis `ttl_seconds` oubliées
+    """
+
+    def __init__(self, max_conversations: int = None, max_messages: int = None, ttl_seconds: float = None):
+        super().__init__(max_messages, ttl_seconds)
+        self.max_conversations = max_conversations or int(os.getenv('CONVERSATION_MAX_CONVERSATIONS', 10_000))
+        self._conversations = OrderedDict()  # conv_id -> (dernière activité, deque de messages)
+
+    async def get_history(self, conv_id: str, limit: int = None) -> List[Dict]:
+        entry = self._conversations.get(conv_id)
+        if entry is None:
+            return []
+        if entry[0] + self.ttl_seconds <= time.monotonic():
+            del self._conversations[conv_id]
+            return []
+        messages = list(entry[1])
+        if limit is not None:
+            messages = messages[-limit:] if limit else []
+        return [
+            {"role": role, "content": content, "timestamp": timestamp}
+            for role, content, timestamp in messages
+        ]
+
+    async def append(self, conv_id: str, role: str, content: str):
+        now = time.monotonic()
+        entry = self._conversations.pop(conv_id, None)
+        messages = entry[1] if entry is not None else deque(maxlen=self.max_messages)
+        messages.append((role, content, datetime.now()))
+        self._conversations[conv_id] = (now, messages)
+        self._evict(now)
+
+    def _evict(self, now: float):
+        # L'ordre LRU est aussi l'ordre d'inactivité: les expirées sont en tête
+        while self._conversations:
+            oldest_id, (last_active, _) = next(iter(self._conversations.items()))
+            if len(self._conversations) <= self.max_conversations and last_active + self.ttl_seconds > now:
+                break
+            del self._conversations[oldest_id]
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+class SQLConversationStore(ConversationStore):
+    """Conversations en base SQL (SQLite ou PostgreSQL via SQLAlchemy)
+
+    Partagé entre les workers uvicorn. Les écritures sont mises en tampon
+    et insérées par lots en arrière-plan (toutes les `flush_interval`
+    secondes ou dès `batch_size` messages); les lectures du même worker
+    voient aussi les messages encore en tampon.
+    """
+
+    def __init__(self, url: str = None, max_messages: int = None, ttl_seconds: float = None):
+        super().__init__(max_messages, ttl_seconds)
+        from sqlalchemy import (
+            Column, DateTime, Integer, MetaData, String, Table, Text, create_engine
+        )
+
+        self.url = url or os.getenv('CONVERSATION_DB_URL', 'sqlite:///./data/conversations.db')
+        if self.url.startswith('sqlite:///'):
+            Path(self.url[len('sqlite:///'):]).parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = float(os.getenv('CONVERSATION_FLUSH_INTERVAL', 0.5))
+        self.batch_size = int(os.getenv('CONVERSATION_BATCH_SIZE', 100))
+
+        self.engine = create_engine(self.url, pool_pre_ping=True)
+        self._metadata = MetaData()
+        self.messages = Table(
+            "conversation_messages", self._metadata,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("message_id", String(32), nullable=False),
+            Column("conversation_id", String(64), nullable=False, index=True),
+            Column("role", String(16), nullable=False),
+            Column("content", Text, nullable=False),
+            Column("created_at", DateTime, nullable=False, index=True),
+        )
+
+        self._pending: List[Dict] = []    # En attente d'écriture
+        self._in_flight: List[Dict] = []  # Lot en cours d'écriture
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._closing = False
+        self._last_cleanup = 0.0
+
+    async def start(self):
+        if self._writer is None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._metadata.create_all, self.engine)
+            self._closing = False
+            self._wakeup = asyncio.Event()
+            self._writer = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._writer is not None:
+            # Arrêt sans annulation: un lot en cours d'écriture va jusqu'au bout
+            self._closing = True
+            self._wakeup.set()
+            await self._writer
+            self._writer = None
+        try:
+            await self._flush()
+        finally:
+            self.engine.dispose()
+
+    async def append(self, conv_id: str, role: str, content: str):
+        self._pending.append({
+            "message_id": uuid.uuid4().hex,
+            "conversation_id": conv_id,
+            "role": role,
+            "content": content,
+            "created_at": datetime.now()
+        })
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def get_history(self, conv_id: str, limit: int = None) -> List[Dict]:
+        limit = self.max_messages if limit is None else min(limit, self.max_messages)
+        if limit <= 0:
+            return []
+        # Tampon lu avant la base: un lot écrit entre-temps est dédoublonné
+        pending = [row for row in self._in_flight + self._pending if row["conversation_id"] == conv_id]
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(None, self._select, conv_id, limit)
+
+        seen = {row["message_id"] for row in rows}
+        rows += [row for row in pending if row["message_id"] not in seen]
+        return [
+            {"role": row["role"], "content": row["content"], "timestamp": row["created_at"]}
+            for row in rows[-limit:]
+        ]
+
+    def _select(self, conv_id: str, limit: int) -> List[Dict]:
+        from sqlalchemy import select
+
+        cutoff = datetime.now() - timedelta(seconds=self.ttl_seconds)
+        table = self.messages
+        query = (
+            select(table.c.message_id, table.c.role, table.c.content, table.c.created_at)
+            .where(table.c.conversation_id == conv_id, table.c.created_at > cutoff)
+            .order_by(table.c.id.desc())
+            .limit(limit)
+        )
+        with self.engine.connect() as conn:
+            rows = [dict(row._mapping) for row in conn.execute(query)]
+        rows.reverse()
+        return rows
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._flush()
+            except Exception as e:
+                # Le lot est remis en tête du tampon et réessayé au tour suivant
+                print(f"⚠️ Écriture des conversations échouée: {e}")
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        self._in_flight, self._pending = self._pending, []
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._write, self._in_flight)
+        except Exception:
+            self._pending = self._in_flight + self._pending
+            raise
+        finally:
+            self._in_flight = []
+
+    def _write(self, rows: List[Dict]):
+        """Insérer un lot puis appliquer les limites de taille et de durée"""
+        from sqlalchemy import delete, select
+
+        table = self.messages
+        with self.engine.begin() as conn:
+            conn.execute(table.insert(), rows)
+
+            # Garder les `max_messages` derniers messages des conversations touchées
+            for conv_id in {row["conversation_id"] for row in rows}:
+                boundary = (
+                    select(table.c.id)
+                    .where(table.c.conversation_id == conv_id)
+                    .order_by(table.c.id.desc())
+                    .offset(self.max_messages)
+                    .limit(1)
+                    .scalar_subquery()
+                )
+                conn.execute(
+                    delete(table).where(table.c.conversation_id == conv_id, table.c.id <= boundary)
+                )
+
+            # Purge des messages expirés, au plus une fois par minute
+            now = time.monotonic()
+            if now - self._last_cleanup > 60:
+                self._last_cleanup = now
+                cutoff = datetime.now() - timedelta(seconds=self.ttl_seconds)
+                conn.execute(delete(table).where(table.c.created_at <= cutoff))
+
+
+def create_conversation_store() -> ConversationStore:
+    """Stockage choisi par CONVERSATION_STORE (memory ou sql)"""
+    backend = os.getenv('CONVERSATION_STORE', 'memory').lower()
+    if backend == 'memory':
+        return InMemoryConversationStore()
+    if backend == 'sql':
+        return SQLConversationStore()
+    raise ValueError(f"Stockage de conversations inconnu: {backend} (attendu: memory, sql)")
+
+
+# Instance partagée (démarrée dans le lifespan de l'application)
+conversation_store = create_conversation_store()
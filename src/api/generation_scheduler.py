@@ -0,0 +1,229 @@
+"""
+Ordonnanceur des générations Ollama: contrôle d'admission et fusion des
+prompts identiques en cours (single-flight)
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, Optional
+from dotenv import load_dotenv
+
+from .ollama_client import ollama_client
+from ..rag.metrics import REGISTRY, record_stage
+
+load_dotenv()
+
+GENERATION_ACTIVE = REGISTRY.gauge(
+    "generation_active", "Générations Ollama en cours"
+)
+GENERATION_QUEUE_DEPTH = REGISTRY.gauge(
+    "generation_queue_depth", "Générations en attente d'un créneau Ollama"
+)
+GENERATION_QUEUE_WAIT = REGISTRY.histogram(
+    "generation_queue_wait_seconds", "Attente d'un créneau de génération"
+)
+GENERATION_REJECTED = REGISTRY.counter(
+    "generation_rejected_total", "Générations refusées (file pleine ou attente trop longue)", ("reason",)
+)
+GENERATION_COALESCED = REGISTRY.counter(
+    "generation_coalesced_total", "Requêtes servies par une génération identique déjà en cours"
+)
+
+class GenerationRejected(Exception):
+    """File d'attente pleine: le client doit réessayer après `retry_after` secondes"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Serveur de génération saturé ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class GenerationFlight:
+    """Une génération Ollama partagée par toutes les requêtes du même prompt
+
+    Les fragments reçus sont conservés: un abonné arrivé en cours de route
+    les rejoue depuis le début. La génération est annulée quand plus
+    personne ne l'écoute.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.rejection: Optional[GenerationRejected] = None
+        self.admitted = asyncio.Event()
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: Dict):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: BaseException = None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self):
+        # Chaque abonné attend l'événement courant: on le remplace après l'avoir levé
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def stream(self) -> AsyncIterator[Dict]:
+        """Fragments JSON d'Ollama, depuis le premier"""
+        index = 0
+        try:
+            while True:
+                while index < len(self.chunks):
+                    yield self.chunks[index]
+                    index += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers <= 0 and not self.done and self.task is not None:
+                self.task.cancel()
+
+    async def text(self) -> str:
+        """Réponse complète"""
+        async with aclosing(self.stream()) as chunks:
+            return "".join([chunk.get("response", "") async for chunk in chunks])
+
+class GenerationScheduler:
+    """Limite les générations simultanées envoyées à Ollama
+
+    Au plus `max_concurrent` générations tournent; les suivantes attendent
+    dans une file de `max_queue` places (et au plus `queue_timeout`
+    secondes). Au-delà, `GenerationRejected` est levée tout de suite, pour
+    répondre 503 au lieu d'attendre le timeout d'Ollama. Un prompt
+    identique à une génération en cours (ou en attente) la rejoint.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = None,
+        max_queue: int = None,
+        queue_timeout: float = None,
+        retry_after: int = None
+    ):
+        self.max_concurrent = max_concurrent or int(os.getenv('GENERATION_MAX_CONCURRENT', 2))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv('GENERATION_MAX_QUEUE', 8))
+        self.queue_timeout = queue_timeout or float(os.getenv('GENERATION_QUEUE_TIMEOUT', 30))
+        self.retry_after = retry_after or int(os.getenv('GENERATION_RETRY_AFTER', 5))
+        self.active = 0
+        self.waiting = 0
+        self._flights: Dict[str, GenerationFlight] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    def _key(prompt: str, options: Dict) -> str:
+        payload = json.dumps([prompt, options or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _reject(self, reason: str) -> GenerationRejected:
+        GENERATION_REJECTED.inc(reason=reason)
+        print(f"🚦 Génération refusée ({reason}): {self.active} en cours, {self.waiting} en attente")
+        return GenerationRejected(reason, self.retry_after)
+
+    async def submit(self, prompt: str, options: Dict = None) -> GenerationFlight:
+        """Obtenir la génération d'un prompt (nouvelle ou déjà en cours)
+
+        Attend un créneau si besoin; lève `GenerationRejected` si la file
+        est pleine ou si l'attente dépasse `queue_timeout`. L'attente est
+        portée par la génération, pas par la requête qui l'a créée: si
+        celle-ci est annulée, les requêtes fusionnées gardent leur place.
+        """
+        key = self._key(prompt, options)
+        flight = self._flights.get(key)
+        coalesced = flight is not None
+        if not coalesced:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            if self.active + self.waiting >= self.max_concurrent + self.max_queue:
+                raise self._reject("queue_full")
+
+            flight = GenerationFlight(key)
+            self._flights[key] = flight
+            self.waiting += 1
+            GENERATION_QUEUE_DEPTH.set(self.waiting)
+            flight.task = asyncio.create_task(self._serve(flight, prompt, options))
+
+        flight.subscribers += 1
+        try:
+            await flight.admitted.wait()
+            if flight.rejection is not None:
+                raise flight.rejection
+        except BaseException:
+            flight.subscribers -= 1
+            if flight.subscribers <= 0 and not flight.done:
+                # Plus personne n'attend cette génération: libérer sa place (ou son créneau)
+                flight.task.cancel()
+            raise
+        if coalesced:
+            # Même prompt déjà en cours ou en attente: pas de nouvelle génération
+            GENERATION_COALESCED.inc()
+        return flight
+
+    async def _serve(self, flight: GenerationFlight, prompt: str, options: Dict):
+        """Attendre un créneau puis générer, pour tous les abonnés du prompt"""
+        try:
+            await self._acquire(flight)
+        except (GenerationRejected, asyncio.CancelledError):
+            return
+        flight.admitted.set()
+        await self._run(flight, prompt, options)
+
+    async def _acquire(self, flight: GenerationFlight):
+        """Attendre un créneau; en cas d'échec, toutes les requêtes du prompt sont refusées"""
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            self.active += 1
+            GENERATION_ACTIVE.set(self.active)
+        except asyncio.TimeoutError:
+            self._abandon(flight, self._reject("queue_timeout"))
+            raise flight.rejection
+        except asyncio.CancelledError:
+            # Tous les abonnés sont partis pendant l'attente
+            self._abandon(flight, GenerationRejected("cancelled", self.retry_after))
+            raise
+        finally:
+            self.waiting -= 1
+            GENERATION_QUEUE_DEPTH.set(self.waiting)
+            waited = time.perf_counter() - start
+            GENERATION_QUEUE_WAIT.observe(waited)
+            record_stage("queue_wait", waited)
+
+    def _abandon(self, flight: GenerationFlight, rejection: GenerationRejected):
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+        flight.rejection = rejection
+        flight.admitted.set()
+
+    async def _run(self, flight: GenerationFlight, prompt: str, options: Dict):
+        try:
+            async for chunk in ollama_client.stream_generate(prompt, options=options):
+                flight.publish(chunk)
+            flight.finish()
+        except asyncio.CancelledError:
+            flight.finish(RuntimeError("Génération annulée"))
+        except Exception as e:
+            flight.finish(e)
+        finally:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            self.active -= 1
+            GENERATION_ACTIVE.set(self.active)
+            self._semaphore.release()
+
+
+# Instance partagée par toutes les routes
+generation_scheduler = GenerationScheduler()
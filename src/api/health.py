@@ -0,0 +1,135 @@
+"""
+Sonde de santé en arrière-plan: l'état d'Ollama et de l'index est
+rafraîchi périodiquement, les endpoints de santé lisent le dernier relevé
+"""
+
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Optional
+from dotenv import load_dotenv
+
+from .ollama_client import ollama_client
+
+load_dotenv()
+
+class HealthSnapshot:
+    """Dernier état relevé par la sonde"""
+
+    def __init__(
+        self,
+        ollama_connected: bool = False,
+        models: list = None,
+        model_available: bool = False,
+        total_documents: int = 0,
+        probe_latency_ms: Optional[float] = None,
+        error: Optional[str] = None
+    ):
+        self.ollama_connected = ollama_connected
+        self.models = models or []
+        self.model_available = model_available
+        self.total_documents = total_documents
+        self.vector_store_loaded = total_documents > 0
+        self.probe_latency_ms = probe_latency_ms
+        self.error = error
+        self.checked_at = datetime.now()
+        self._checked_monotonic = time.monotonic()
+
+    @property
+    def age(self) -> float:
+        """Âge du relevé (secondes)"""
+        return time.monotonic() - self._checked_monotonic
+
+    def to_dict(self) -> dict:
+        return {
+            "ollama_connected": self.ollama_connected,
+            "models": self.models,
+            "model_available": self.model_available,
+            "vector_store_loaded": self.vector_store_loaded,
+            "total_documents": self.total_documents,
+            "probe_latency_ms": self.probe_latency_ms,
+            "error": self.error,
+            "checked_at": self.checked_at
+        }
+
+class HealthMonitor:
+    """Tâche asyncio qui interroge Ollama toutes les `interval` secondes
+
+    Les sondes (load balancer, Kubernetes) n'appellent donc jamais Ollama
+    elles-mêmes. Un relevé plus vieux que `max_age` secondes (sonde
+    bloquée) rend l'API non prête.
+    """
+
+    def __init__(self, interval: float = None, timeout: float = None, max_age: float = None):
+        self.interval = interval or float(os.getenv('HEALTH_PROBE_INTERVAL', 10))
+        self.timeout = timeout or float(os.getenv('HEALTH_PROBE_TIMEOUT', 2))
+        self.max_age = max_age or float(os.getenv('HEALTH_MAX_AGE', 3 * self.interval))
+        self.vector_store = None
+        self.snapshot = HealthSnapshot(error="Sonde non démarrée")
+        self._task: Optional[asyncio.Task] = None
+
+    def configure(self, vector_store):
+        """Définir le vector store dont la taille est relevée"""
+        self.vector_store = vector_store
+
+    async def start(self):
+        """Premier relevé, puis rafraîchissement en arrière-plan"""
+        if self._task is None:
+            await self.refresh()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Arrêter la sonde"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self) -> HealthSnapshot:
+        """Relever l'état d'Ollama et de l'index"""
+        total_documents = len(self.vector_store) if self.vector_store is not None else 0
+        start = time.perf_counter()
+        try:
+            models = await ollama_client.list_models(timeout=self.timeout)
+            expected = os.getenv('OLLAMA_MODEL')
+            self.snapshot = HealthSnapshot(
+                ollama_connected=True,
+                models=models,
+                model_available=not expected or any(
+                    name == expected or name.split(':')[0] == expected for name in models
+                ),
+                total_documents=total_documents,
+                probe_latency_ms=round((time.perf_counter() - start) * 1000, 1)
+            )
+        except Exception as e:
+            if self.snapshot.ollama_connected:
+                print(f"⚠️ Ollama injoignable: {e}")
+            self.snapshot = HealthSnapshot(
+                total_documents=total_documents,
+                error=f"Ollama: {e}"
+            )
+        return self.snapshot
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.refresh()
+
+    @property
+    def ready(self) -> bool:
+        """Prête à servir le chat: Ollama joignable, modèle présent, index chargé"""
+        snapshot = self.snapshot
+        return (
+            snapshot.ollama_connected
+            and snapshot.model_available
+            and snapshot.vector_store_loaded
+            and snapshot.age <= self.max_age
+        )
+
+
+# Instance partagée (démarrée dans le lifespan de l'application)
+health_monitor = HealthMonitor()
@@ -0,0 +1,158 @@
+"""
+File d'ingestion en arrière-plan des documents uploadés
+"""
+
+import os
+import asyncio
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from dotenv import load_dotenv
+
+from .answer_cache import answer_cache
+
+load_dotenv()
+
+class IngestionJob:
+    """Tâche d'ingestion d'un fichier"""
+
+    def __init__(self, file_path: str, filename: str):
+        self.job_id = f"job_{uuid.uuid4().hex[:12]}"
+        self.file_path = file_path
+        self.filename = filename
+        self.status = "queued"  # queued → processing → completed | failed
+        self.stage = None
+        self.chunks = 0
+        self.error = None
+        self.created_at = datetime.now()
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "chunks": self.chunks,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+class IngestionQueue:
+    """File de tâches traitée par un worker asyncio
+
+    Le travail lourd (lecture, découpage, embedding, sauvegarde) est
+    exécuté dans un thread pour ne pas bloquer la boucle d'événements.
+    Ingestions et suppressions modifient l'index et le manifeste sous le
+    même verrou, pour qu'une sauvegarde n'écrase jamais l'autre.
+    """
+
+    def __init__(self, max_jobs_kept: int = None):
+        self.max_jobs_kept = max_jobs_kept or int(os.getenv('INGESTION_MAX_JOBS_KEPT', 200))
+        self.indexer = None
+        self.jobs = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def configure(self, indexer):
+        """Définir l'indexer utilisé pour traiter les fichiers"""
+        self.indexer = indexer
+
+    async def start(self):
+        """Démarrer le worker"""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Arrêter le worker (les tâches en attente sont abandonnées)"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def submit(self, file_path: str, filename: str) -> IngestionJob:
+        """Ajouter un fichier à la file; retourne immédiatement"""
+        if self._queue is None:
+            raise RuntimeError("File d'ingestion non démarrée")
+
+        job = IngestionJob(file_path, filename)
+        self.jobs[job.job_id] = job
+        while len(self.jobs) > self.max_jobs_kept:
+            oldest_id, oldest = next(iter(self.jobs.items()))
+            if oldest.status in ("queued", "processing"):
+                break
+            del self.jobs[oldest_id]
+
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            job.status = "processing"
+            try:
+                job.chunks = await loop.run_in_executor(None, self._process, job)
+                job.status = "completed"
+                print(f"✅ Ingestion {job.filename}: {job.chunks} chunks")
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                print(f"❌ Ingestion {job.filename}: {e}")
+            finally:
+                job.stage = None
+                job.finished_at = datetime.now()
+                self._queue.task_done()
+
+    def _process(self, job: IngestionJob) -> int:
+        """Charger, découper, embedder, ajouter au vector store puis sauvegarder"""
+        if self.indexer is None:
+            raise RuntimeError("Système RAG non initialisé")
+
+        def on_progress(stage: str):
+            job.stage = stage
+
+        with self._lock:
+            ids = self.indexer.index_file(job.file_path, on_progress=on_progress)
+            # Les réponses mémorisées pour ce document ne sont plus à jour
+            answer_cache.invalidate_source(job.filename)
+            on_progress("saving")
+            self.indexer.save()
+        return len(ids)
+
+    def remove(self, file_path: str, filename: str) -> int:
+        """Retirer les chunks d'un fichier puis sauvegarder (bloquant: à exécuter dans un thread)
+
+        Seulement via le manifeste (chemin relatif au dossier de données):
+        un fichier de même nom dans un sous-dossier n'est pas touché.
+        """
+        if self.indexer is None:
+            raise RuntimeError("Système RAG non initialisé")
+
+        with self._lock:
+            files = self.indexer.manifest["files"]
+            known = len(files)
+            removed = self.indexer.remove_file(file_path)
+            answer_cache.invalidate_source(filename)
+            if removed or len(files) != known:
+                self.indexer.save()
+        return removed
+
+
+# Instance partagée (démarrée dans le lifespan de l'application)
+ingestion_queue = IngestionQueue()
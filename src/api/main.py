@@ -3,19 +3,59 @@ Application FastAPI principale
 """
 
 import os
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 
+from .ollama_client import ollama_client
+from .ingestion import ingestion_queue
+from .conversation_store import conversation_store
+from .health import health_monitor
+from ..rag.metrics import REGISTRY
+
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Démarrage et arrêt de l'application"""
+    print("=" * 60)
+    print(f"🚀 {os.getenv('APP_NAME')} v{os.getenv('APP_VERSION')}")
+    print(f"🔗 Ollama: {os.getenv('OLLAMA_BASE_URL')}")
+    print(f"🤖 Modèle: {os.getenv('OLLAMA_MODEL')}")
+    print(f"📊 Embeddings: {os.getenv('OLLAMA_EMBEDDING_MODEL')}")
+    print("=" * 60)
+
+    # Système RAG chargé dans chaque worker (sauf s'il a été initialisé avant)
+    if not rag_initialized():
+        await asyncio.get_running_loop().run_in_executor(None, setup_rag)
+
+    # Pool de connexions Ollama partagé par toutes les requêtes
+    await ollama_client.start()
+    await ingestion_queue.start()
+    await conversation_store.start()
+    await health_monitor.start()
+    await snapshot_watcher.start()
+
+    yield
+
+    await snapshot_watcher.stop()
+    await health_monitor.stop()
+    await conversation_store.close()
+    await ingestion_queue.stop()
+    await ollama_client.close()
+    print("\n👋 ENSA Chatbot arrêté")
+
 # Créer l'application FastAPI
 app = FastAPI(
     title=os.getenv('APP_NAME', 'ENSA Chatbot'),
     version=os.getenv('APP_VERSION', '1.0.0'),
     description="Chatbot intelligent pour l'ENSA El Jadida avec RAG et agents",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configuration CORS
@@ -30,28 +70,14 @@ app.add_middleware(
 )
 
 # Importer les routes
-from .routes import chat_router, documents_router, health_router
+from .routes import chat_router, documents_router, health_router, rag_initialized
+from .rag_system import setup_rag, snapshot_watcher
 
 # Enregistrer les routes
 app.include_router(health_router, prefix="/api", tags=["Health"])
 app.include_router(chat_router, prefix="/api/chat", tags=["Chat"])
 app.include_router(documents_router, prefix="/api/documents", tags=["Documents"])
 
-@app.on_event("startup")
-async def startup_event():
-    """Événement au démarrage"""
-    print("=" * 60)
-    print(f"🚀 {os.getenv('APP_NAME')} v{os.getenv('APP_VERSION')}")
-    print(f"🔗 Ollama: {os.getenv('OLLAMA_BASE_URL')}")
-    print(f"🤖 Modèle: {os.getenv('OLLAMA_MODEL')}")
-    print(f"📊 Embeddings: {os.getenv('OLLAMA_EMBEDDING_MODEL')}")
-    print("=" * 60)
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Événement à l'arrêt"""
-    print("\n👋 ENSA Chatbot arrêté")
-
 @app.get("/")
 async def root():
     """Route racine"""
@@ -60,4 +86,9 @@ async def root():
         "version": os.getenv('APP_VERSION'),
         "docs": "/docs",
         "health": "/api/health"
-    }
\ No newline at end of file
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métriques au format texte Prometheus (latence par étape, caches, index)"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -3,7 +3,7 @@ Modèles Pydantic pour l'API
 """
 
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
 from datetime import datetime
 
 class ChatRequest(BaseModel):
@@ -12,6 +12,10 @@ class ChatRequest(BaseModel):
     conversation_id: Optional[str] = Field(None, description="ID de conversation")
     use_rag: bool = Field(True, description="Utiliser RAG ou non")
     stream: bool = Field(False, description="Réponse en streaming")
+    filters: Optional[Dict[str, Union[str, int, List[Union[str, int]]]]] = Field(
+        None, description="Limiter la recherche à des métadonnées, ex: {\"category\": \"isic\"}"
+    )
+    include_timings: bool = Field(False, description="Inclure le temps de chaque étape dans la réponse")
     
     class Config:
         json_schema_extra = {
@@ -28,6 +32,9 @@ class ChatResponse(BaseModel):
     conversation_id: str = Field(..., description="ID de conversation")
     sources: Optional[List[Dict]] = Field(None, description="Sources utilisées")
     processing_time: float = Field(..., description="Temps de traitement (secondes)")
+    cached: bool = Field(False, description="Réponse servie depuis le cache sémantique")
+    prompt_tokens: Optional[int] = Field(None, description="Taille estimée du prompt (tokens)")
+    timings: Optional[Dict[str, float]] = Field(None, description="Temps par étape (ms), si demandé")
     timestamp: datetime = Field(default_factory=datetime.now)
     
     class Config:
@@ -43,6 +50,8 @@ class ChatResponse(BaseModel):
                     }
                 ],
                 "processing_time": 2.34,
+                "cached": False,
+                "prompt_tokens": 1184,
                 "timestamp": "2024-01-15T10:30:00"
             }
         }
@@ -59,6 +68,7 @@ class DocumentUploadResponse(BaseModel):
     """Réponse après upload de document"""
     success: bool
     message: str
+    job_id: Optional[str] = Field(None, description="Tâche d'ingestion en arrière-plan")
     document: Optional[DocumentInfo] = None
     
     class Config:
@@ -66,6 +76,7 @@ class DocumentUploadResponse(BaseModel):
             "example": {
                 "success": True,
                 "message": "Document chargé avec succès",
+                "job_id": "job_3f9a1c2b7d4e",
                 "document": {
                     "filename": "nouveau_reglement.pdf",
                     "size": 245760,
@@ -76,11 +87,27 @@ class DocumentUploadResponse(BaseModel):
             }
         }
 
+class IngestionJobStatus(BaseModel):
+    """État d'une tâche d'ingestion de document"""
+    job_id: str
+    filename: str
+    status: str = Field(..., description="queued, processing, completed ou failed")
+    stage: Optional[str] = Field(None, description="Étape en cours (loading, splitting, embedding...)")
+    chunks: int = Field(0, description="Nombre de chunks indexés")
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
 class HealthResponse(BaseModel):
     """Statut de santé de l'API"""
     status: str
     version: str
     ollama_connected: bool
+    models: List[str] = Field(default_factory=list, description="Modèles disponibles sur Ollama")
+    model_available: bool = Field(False, description="Le modèle configuré est disponible")
     vector_store_loaded: bool
     total_documents: int
+    probe_latency_ms: Optional[float] = Field(None, description="Durée du dernier appel à Ollama")
+    error: Optional[str] = None
+    checked_at: datetime = Field(..., description="Date du dernier relevé de la sonde")
     timestamp: datetime = Field(default_factory=datetime.now)
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+Client HTTP asynchrone pour Ollama (utilisé par les routes de l'API)
+"""
+
+import os
+import json
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+from dotenv import load_dotenv
+
+from ..rag.embeddings import MAX_EMBEDDING_CHARS
+from ..rag.metrics import REGISTRY, record_stage, timed
+
+load_dotenv()
+
+OLLAMA_TOKENS = REGISTRY.counter(
+    "ollama_tokens_total", "Tokens traités par Ollama", ("kind",)
+)
+OLLAMA_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "ollama_generation_tokens_per_second", "Vitesse de génération d'Ollama",
+    buckets=(1, 2, 5, 10, 15, 20, 30, 40, 60, 80, 120, 200)
+)
+
+def _record_generation(final: Dict):
+    """Compter les tokens d'une génération terminée (réponse finale d'Ollama)"""
+    OLLAMA_TOKENS.inc(final.get("prompt_eval_count", 0), kind="prompt")
+    OLLAMA_TOKENS.inc(final.get("eval_count", 0), kind="generated")
+    eval_duration = final.get("eval_duration")
+    if final.get("eval_count") and eval_duration:
+        OLLAMA_TOKENS_PER_SECOND.observe(final["eval_count"] / (eval_duration / 1e9))
+
+class AsyncOllamaClient:
+    """Client Ollama non bloquant avec un pool de connexions partagé
+
+    Le pool est créé par `start()` et fermé par `close()`, appelés dans le
+    lifespan de l'application.
+    """
+
+    def __init__(self, base_url: str = None, max_connections: int = None):
+        self.base_url = base_url or os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+        self.max_connections = max_connections or int(os.getenv('OLLAMA_MAX_CONNECTIONS', 32))
+        self.generate_timeout = float(os.getenv('OLLAMA_TIMEOUT', 60))
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        """Créer le pool de connexions"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=httpx.Timeout(self.generate_timeout, connect=5.0)
+            )
+            print(f"🔗 Client Ollama async prêt ({self.max_connections} connexions max)")
+
+    async def close(self):
+        """Fermer le pool de connexions"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("Client Ollama non démarré (appeler start() dans le lifespan)")
+        return self._client
+
+    async def generate(self, prompt: str, model: str = None, options: Dict = None) -> str:
+        """Générer une réponse complète via /api/generate"""
+        with timed("ollama_generate"):
+            response = await self.client.post(
+                "/api/generate",
+                json={
+                    "model": model or os.getenv('OLLAMA_MODEL'),
+                    "prompt": prompt,
+                    "stream": False,
+                    "options": options or {}
+                }
+            )
+            response.raise_for_status()
+        result = response.json()
+        _record_generation(result)
+        return result["response"]
+
+    async def stream_generate(self, prompt: str, model: str = None, options: Dict = None) -> AsyncIterator[Dict]:
+        """Générer en streaming: produit chaque fragment JSON d'Ollama dès réception"""
+        start = time.perf_counter()
+        first = True
+        try:
+            async with aclosing(self._stream_generate(prompt, model, options)) as chunks:
+                async for chunk in chunks:
+                    if first:
+                        record_stage("ollama_first_token", time.perf_counter() - start)
+                        first = False
+                    if chunk.get("done"):
+                        _record_generation(chunk)
+                    yield chunk
+        finally:
+            record_stage("ollama_generate", time.perf_counter() - start)
+
+    async def _stream_generate(self, prompt: str, model: str = None, options: Dict = None) -> AsyncIterator[Dict]:
+        async with self.client.stream(
+            "POST",
+            "/api/generate",
+            json={
+                "model": model or os.getenv('OLLAMA_MODEL'),
+                "prompt": prompt,
+                "stream": True,
+                "options": options or {}
+            }
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"])
+                yield chunk
+                if chunk.get("done"):
+                    break
+
+    async def embed(self, texts: List[str], model: str = None) -> List[List[float]]:
+        """Embeddings d'un lot de textes via /api/embed"""
+        with timed("ollama_embed"):
+            response = await self.client.post(
+                "/api/embed",
+                json={
+                    "model": model or os.getenv('OLLAMA_EMBEDDING_MODEL', 'nomic-embed-text'),
+                    "input": [text[:MAX_EMBEDDING_CHARS] for text in texts]
+                },
+                timeout=30
+            )
+            response.raise_for_status()
+        return response.json()["embeddings"]
+
+    async def embed_query(self, text: str, embeddings=None) -> List[float]:
+        """Embedding d'une requête, en passant par le cache de `embeddings` si fourni"""
+        model = embeddings.model_name if embeddings is not None else None
+        query_cache = getattr(embeddings, 'query_cache', None)
+
+        if query_cache is not None:
+            cached = query_cache.get(model, text)
+            if cached is not None:
+                return cached
+
+        embedding = (await self.embed([text], model=model))[0]
+        if query_cache is not None:
+            query_cache.put(model, text, embedding)
+        return embedding
+
+    async def list_models(self, timeout: float = 5) -> List[str]:
+        """Modèles disponibles (/api/tags)"""
+        response = await self.client.get("/api/tags", timeout=timeout)
+        response.raise_for_status()
+        return [model["name"] for model in response.json().get("models", [])]
+
+    async def is_available(self, timeout: float = 5) -> bool:
+        """Vérifier que le serveur Ollama répond"""
+        try:
+            response = await self.client.get("/api/tags", timeout=timeout)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+
+# Instance partagée par toutes les routes
+ollama_client = AsyncOllamaClient()
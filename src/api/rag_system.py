@@ -0,0 +1,110 @@
+"""
+Chargement du système RAG dans chaque worker de l'API
+"""
+
+import os
+import asyncio
+from typing import Optional
+from dotenv import load_dotenv
+
+from ..rag import OllamaEmbeddings, TextSplitter, FAISSVectorStore, Retriever, Indexer
+from .routes import initialize_rag_system
+from .answer_cache import answer_cache
+
+load_dotenv()
+
+def setup_rag(read_only: bool = None):
+    """Configurer le système RAG
+
+    En lecture seule (RAG_READ_ONLY=true, imposé par `run_api.py
+    --workers N`), l'index est mappé en mémoire et partagé par les
+    workers; l'upload et la suppression de documents sont refusés, les
+    mises à jour passent par `scripts/index_documents.py`.
+    """
+    if read_only is None:
+        read_only = os.getenv('RAG_READ_ONLY', 'False').lower() == 'true'
+    print("\n🔧 Configuration du système RAG...")
+
+    # Embeddings
+    embeddings = OllamaEmbeddings()
+
+    # Vector store
+    vector_store = FAISSVectorStore(embeddings)
+    vector_store.read_only = read_only
+
+    # Vérifier si un index existe
+    index_path = os.getenv('VECTOR_DB_PATH', './data/embeddings/faiss_index')
+
+    if FAISSVectorStore.exists(index_path):
+        print("📂 Chargement de l'index existant...")
+        vector_store.load(index_path, read_only=read_only)
+    else:
+        print("⚠️ Aucun index trouvé. Ajoutez des documents avec 'python scripts/index_documents.py'")
+
+    # Retriever
+    retriever = Retriever(vector_store)
+
+    # Indexer (ingestion des documents uploadés), seulement si l'index est modifiable
+    indexer = None if read_only else Indexer(vector_store, TextSplitter(), index_path=index_path)
+
+    # Initialiser dans l'API
+    initialize_rag_system(vector_store, retriever, indexer)
+    if read_only:
+        snapshot_watcher.configure(vector_store, index_path)
+
+    print("✅ Système RAG prêt!\n")
+    return vector_store, retriever
+
+class SnapshotWatcher:
+    """Recharge l'index en lecture seule quand une nouvelle version est sauvegardée
+
+    Chaque worker vérifie toutes les `interval` secondes la date de
+    store.json; le rechargement remplace les mappages sous le verrou du
+    store, les recherches en cours finissent sur l'ancienne version.
+    """
+
+    def __init__(self, interval: float = None):
+        self.interval = interval or float(os.getenv('RAG_SNAPSHOT_CHECK_INTERVAL', 30))
+        self.vector_store = None
+        self.index_path = None
+        self.version = None
+        self._task: Optional[asyncio.Task] = None
+
+    def configure(self, vector_store, index_path: str):
+        self.vector_store = vector_store
+        self.index_path = index_path
+        self.version = FAISSVectorStore.snapshot_version(index_path)
+
+    async def start(self):
+        """Démarrer la surveillance (sans effet si l'index n'est pas en lecture seule)"""
+        if self.vector_store is not None and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            version = FAISSVectorStore.snapshot_version(self.index_path)
+            if version is None or version == self.version:
+                continue
+            try:
+                await loop.run_in_executor(None, self.vector_store.load, self.index_path, True)
+            except Exception as e:
+                print(f"⚠️ Rechargement de l'index reporté: {e}")
+                continue
+            self.version = version
+            # Les réponses mémorisées peuvent citer des documents modifiés
+            answer_cache.clear()
+
+
+# Instance partagée (démarrée dans le lifespan de l'application)
+snapshot_watcher = SnapshotWatcher()
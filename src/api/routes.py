@@ -3,13 +3,15 @@ Routes de l'API
 """
 
 import os
+import json
+import asyncio
 import time
 import uuid
+from contextlib import aclosing
 from fastapi import APIRouter, HTTPException, UploadFile, File
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import List
 from datetime import datetime
-import requests
 from dotenv import load_dotenv
 
 from .models import (
@@ -17,11 +19,23 @@ from .models import (
     ChatResponse, 
     DocumentUploadResponse, 
     DocumentInfo,
-    HealthResponse
+    HealthResponse,
+    IngestionJobStatus
 )
+from .ollama_client import ollama_client
+from .ingestion import ingestion_queue
+from .answer_cache import answer_cache
+from .health import health_monitor
+from .conversation_store import conversation_store
+from .generation_scheduler import generation_scheduler, GenerationRejected
+from ..rag.context_packer import count_tokens
+from ..rag.metrics import REGISTRY, record_stage, start_request_timings, timed
 
 load_dotenv()
 
+# Messages d'historique repris dans le prompt
+HISTORY_MESSAGES = 4
+
 # Routers
 health_router = APIRouter()
 chat_router = APIRouter()
@@ -30,7 +44,23 @@ documents_router = APIRouter()
 # Variables globales (à remplacer par un vrai système de gestion d'état)
 vector_store = None
 retriever = None
-conversation_history = {}
+
+# Métriques du chat (exposées sur /metrics)
+CHAT_REQUESTS = REGISTRY.counter(
+    "chat_requests_total", "Requêtes de chat par issue", ("outcome",)
+)
+CHAT_IN_FLIGHT = REGISTRY.gauge(
+    "chat_requests_in_flight", "Requêtes de chat en cours (streaming compris)"
+)
+INDEX_SIZE = REGISTRY.gauge(
+    "rag_index_size", "Taille de l'index RAG", ("kind",)
+)
+CACHE_STATS = REGISTRY.gauge(
+    "rag_cache", "Statistiques des caches", ("cache", "stat")
+)
+INGESTION_PENDING = REGISTRY.gauge(
+    "ingestion_queue_pending", "Fichiers en attente d'indexation"
+)
 
 # ==========================================
 # HEALTH CHECK
@@ -38,31 +68,32 @@ conversation_history = {}
 
 @health_router.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Vérifier l'état de santé de l'API"""
-    
-    # Vérifier connexion Ollama
-    ollama_connected = False
-    try:
-        response = requests.get(
-            f"{os.getenv('OLLAMA_BASE_URL')}/api/tags",
-            timeout=5
-        )
-        ollama_connected = response.status_code == 200
-    except:
-        pass
-    
-    # Vérifier vector store
-    vector_store_loaded = vector_store is not None and len(vector_store.documents) > 0
-    total_docs = len(vector_store.documents) if vector_store else 0
-    
+    """Vérifier l'état de santé de l'API (dernier relevé de la sonde, sans appel à Ollama)"""
+    snapshot = health_monitor.snapshot
     return HealthResponse(
-        status="healthy" if ollama_connected and vector_store_loaded else "degraded",
+        status="healthy" if health_monitor.ready else "degraded",
         version=os.getenv('APP_VERSION', '1.0.0'),
-        ollama_connected=ollama_connected,
-        vector_store_loaded=vector_store_loaded,
-        total_documents=total_docs
+        **snapshot.to_dict()
     )
 
+@health_router.get("/health/live")
+async def liveness():
+    """Liveness: le processus et sa boucle d'événements répondent"""
+    return {"status": "alive"}
+
+@health_router.get("/health/ready")
+async def readiness():
+    """Readiness: Ollama joignable, modèle disponible et index chargé (503 sinon)"""
+    snapshot = health_monitor.snapshot
+    body = {
+        "status": "ready" if health_monitor.ready else "not_ready",
+        "ollama_connected": snapshot.ollama_connected,
+        "model_available": snapshot.model_available,
+        "vector_store_loaded": snapshot.vector_store_loaded,
+        "checked_seconds_ago": round(snapshot.age, 1)
+    }
+    return JSONResponse(body, status_code=200 if health_monitor.ready else 503)
+
 # ==========================================
 # CHAT
 # ==========================================
@@ -71,72 +102,254 @@ async def health_check():
 async def chat(request: ChatRequest):
     """
     Endpoint principal de chat
+
+    Avec `stream=True`, la réponse est envoyée en Server-Sent Events:
+    un événement `sources`, puis un événement `token` par fragment généré,
+    et enfin `done` (ou `error`).
     """
     start_time = time.time()
+    # Temps par étape (ms): alimentent /metrics, et la réponse si demandé
+    timings = start_request_timings()
     
     # Générer ID de conversation si absent
     conv_id = request.conversation_id or f"conv_{uuid.uuid4().hex[:8]}"
     
+    # Filtre sur une métadonnée non indexée: erreur du client
+    if request.filters and vector_store is not None:
+        try:
+            vector_store.metadata_index.validate(request.filters)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    CHAT_IN_FLIGHT.inc()
+    # Une réponse en streaming garde la requête "en cours" jusqu'à sa fin
+    handed_off = False
     try:
-        # Récupérer le contexte via RAG si activé
-        context = ""
-        sources = []
+        # Derniers messages de la conversation (utilisés dans le prompt)
+        with timed("history"):
+            history = await conversation_store.get_history(conv_id, limit=HISTORY_MESSAGES)
+        query_embedding = await _embed_query(request)
         
-        if request.use_rag and retriever:
-            results = retriever.retrieve(request.message)
-            context = retriever.format_context(results)
-            
-            # Extraire les sources
-            for doc, score in results:
-                sources.append({
-                    "source": doc.metadata.get('source', 'Unknown'),
-                    "page": doc.metadata.get('page'),
-                    "score": round(score, 2)
-                })
+        # Cache sémantique: seulement pour une question sans historique ni
+        # filtre (le prompt ne dépend alors que de la question et des documents)
+        cacheable = query_embedding is not None and not history and not request.filters
+        with timed("cache_lookup"):
+            cached = answer_cache.lookup(query_embedding) if cacheable else None
+        if cached is not None:
+            print(f"⚡ Réponse en cache (question similaire: {cached.question[:60]})")
+            if request.stream:
+                handed_off = True
+                return StreamingResponse(
+                    _stream_cached(request.message, cached, conv_id, start_time, timings, request.include_timings),
+                    media_type="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+                )
+            await conversation_store.save_exchange(conv_id, request.message, cached.answer)
+            _finish_request("cached", start_time, timings)
+            return ChatResponse(
+                response=cached.answer,
+                conversation_id=conv_id,
+                sources=cached.sources or None,
+                processing_time=round(time.time() - start_time, 2),
+                cached=True,
+                timings=timings if request.include_timings else None
+            )
+        
+        # Récupérer le contexte via RAG si activé (dans un thread: la
+        # recherche peut attendre le verrou du vector store)
+        context, sources = await asyncio.to_thread(_retrieve_context, request, query_embedding)
         
         # Construire le prompt
-        prompt = _build_prompt(request.message, context, conv_id)
+        with timed("build_prompt"):
+            prompt = _build_prompt(request.message, context, history)
+            prompt_tokens = count_tokens(prompt)
+        print(f"🧮 Prompt: {prompt_tokens} tokens")
         
-        # Appeler Ollama
-        response_text = await _call_ollama(prompt, request.stream)
+        cache_embedding = query_embedding if cacheable else None
+        # Créneau de génération (503 tout de suite si Ollama est saturé)
+        flight = await _submit_generation(prompt)
+        if request.stream:
+            handed_off = True
+            return StreamingResponse(
+                _stream_chat(
+                    request.message, flight, conv_id, sources, start_time, cache_embedding,
+                    prompt_tokens, timings, request.include_timings
+                ),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
         
-        # Calculer temps de traitement
-        processing_time = round(time.time() - start_time, 2)
+        # Appeler Ollama
+        response_text = await _call_ollama(flight)
         
         # Sauvegarder dans l'historique
-        if conv_id not in conversation_history:
-            conversation_history[conv_id] = []
+        with timed("save_history"):
+            await conversation_store.save_exchange(conv_id, request.message, response_text)
+        if cache_embedding is not None:
+            answer_cache.put(cache_embedding, request.message, response_text, sources)
         
-        conversation_history[conv_id].append({
-            "role": "user",
-            "content": request.message,
-            "timestamp": datetime.now()
-        })
-        conversation_history[conv_id].append({
-            "role": "assistant",
-            "content": response_text,
-            "timestamp": datetime.now()
-        })
+        # Calculer temps de traitement
+        processing_time = round(time.time() - start_time, 2)
+        _finish_request("ok", start_time, timings)
         
         return ChatResponse(
             response=response_text,
             conversation_id=conv_id,
             sources=sources if sources else None,
-            processing_time=processing_time
+            processing_time=processing_time,
+            prompt_tokens=prompt_tokens,
+            timings=timings if request.include_timings else None
         )
     
+    except HTTPException as e:
+        _finish_request("rejected" if e.status_code == 503 else "error", start_time, timings)
+        raise
     except Exception as e:
+        _finish_request("error", start_time, timings)
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
+    finally:
+        if not handed_off:
+            CHAT_IN_FLIGHT.dec()
+
+def _finish_request(outcome: str, start_time: float, timings: dict):
+    """Compter une requête terminée et enregistrer sa durée totale"""
+    CHAT_REQUESTS.inc(outcome=outcome)
+    record_stage("total", time.time() - start_time, timings)
+
+async def _embed_query(request: ChatRequest):
+    """Embedding de la question (None si inutile, ou indisponible en mode hybride)"""
+    if not (request.use_rag and retriever and retriever.needs_embedding):
+        return None
+    try:
+        return await ollama_client.embed_query(
+            request.message, vector_store.embedding_function
+        )
+    except Exception as e:
+        # En mode hybride, BM25 prend le relais
+        if retriever.mode != 'hybrid':
+            raise
+        print(f"⚠️ Embedding indisponible, recherche lexicale seule: {e}")
+        return None
+
+def _retrieve_context(request: ChatRequest, query_embedding=None):
+    """Récupérer le contexte RAG et les sources associées"""
+    context = ""
+    sources = []
+    
+    if request.use_rag and retriever:
+        results = retriever.retrieve(
+            request.message,
+            query_embedding=query_embedding,
+            use_vector=query_embedding is not None,
+            filters=request.filters
+        )
+        # Contexte limité au budget de tokens (chunks contigus fusionnés)
+        context, used, context_tokens = retriever.pack_context(results)
+        print(f"🧮 Contexte: {context_tokens} tokens, {len(used)}/{len(results)} chunks")
+        
+        # Extraire les sources (une par page citée)
+        seen = set()
+        for doc, score in used:
+            key = (doc.metadata.get('source', 'Unknown'), doc.metadata.get('page'))
+            if key in seen:
+                continue
+            seen.add(key)
+            sources.append({
+                "source": key[0],
+                "page": key[1],
+                "score": round(score, 2)
+            })
+    
+    return context, sources
+
+def _sse_event(event: str, data: dict) -> str:
+    """Formater un événement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
 
-def _build_prompt(message: str, context: str, conv_id: str) -> str:
+async def _stream_cached(
+    message: str,
+    cached,
+    conv_id: str,
+    start_time: float,
+    timings: dict = None,
+    include_timings: bool = False
+):
+    """Envoyer une réponse du cache avec les mêmes événements que le streaming"""
+    try:
+        yield _sse_event("sources", {
+            "conversation_id": conv_id,
+            "sources": cached.sources or None
+        })
+        yield _sse_event("token", {"token": cached.answer})
+        await conversation_store.save_exchange(conv_id, message, cached.answer)
+        _finish_request("cached", start_time, timings)
+        yield _sse_event("done", {
+            "conversation_id": conv_id,
+            "processing_time": round(time.time() - start_time, 2),
+            "timestamp": datetime.now(),
+            "cached": True,
+            "timings": timings if include_timings else None
+        })
+    finally:
+        CHAT_IN_FLIGHT.dec()
+
+async def _stream_chat(
+    message: str,
+    flight,
+    conv_id: str,
+    sources: list,
+    start_time: float,
+    cache_embedding=None,
+    prompt_tokens: int = None,
+    timings: dict = None,
+    include_timings: bool = False
+):
+    """Relayer les tokens d'Ollama au fur et à mesure de leur génération"""
+    try:
+        yield _sse_event("sources", {
+            "conversation_id": conv_id,
+            "sources": sources or None,
+            "prompt_tokens": prompt_tokens
+        })
+        
+        parts = []
+        try:
+            async with aclosing(flight.stream()) as chunks:
+                async for chunk in chunks:
+                    token = chunk.get("response", "")
+                    if token:
+                        parts.append(token)
+                        yield _sse_event("token", {"token": token})
+        except Exception as e:
+            _finish_request("error", start_time, timings)
+            yield _sse_event("error", {"detail": f"Erreur Ollama: {str(e)}"})
+            return
+        
+        # L'historique n'est écrit qu'une fois la génération terminée
+        response_text = "".join(parts)
+        with timed("save_history", timings):
+            await conversation_store.save_exchange(conv_id, message, response_text)
+        if cache_embedding is not None:
+            answer_cache.put(cache_embedding, message, response_text, sources)
+        _finish_request("ok", start_time, timings)
+        
+        yield _sse_event("done", {
+            "conversation_id": conv_id,
+            "processing_time": round(time.time() - start_time, 2),
+            "timestamp": datetime.now(),
+            "cached": False,
+            "timings": timings if include_timings else None
+        })
+    finally:
+        CHAT_IN_FLIGHT.dec()
+
+def _build_prompt(message: str, context: str, history: List[dict]) -> str:
     """Construire le prompt avec contexte"""
     
-    # Récupérer l'historique
-    history = conversation_history.get(conv_id, [])
     history_text = ""
     
     if history:
-        for msg in history[-4:]:  # Garder seulement les 4 derniers messages
+        for msg in history[-HISTORY_MESSAGES:]:
             role = "Utilisateur" if msg["role"] == "user" else "Assistant"
             history_text += f"{role}: {msg['content']}\n\n"
     
@@ -177,24 +390,28 @@ RÉPONSE:"""
     
     return prompt
 
-async def _call_ollama(prompt: str, stream: bool = False) -> str:
-    """Appeler Ollama pour générer une réponse"""
+def _generation_options() -> dict:
+    """Options de génération Ollama"""
+    return {
+        "temperature": float(os.getenv('TEMPERATURE', 0.7)),
+        "num_predict": int(os.getenv('MAX_TOKENS', 2048))
+    }
+
+async def _submit_generation(prompt: str):
+    """Réserver la génération du prompt auprès de l'ordonnanceur"""
     try:
-        response = requests.post(
-            f"{os.getenv('OLLAMA_BASE_URL')}/api/generate",
-            json={
-                "model": os.getenv('OLLAMA_MODEL'),
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": float(os.getenv('TEMPERATURE', 0.7)),
-                    "num_predict": int(os.getenv('MAX_TOKENS', 2048))
-                }
-            },
-            timeout=60
+        return await generation_scheduler.submit(prompt, options=_generation_options())
+    except GenerationRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"{e}: réessayez dans {e.retry_after} s",
+            headers={"Retry-After": str(e.retry_after)}
         )
-        response.raise_for_status()
-        return response.json()["response"]
+
+async def _call_ollama(flight) -> str:
+    """Attendre la réponse complète d'une génération"""
+    try:
+        return await flight.text()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur Ollama: {str(e)}")
 
@@ -207,6 +424,7 @@ async def upload_document(file: UploadFile = File(...)):
     """
     Upload un nouveau document
     """
+    _check_writable()
     try:
         # Vérifier le type de fichier
         if not file.filename.endswith(('.pdf', '.txt')):
@@ -215,77 +433,162 @@ async def upload_document(file: UploadFile = File(...)):
                 detail="Type de fichier non supporté. Utilisez PDF ou TXT."
             )
         
-        # Sauvegarder le fichier
-        file_path = os.path.join("data/raw", file.filename)
+        # Sauvegarder le fichier (nom de base uniquement)
+        filename = os.path.basename(file.filename)
+        file_path = os.path.join(os.getenv('DATA_DIR', './data/raw'), filename)
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         
         with open(file_path, "wb") as f:
             content = await file.read()
             f.write(content)
         
-        # TODO: Traiter le document et l'ajouter au vector store
-        # Pour l'instant, on retourne juste une confirmation
+        # Traitement en arrière-plan: la réponse n'attend pas l'indexation
+        job = ingestion_queue.submit(file_path, filename)
         
         return DocumentUploadResponse(
             success=True,
-            message=f"Document '{file.filename}' uploadé avec succès",
+            message=f"Document '{filename}' uploadé, indexation en cours",
+            job_id=job.job_id,
             document=DocumentInfo(
-                filename=file.filename,
+                filename=filename,
                 size=len(content),
-                type=file.filename.split('.')[-1],
-                chunks=0,  # À calculer après traitement
+                type=filename.split('.')[-1],
+                chunks=0,  # Connu à la fin de la tâche (voir /jobs/{job_id})
                 uploaded_at=datetime.now()
             )
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur upload: {str(e)}")
 
+def _check_writable():
+    """Refuser les modifications de l'index partagé entre plusieurs workers"""
+    if vector_store is not None and vector_store.read_only:
+        raise HTTPException(
+            status_code=409,
+            detail="Index en lecture seule (plusieurs workers): indexer avec 'python scripts/index_documents.py'"
+        )
+
+@documents_router.get("/jobs/{job_id}", response_model=IngestionJobStatus)
+async def get_ingestion_job(job_id: str):
+    """
+    État d'une tâche d'ingestion
+    """
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Tâche '{job_id}' introuvable")
+    return IngestionJobStatus(**job.to_dict())
+
 @documents_router.get("/list")
 async def list_documents():
     """
     Lister tous les documents chargés
     """
-    if not vector_store or not vector_store.documents:
+    if not vector_store or not len(vector_store):
         return {"documents": [], "total": 0}
     
-    # Extraire infos uniques des documents
-    docs_info = {}
-    for doc in vector_store.documents:
-        source = doc.metadata.get('source', 'Unknown')
-        if source not in docs_info:
-            docs_info[source] = {
-                "source": source,
-                "type": doc.metadata.get('type', 'unknown'),
-                "chunks": 0
-            }
-        docs_info[source]["chunks"] += 1
+    # Un seul chunk est lu par source (pour le type)
+    docs_info = []
+    for source, ids in sorted(vector_store.source_ids.items()):
+        sample = vector_store.docstore.get(next(iter(ids)))
+        docs_info.append({
+            "source": source,
+            "type": sample.metadata.get('type', 'unknown') if sample else 'unknown',
+            "chunks": len(ids)
+        })
     
     return {
-        "documents": list(docs_info.values()),
+        "documents": docs_info,
         "total": len(docs_info)
     }
 
+@documents_router.get("/filters")
+async def list_filters():
+    """
+    Métadonnées filtrables (champ `filters` du chat) et leurs valeurs
+    """
+    if vector_store is None:
+        return {"filters": {}}
+    return {
+        "filters": {
+            key: sorted(vector_store.filter_values(key), key=str)
+            for key in vector_store.metadata_index.keys
+        }
+    }
+
 @documents_router.delete("/{filename}")
 async def delete_document(filename: str):
     """
     Supprimer un document
     """
-    # TODO: Implémenter la suppression du vector store
+    if vector_store is None:
+        raise HTTPException(status_code=503, detail="Système RAG non initialisé")
+    _check_writable()
+    if ingestion_queue.indexer is None:
+        raise HTTPException(status_code=503, detail="Indexation non configurée")
+    
+    # Les uploads sont à la racine du dossier de données: seul ce fichier est
+    # retiré (pas ses homonymes des sous-dossiers, même `source`)
+    filename = os.path.basename(filename)
+    file_path = os.path.join(os.getenv('DATA_DIR', './data/raw'), filename)
+    
+    # Retirer et sauvegarder sous le verrou de l'ingestion, sans bloquer la boucle d'événements
+    removed = await asyncio.get_running_loop().run_in_executor(
+        None, ingestion_queue.remove, file_path, filename
+    )
+    
+    file_deleted = os.path.exists(file_path)
+    if file_deleted:
+        os.remove(file_path)
+    
+    if not removed and not file_deleted:
+        raise HTTPException(status_code=404, detail=f"Document '{filename}' introuvable")
+    
     return {
-        "success": False,
-        "message": "Fonction non implémentée"
+        "success": True,
+        "message": f"Document '{filename}' supprimé",
+        "chunks_deleted": removed
     }
 
 # ==========================================
 # INITIALISATION
 # ==========================================
 
-def initialize_rag_system(vs, ret):
+def initialize_rag_system(vs, ret, indexer=None):
     """
     Initialiser le système RAG (appelé depuis main.py)
     """
     global vector_store, retriever
     vector_store = vs
     retriever = ret
-    print("✅ Système RAG initialisé dans l'API")
\ No newline at end of file
+    ingestion_queue.configure(indexer)
+    health_monitor.configure(vs)
+    print("✅ Système RAG initialisé dans l'API")
+
+def rag_initialized() -> bool:
+    return vector_store is not None
+
+def _collect_metrics():
+    """Mettre à jour les gauges lues ailleurs (index, caches, ingestion)"""
+    INGESTION_PENDING.set(ingestion_queue.pending)
+    caches = {"answer": answer_cache.stats()}
+
+    if vector_store is not None:
+        INDEX_SIZE.set(len(vector_store), kind="chunks")
+        INDEX_SIZE.set(len(vector_store.row_ids), kind="vectors")
+        INDEX_SIZE.set(len(vector_store._tombstones), kind="tombstones")
+        INDEX_SIZE.set(vector_store.lexical_index.size, kind="lexical")
+
+        embedding_function = vector_store.embedding_function
+        caches["query_embedding"] = embedding_function.query_cache.stats()
+        if embedding_function.cache is not None:
+            caches["embedding_disk"] = embedding_function.cache.stats()
+
+    for name, stats in caches.items():
+        for stat in ("hits", "misses", "hit_rate", "entries"):
+            if stat in stats:
+                CACHE_STATS.set(stats[stat], cache=name, stat=stat)
+
+REGISTRY.add_collector(_collect_metrics)
\ No newline at end of file
@@ -3,16 +3,21 @@ Module RAG (Retrieval Augmented Generation)
 """
 
 from .embeddings import OllamaEmbeddings
+from .embedding_cache import EmbeddingCache, QueryEmbeddingCache
 from .document_loader import DocumentLoader, Document
 from .text_splitter import TextSplitter
 from .vector_store import FAISSVectorStore
 from .retriever import Retriever
+from .indexer import Indexer
 
 __all__ = [
     'OllamaEmbeddings',
+    'EmbeddingCache',
+    'QueryEmbeddingCache',
     'DocumentLoader',
     'Document',
     'TextSplitter',
     'FAISSVectorStore',
-    'Retriever'
+    'Retriever',
+    'Indexer'
 ]
\ No newline at end of file
@@ -0,0 +1,277 @@
+import os
+import re
+import json
+import unicodedata
+from collections import Counter
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+from .chunk_store import save_npy
+
+BM25_PREFIX = "bm25"
+BM25_VOCAB_FILENAME = f"{BM25_PREFIX}_vocab.json"
+LEXICAL_SEGMENTS_FILENAME = "bm25_manifest.json"
+_SEGMENT_FILE_RE = re.compile(rf"^({BM25_PREFIX}_seg\d+)_")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Mots vides français les plus fréquents (peu discriminants, postings énormes)
+STOPWORDS = frozenset("""
+a au aux avec ce ces dans de des du elle en et eux il je la le les leur lui ma mais
+me meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur
+ta te tes toi ton tu un une vos votre vous c d j l m n s t y est sont
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Découper en termes: minuscules, sans accents, alphanumériques (garde ISIC, PFE, 2025...)"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return [token for token in _TOKEN_RE.findall(stripped) if token not in STOPWORDS]
+
+class BM25Index:
+    """Index inversé BM25 à postings compacts
+
+    Les postings sont stockés en CSR (tableaux numpy): pour le terme t,
+    `postings_docs[offsets[t]:offsets[t+1]]` donne les lignes des chunks et
+    `postings_weights` le poids BM25 déjà calculé. Une recherche se résume
+    à quelques additions vectorisées.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}
+        self.doc_ids = np.zeros(0, dtype='int64')
+        self.offsets = np.zeros(1, dtype='int64')
+        self.postings_docs = np.zeros(0, dtype='int32')
+        self.postings_weights = np.zeros(0, dtype='float32')
+        self.avg_length = 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.doc_ids)
+
+    def document_frequencies(self, terms: Sequence[str]) -> np.ndarray:
+        """Nombre de chunks contenant chaque terme (0 si absent)"""
+        df = np.zeros(len(terms), dtype='int64')
+        for i, term in enumerate(terms):
+            t = self.vocab.get(term)
+            if t is not None:
+                df[i] = self.offsets[t + 1] - self.offsets[t]
+        return df
+
+    @classmethod
+    def build(
+        cls,
+        items: Iterable[Tuple[int, str]],
+        k1: float = 1.5,
+        b: float = 0.75,
+        stats: "BM25Index" = None
+    ) -> "BM25Index":
+        """Construire l'index à partir de paires (id du chunk, texte)
+
+        Avec `stats` (le segment principal), l'idf et la longueur moyenne
+        tiennent compte de ses chunks: les scores d'un petit segment
+        restent comparables à ceux du segment principal.
+        """
+        index = cls(k1, b)
+        doc_ids, doc_lengths = [], []
+        term_ids, rows, tfs = [], [], []
+
+        for row, (doc_id, text) in enumerate(items):
+            counts = Counter(tokenize(text))
+            doc_ids.append(doc_id)
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_ids.append(index.vocab.setdefault(term, len(index.vocab)))
+                rows.append(row)
+                tfs.append(tf)
+
+        index.doc_ids = np.asarray(doc_ids, dtype='int64')
+        if not doc_ids:
+            return index
+
+        term_ids = np.asarray(term_ids, dtype='int64')
+        rows = np.asarray(rows, dtype='int32')
+        tfs = np.asarray(tfs, dtype='float32')
+        doc_lengths = np.asarray(doc_lengths, dtype='float32')
+
+        # Regrouper les postings par terme (CSR)
+        order = np.argsort(term_ids, kind='stable')
+        df = np.bincount(term_ids, minlength=len(index.vocab))
+        index.offsets = np.concatenate([[0], np.cumsum(df)]).astype('int64')
+        index.postings_docs = rows[order]
+
+        # Poids BM25 précalculés par posting
+        n_docs = len(doc_ids)
+        index.avg_length = float(doc_lengths.mean())
+        avg_length = index.avg_length
+        if stats is not None and stats.size:
+            terms = sorted(index.vocab, key=index.vocab.get)
+            df = df + stats.document_frequencies(terms)
+            n_docs += stats.size
+            avg_length = stats.avg_length or avg_length
+        avg_length = max(avg_length, 1.0)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype('float32')
+        tf = tfs[order]
+        norm = k1 * (1 - b + b * doc_lengths[index.postings_docs] / avg_length)
+        index.postings_weights = (idf[term_ids[order]] * tf * (k1 + 1) / (tf + norm)).astype('float32')
+        return index
+
+    def search(self, query: str, k: int = 5, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Top-k (id du chunk, score BM25) pour une requête
+
+        `allowed` est un masque booléen optionnel sur les lignes de l'index.
+        """
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids or not self.size:
+            return []
+
+        scores = np.zeros(self.size, dtype='float32')
+        for t in term_ids:
+            start, end = self.offsets[t], self.offsets[t + 1]
+            scores[self.postings_docs[start:end]] += self.postings_weights[start:end]
+        if allowed is not None:
+            scores[~allowed] = 0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            top = np.argpartition(scores[candidates], -k)[-k:]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(int(self.doc_ids[row]), float(scores[row])) for row in candidates]
+
+    def save(self, path: str, prefix: str = BM25_PREFIX):
+        """Sauvegarder à côté de l'index FAISS"""
+        save_npy(os.path.join(path, f"{prefix}_doc_ids.npy"), self.doc_ids)
+        save_npy(os.path.join(path, f"{prefix}_offsets.npy"), self.offsets)
+        save_npy(os.path.join(path, f"{prefix}_postings_docs.npy"), self.postings_docs)
+        save_npy(os.path.join(path, f"{prefix}_postings_weights.npy"), self.postings_weights)
+        vocab_path = os.path.join(path, f"{prefix}_vocab.json")
+        with open(vocab_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(
+                {"k1": self.k1, "b": self.b, "avg_length": self.avg_length, "vocab": self.vocab},
+                f,
+                ensure_ascii=False
+            )
+        os.replace(vocab_path + ".tmp", vocab_path)
+
+    @classmethod
+    def load(cls, path: str, prefix: str = BM25_PREFIX) -> "BM25Index":
+        """Charger (tableaux mappés en mémoire)"""
+        with open(os.path.join(path, f"{prefix}_vocab.json"), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        index = cls(info["k1"], info["b"])
+        index.vocab = info["vocab"]
+        index.avg_length = info.get("avg_length", 0.0)
+        index.doc_ids = np.load(os.path.join(path, f"{prefix}_doc_ids.npy"), mmap_mode='r')
+        index.offsets = np.load(os.path.join(path, f"{prefix}_offsets.npy"), mmap_mode='r')
+        index.postings_docs = np.load(os.path.join(path, f"{prefix}_postings_docs.npy"), mmap_mode='r')
+        index.postings_weights = np.load(os.path.join(path, f"{prefix}_postings_weights.npy"), mmap_mode='r')
+        return index
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, BM25_VOCAB_FILENAME))
+
+class LexicalIndex:
+    """Index BM25 incrémental: segment principal, petits segments, suppressions
+
+    Immuable: un ajout produit une nouvelle instance avec un segment de
+    plus (coût proportionnel au lot ajouté), une suppression une instance
+    qui masque les ids supprimés. Les recherches en cours gardent leur
+    instance. Le store fusionne les segments en arrière-plan.
+    """
+
+    def __init__(self, segments: Sequence[BM25Index] = (), deleted: Iterable[int] = ()):
+        self.segments = tuple(segments)
+        self.deleted = frozenset(deleted)
+        deleted_ids = np.fromiter(self.deleted, dtype='int64', count=len(self.deleted))
+        # Lignes encore vivantes de chaque segment
+        self._alive = tuple(
+            ~np.isin(np.asarray(segment.doc_ids), deleted_ids) if len(deleted_ids) else None
+            for segment in self.segments
+        )
+
+    @property
+    def main(self) -> BM25Index:
+        return self.segments[0] if self.segments else BM25Index()
+
+    @property
+    def size(self) -> int:
+        """Chunks indexés encore vivants"""
+        return sum(
+            segment.size if alive is None else int(np.count_nonzero(alive))
+            for segment, alive in zip(self.segments, self._alive)
+        )
+
+    @property
+    def pending(self) -> int:
+        """Chunks hors du segment principal ou supprimés (à fusionner)"""
+        return sum(segment.size for segment in self.segments[1:]) + len(self.deleted)
+
+    def with_segment(self, segment: BM25Index) -> "LexicalIndex":
+        return LexicalIndex(self.segments + (segment,), self.deleted)
+
+    def without(self, ids: Iterable[int]) -> "LexicalIndex":
+        return LexicalIndex(self.segments, self.deleted.union(ids))
+
+    def live_ids(self, segments: Sequence[BM25Index] = None) -> List[int]:
+        """Ids vivants (de tous les segments ou de `segments`)"""
+        ids = []
+        for segment, alive in zip(self.segments, self._alive):
+            if segments is not None and not any(segment is s for s in segments):
+                continue
+            doc_ids = np.asarray(segment.doc_ids)
+            ids.extend((doc_ids if alive is None else doc_ids[alive]).tolist())
+        return ids
+
+    def search(self, query: str, k: int = 5, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Top-k (id du chunk, score BM25); `mask` est un masque booléen optionnel sur les ids"""
+        hits = []
+        for segment, alive in zip(self.segments, self._alive):
+            allowed = alive
+            if mask is not None:
+                doc_ids = np.asarray(segment.doc_ids)
+                in_mask = np.zeros(len(doc_ids), dtype=bool)
+                in_range = doc_ids < len(mask)
+                in_mask[in_range] = mask[doc_ids[in_range]]
+                allowed = in_mask if allowed is None else allowed & in_mask
+            hits.extend(segment.search(query, k, allowed=allowed))
+        hits.sort(key=lambda hit: -hit[1])
+        return hits[:k]
+
+    def save(self, path: str):
+        """Sauvegarder les segments et les suppressions (sans fusion)"""
+        prefixes = [BM25_PREFIX] + [f"{BM25_PREFIX}_seg{i}" for i in range(1, len(self.segments))]
+        for segment, prefix in zip(self.segments, prefixes):
+            segment.save(path, prefix)
+        save_npy(
+            os.path.join(path, f"{BM25_PREFIX}_deleted.npy"),
+            np.asarray(sorted(self.deleted), dtype='int64')
+        )
+        manifest_path = os.path.join(path, LEXICAL_SEGMENTS_FILENAME)
+        with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({"segments": prefixes[:len(self.segments)]}, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+        # Segments d'une sauvegarde précédente, fusionnés depuis
+        for filename in os.listdir(path):
+            match = _SEGMENT_FILE_RE.match(filename)
+            if match and match.group(1) not in prefixes:
+                os.remove(os.path.join(path, filename))
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        manifest_path = os.path.join(path, LEXICAL_SEGMENTS_FILENAME)
+        if not os.path.exists(manifest_path):
+            # Sauvegarde antérieure aux segments: un seul index
+            return cls([BM25Index.load(path)])
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            prefixes = json.load(f)["segments"]
+        deleted = np.load(os.path.join(path, f"{BM25_PREFIX}_deleted.npy"))
+        return cls([BM25Index.load(path, prefix) for prefix in prefixes], deleted.tolist())
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return BM25Index.exists(path)
@@ -0,0 +1,191 @@
+import os
+import mmap
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+
+from .document_loader import Document
+
+_MISSING = -1
+
+class ChunkStore:
+    """Stockage des chunks (texte + métadonnées) indexé par identifiant
+
+    Les chunks chargés depuis le disque restent dans des fichiers mappés en
+    mémoire (texte UTF-8 contigu + offsets, métadonnées en colonnes
+    encodées par dictionnaire); un `Document` n'est construit qu'à la
+    demande. Les chunks ajoutés ensuite sont gardés en mémoire.
+    """
+
+    def __init__(self):
+        # Segment figé (chargé depuis le disque), trié par id
+        self._ids = np.zeros(0, dtype='int64')
+        self._blob = b""
+        self._offsets = np.zeros(1, dtype='int64')
+        self._columns: Dict[str, tuple] = {}  # clé -> (valeurs, codes)
+        self._deleted = set()
+        # Chunks ajoutés depuis le chargement
+        self._recent: Dict[int, Document] = {}
+
+    # ------------------------------------------------------------------
+    # Accès type dict
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._ids) - len(self._deleted) + len(self._recent)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._recent or self._row(doc_id) is not None
+
+    def __getitem__(self, doc_id: int) -> Document:
+        doc = self.get(doc_id)
+        if doc is None:
+            raise KeyError(doc_id)
+        return doc
+
+    def __setitem__(self, doc_id: int, doc: Document):
+        self._recent[doc_id] = doc
+
+    def get(self, doc_id: int, default=None) -> Optional[Document]:
+        doc = self._recent.get(doc_id)
+        if doc is not None:
+            return doc
+        row = self._row(doc_id)
+        return self._materialize(row) if row is not None else default
+
+    def pop(self, doc_id: int, default=None) -> Optional[Document]:
+        if doc_id in self._recent:
+            return self._recent.pop(doc_id)
+        row = self._row(doc_id)
+        if row is None:
+            return default
+        self._deleted.add(doc_id)
+        return self._materialize(row)
+
+    def keys(self) -> Iterator[int]:
+        for doc_id in self._ids.tolist():
+            if doc_id not in self._deleted:
+                yield doc_id
+        yield from self._recent.keys()
+
+    def values(self) -> Iterator[Document]:
+        for doc_id in self.keys():
+            yield self[doc_id]
+
+    def snapshot(self) -> "ChunkStore":
+        """Copie figée (segment partagé, ajouts et suppressions copiés), pour sauvegarder hors verrou"""
+        store = ChunkStore()
+        store._ids, store._blob, store._offsets = self._ids, self._blob, self._offsets
+        store._columns = dict(self._columns)
+        store._deleted = set(self._deleted)
+        store._recent = dict(self._recent)
+        return store
+
+    def _row(self, doc_id: int) -> Optional[int]:
+        """Ligne du segment figé pour un id vivant, sinon None"""
+        if doc_id in self._deleted or not len(self._ids):
+            return None
+        row = int(np.searchsorted(self._ids, doc_id))
+        if row < len(self._ids) and self._ids[row] == doc_id:
+            return row
+        return None
+
+    def _materialize(self, row: int) -> Document:
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        metadata = {}
+        for key, (values, codes) in self._columns.items():
+            code = int(codes[row])
+            if code != _MISSING:
+                metadata[key] = values[code]
+        return Document(
+            page_content=bytes(self._blob[start:end]).decode('utf-8'),
+            metadata=metadata,
+            id=int(self._ids[row])
+        )
+
+    def ids_by_value(self, key: str) -> Dict[object, List[int]]:
+        """Regrouper les ids vivants par valeur d'une métadonnée"""
+        groups: Dict[object, List[int]] = {}
+        if key in self._columns and len(self._ids):
+            values, codes = self._columns[key]
+            codes = np.asarray(codes)
+            order = np.argsort(codes, kind='stable')
+            sorted_codes = codes[order]
+            bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+            for rows in np.split(order, bounds):
+                code = int(codes[rows[0]])
+                if code == _MISSING:
+                    continue
+                ids = [i for i in self._ids[rows].tolist() if i not in self._deleted]
+                if ids:
+                    groups.setdefault(values[code], []).extend(ids)
+        for doc_id, doc in self._recent.items():
+            if key in doc.metadata:
+                groups.setdefault(doc.metadata[key], []).append(doc_id)
+        return groups
+
+    # ------------------------------------------------------------------
+    # Persistance
+    # ------------------------------------------------------------------
+
+    def save(self, path: str, ids: List[int]) -> Dict:
+        """Écrire les chunks `ids` (dans cet ordre) et retourner le schéma des colonnes"""
+        offsets = np.zeros(len(ids) + 1, dtype='int64')
+        dictionaries: Dict[str, Dict] = {}
+        codes: Dict[str, np.ndarray] = {}
+
+        with open(os.path.join(path, "texts.bin.tmp"), 'wb') as blob:
+            position = 0
+            for row, doc_id in enumerate(ids):
+                doc = self[doc_id]
+                data = doc.page_content.encode('utf-8')
+                blob.write(data)
+                position += len(data)
+                offsets[row + 1] = position
+
+                for key, value in doc.metadata.items():
+                    if key not in codes:
+                        codes[key] = np.full(len(ids), _MISSING, dtype='int32')
+                        dictionaries[key] = {}
+                    # Le type fait partie de la clé: 1 et "1" restent distincts
+                    code = dictionaries[key].setdefault((type(value).__name__, value), len(dictionaries[key]))
+                    codes[key][row] = code
+
+        save_npy(os.path.join(path, "text_offsets.npy"), offsets)
+        save_npy(os.path.join(path, "chunk_ids.npy"), np.asarray(ids, dtype='int64'))
+        columns = {}
+        for i, key in enumerate(sorted(codes)):
+            filename = f"meta_{i}.npy"
+            save_npy(os.path.join(path, filename), codes[key])
+            columns[key] = {
+                "file": filename,
+                "values": [value for _, value in dictionaries[key]]
+            }
+        os.replace(os.path.join(path, "texts.bin.tmp"), os.path.join(path, "texts.bin"))
+        return columns
+
+    @classmethod
+    def load(cls, path: str, columns: Dict) -> "ChunkStore":
+        """Mapper en mémoire les fichiers écrits par `save`"""
+        store = cls()
+        store._ids = np.load(os.path.join(path, "chunk_ids.npy"), mmap_mode='r')
+        store._offsets = np.load(os.path.join(path, "text_offsets.npy"), mmap_mode='r')
+
+        blob_path = os.path.join(path, "texts.bin")
+        if os.path.getsize(blob_path) > 0:
+            with open(blob_path, 'rb') as f:
+                store._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        for key, column in columns.items():
+            store._columns[key] = (
+                column["values"],
+                np.load(os.path.join(path, column["file"]), mmap_mode='r')
+            )
+        return store
+
+
+def save_npy(file_path: str, array: np.ndarray):
+    """np.save atomique (écriture puis renommage)"""
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, file_path)
@@ -0,0 +1,90 @@
+import re
+from typing import List, Tuple
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    """Estimation du nombre de tokens (tokenizer BPE type Llama 3)
+
+    Un mot court = 1 token, un mot long ≈ un token par tranche de 6
+    caractères, chaque signe de ponctuation = 1 token. Légèrement
+    pessimiste sur du français: le budget n'est pas dépassé.
+    """
+    return sum(1 + (len(piece) - 1) // 6 for piece in _TOKEN_RE.findall(text))
+
+def chunk_tokens(doc) -> int:
+    """Tokens d'un chunk: précalculés à l'ingestion, sinon estimés"""
+    tokens = doc.metadata.get('token_count')
+    return tokens if tokens is not None else count_tokens(doc.page_content)
+
+class PackedSegment:
+    """Passage du contexte: un ou plusieurs chunks contigus d'une même page"""
+
+    def __init__(self, doc, score: float):
+        self.source = doc.metadata.get('source', 'Unknown')
+        self.page = doc.metadata.get('page', '')
+        self.start = doc.metadata.get('start_index')
+        self.text = doc.page_content
+        self.score = score
+        self.docs = [doc]
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.text)
+
+    def extension(self, doc) -> str:
+        """Texte que `doc` ajouterait à ce passage, ou None s'il n'est pas contigu"""
+        start = doc.metadata.get('start_index')
+        if self.start is None or start is None:
+            return None
+        if (doc.metadata.get('source', 'Unknown'), doc.metadata.get('page', '')) != (self.source, self.page):
+            return None
+        end = start + len(doc.page_content)
+        if start > self.end or end < self.start:
+            return None  # Ni chevauchement ni contact
+        if start >= self.start:
+            return doc.page_content[self.end - start:] if end > self.end else ""
+        # Chunk situé avant le passage (ajouté en tête)
+        return doc.page_content[:self.start - start]
+
+    def extend(self, doc, extra: str):
+        start = doc.metadata['start_index']
+        if start < self.start:
+            self.text = extra + self.text
+            self.start = start
+        else:
+            self.text += extra
+        self.docs.append(doc)
+
+def pack_segments(results: List[Tuple], max_tokens: int, header_tokens: int = 12) -> Tuple[List[PackedSegment], int]:
+    """Remplir un budget de tokens avec les résultats, par score décroissant
+
+    Les chunks qui chevauchent ou touchent un passage déjà retenu (même
+    source, même page) y sont fusionnés: le recouvrement du découpage
+    n'est compté et envoyé qu'une fois. Un chunk trop gros pour le reste
+    du budget est sauté au profit des suivants.
+
+    Retourne les passages (ordre de pertinence) et leur nombre de tokens.
+    """
+    segments: List[PackedSegment] = []
+    used = 0
+    for doc, score in sorted(results, key=lambda item: item[1], reverse=True):
+        merged = False
+        for segment in segments:
+            extra = segment.extension(doc)
+            if extra is None:
+                continue
+            cost = count_tokens(extra)
+            if used + cost <= max_tokens:
+                segment.extend(doc, extra)
+                used += cost
+            merged = True
+            break
+        if merged:
+            continue
+
+        cost = chunk_tokens(doc) + header_tokens
+        if used + cost <= max_tokens:
+            segments.append(PackedSegment(doc, score))
+            used += cost
+    return segments, used
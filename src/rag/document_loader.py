@@ -1,13 +1,20 @@
 import os
-from typing import List
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List
 from pathlib import Path
 from pypdf import PdfReader
 
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt')
+HEAVY_EXTENSIONS = ('.pdf',)  # Analysés dans le pool de processus
+
 class Document:
     """Représente un document"""
-    def __init__(self, page_content: str, metadata: dict = None):
+    def __init__(self, page_content: str, metadata: dict = None, id: int = None):
         self.page_content = page_content
         self.metadata = metadata or {}
+        self.id = id  # Identifiant stable attribué par le vector store
     
     def __repr__(self):
         return f"Document(content={self.page_content[:50]}..., metadata={self.metadata})"
@@ -18,28 +25,34 @@ class DocumentLoader:
     @staticmethod
     def load_pdf(file_path: str) -> List[Document]:
         """Charger un PDF"""
-        documents = []
         try:
-            reader = PdfReader(file_path)
-            filename = os.path.basename(file_path)
-            
-            for i, page in enumerate(reader.pages):
-                text = page.extract_text()
-                if text.strip():
-                    doc = Document(
-                        page_content=text,
-                        metadata={
-                            "source": filename,
-                            "page": i + 1,
-                            "type": "pdf",
-                            "path": file_path
-                        }
-                    )
-                    documents.append(doc)
-            
-            print(f"📄 {filename}: {len(documents)} pages chargées")
+            documents = DocumentLoader.read_pdf(file_path)
+            print(f"📄 {os.path.basename(file_path)}: {len(documents)} pages chargées")
+            return documents
         except Exception as e:
             print(f"❌ Erreur PDF {file_path}: {e}")
+            return []
+    
+    @staticmethod
+    def read_pdf(file_path: str) -> List[Document]:
+        """Lire un PDF page par page (lève une exception en cas d'erreur)"""
+        documents = []
+        reader = PdfReader(file_path)
+        filename = os.path.basename(file_path)
+        
+        for i, page in enumerate(reader.pages):
+            text = page.extract_text()
+            if text.strip():
+                doc = Document(
+                    page_content=text,
+                    metadata={
+                        "source": filename,
+                        "page": i + 1,
+                        "type": "pdf",
+                        "path": file_path
+                    }
+                )
+                documents.append(doc)
         
         return documents
     
@@ -47,24 +60,107 @@ class DocumentLoader:
     def load_txt(file_path: str) -> List[Document]:
         """Charger un fichier texte"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            filename = os.path.basename(file_path)
-            doc = Document(
-                page_content=content,
-                metadata={
-                    "source": filename,
-                    "type": "txt",
-                    "path": file_path
-                }
-            )
-            print(f"📝 {filename}: chargé")
-            return [doc]
+            documents = DocumentLoader.read_txt(file_path)
+            print(f"📝 {os.path.basename(file_path)}: chargé")
+            return documents
         except Exception as e:
             print(f"❌ Erreur TXT {file_path}: {e}")
             return []
     
+    @staticmethod
+    def read_txt(file_path: str) -> List[Document]:
+        """Lire un fichier texte (lève une exception en cas d'erreur)"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        
+        filename = os.path.basename(file_path)
+        doc = Document(
+            page_content=content,
+            metadata={
+                "source": filename,
+                "type": "txt",
+                "path": file_path
+            }
+        )
+        return [doc]
+    
+    @staticmethod
+    def load_file(file_path: str) -> List[Document]:
+        """Charger un fichier selon son extension"""
+        suffix = Path(file_path).suffix.lower()
+        if suffix == '.pdf':
+            return DocumentLoader.load_pdf(file_path)
+        if suffix == '.txt':
+            return DocumentLoader.load_txt(file_path)
+        return []
+    
+    @staticmethod
+    def list_files(directory_path: str) -> List[Path]:
+        """Lister les fichiers supportés d'un dossier (ordre stable)"""
+        return sorted(
+            file_path for file_path in Path(directory_path).rglob("*")
+            if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS
+        )
+    
+    @staticmethod
+    def read_file(file_path: str) -> List[Document]:
+        """Lire un fichier selon son extension (lève une exception en cas d'erreur)"""
+        suffix = Path(file_path).suffix.lower()
+        if suffix == '.pdf':
+            return DocumentLoader.read_pdf(file_path)
+        if suffix == '.txt':
+            return DocumentLoader.read_txt(file_path)
+        raise ValueError(f"Extension non supportée: {suffix}")
+    
+    @staticmethod
+    def iter_load(
+        file_paths: Iterable,
+        workers: int = None,
+        max_pending: int = None
+    ) -> Iterator["LoadResult"]:
+        """Charger des fichiers en pipeline: un `LoadResult` par fichier, dans l'ordre
+
+        Les formats lourds (PDF) sont analysés dans un pool de processus;
+        au plus `max_pending` fichiers sont en cours ou en attente de
+        lecture par l'appelant (contre-pression: le pool n'avance pas plus
+        vite que le découpage et l'embedding qui consomment les résultats).
+        Les erreurs sont rapportées dans `LoadResult.error`.
+        """
+        workers = workers or int(os.getenv('DOCUMENT_LOADER_WORKERS', 0)) or os.cpu_count() or 1
+        max_pending = max_pending or int(os.getenv('DOCUMENT_LOADER_MAX_PENDING', 0)) or 2 * workers
+        file_paths = iter(file_paths)
+        
+        if workers <= 1:
+            for file_path in file_paths:
+                yield _load_result(str(file_path))
+            return
+        
+        pending = deque()  # (chemin, future ou None), dans l'ordre des fichiers
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            def submit_next() -> bool:
+                file_path = next(file_paths, None)
+                if file_path is None:
+                    return False
+                file_path = str(file_path)
+                future = None
+                if Path(file_path).suffix.lower() in HEAVY_EXTENSIONS:
+                    future = executor.submit(_load_result, file_path)
+                pending.append((file_path, future))  # Sans future: lu ici, au moment voulu
+                return True
+            
+            while len(pending) < max_pending and submit_next():
+                pass
+            while pending:
+                file_path, future = pending.popleft()
+                submit_next()
+                if future is None:
+                    yield _load_result(file_path)
+                    continue
+                try:
+                    yield future.result()
+                except Exception as e:  # Processus du pool interrompu
+                    yield LoadResult(file_path, error=f"{type(e).__name__}: {e}")
+    
     @staticmethod
     def load_directory(directory_path: str) -> List[Document]:
         """Charger tous les documents d'un dossier"""
@@ -77,14 +173,42 @@ class DocumentLoader:
         
         print(f"📂 Chargement depuis: {directory_path}")
         
-        for file_path in path.rglob("*"):
-            if file_path.is_file():
-                if file_path.suffix.lower() == '.pdf':
-                    docs = DocumentLoader.load_pdf(str(file_path))
-                    all_documents.extend(docs)
-                elif file_path.suffix.lower() == '.txt':
-                    docs = DocumentLoader.load_txt(str(file_path))
-                    all_documents.extend(docs)
+        for result in DocumentLoader.iter_load(DocumentLoader.list_files(directory_path)):
+            if result.error:
+                print(f"❌ {result.file_path}: {result.error}")
+            all_documents.extend(result.documents)
         
         print(f"✅ Total: {len(all_documents)} documents chargés\n")
-        return all_documents
\ No newline at end of file
+        return all_documents
+
+
+class LoadResult:
+    """Résultat du chargement d'un fichier"""
+    
+    def __init__(self, file_path: str, documents: List[Document] = None, error: str = None, seconds: float = 0.0):
+        self.file_path = file_path
+        self.documents = documents or []
+        self.error = error
+        self.seconds = seconds
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+    
+    def to_dict(self) -> dict:
+        return {
+            "file": self.file_path,
+            "documents": len(self.documents),
+            "error": self.error,
+            "seconds": round(self.seconds, 3)
+        }
+
+
+def _load_result(file_path: str) -> LoadResult:
+    """Lire un fichier sans lever d'exception (exécuté aussi dans les processus du pool)"""
+    start = time.perf_counter()
+    try:
+        documents = DocumentLoader.read_file(file_path)
+        return LoadResult(file_path, documents, seconds=time.perf_counter() - start)
+    except Exception as e:
+        return LoadResult(file_path, error=f"{type(e).__name__}: {e}", seconds=time.perf_counter() - start)
@@ -0,0 +1,235 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Nombre max de paramètres par requête SQL (limite SQLite = 999 sur vieilles versions)
+_SQL_CHUNK = 500
+
+def text_hash(text: str) -> str:
+    """Empreinte stable d'un texte (clé du cache)"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class EmbeddingCache:
+    """Cache disque des embeddings, adressé par (modèle, hash du texte)
+
+    Les vecteurs sont stockés en float32 dans SQLite. Quand la taille totale
+    dépasse `max_size_mb`, les entrées les moins récemment utilisées sont
+    supprimées.
+    """
+
+    def __init__(self, path: str = None, max_size_mb: float = None):
+        self.path = path or os.getenv(
+            'EMBEDDING_CACHE_PATH', './data/embeddings/embedding_cache.sqlite'
+        )
+        max_size_mb = max_size_mb or float(os.getenv('EMBEDDING_CACHE_MAX_MB', 512))
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+
+        self._size_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        print(f"🗃️ Cache embeddings: {self.path} ({self._size_bytes / 1e6:.1f} Mo)")
+
+    def get_many(self, model: str, hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """Récupérer les vecteurs connus; les absents ne sont pas dans le résultat"""
+        hashes = list(dict.fromkeys(hashes))
+        found = {}
+        now = time.time()
+
+        with self._lock:
+            for start in range(0, len(hashes), _SQL_CHUNK):
+                chunk = hashes[start:start + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk]
+                ).fetchall()
+                for h, blob in rows:
+                    vector = array('f')
+                    vector.frombytes(blob)
+                    found[h] = vector.tolist()
+
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, List[float]]]):
+        """Enregistrer des vecteurs en une seule transaction"""
+        now = time.time()
+        rows = [
+            (model, h, array('f', vector).tobytes(), now)
+            for h, vector in items
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            hashes = [row[1] for row in rows]
+            replaced = 0
+            for start in range(0, len(hashes), _SQL_CHUNK):
+                chunk = hashes[start:start + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                replaced += self._conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk]
+                ).fetchone()[0]
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._size_bytes += sum(len(row[2]) for row in rows) - replaced
+            self._evict_if_needed()
+            self._conn.commit()
+
+    def _evict_if_needed(self):
+        """Supprimer les entrées LRU jusqu'à repasser sous 90% de la taille max"""
+        if self._size_bytes <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        cursor = self._conn.execute(
+            "SELECT model, text_hash, LENGTH(vector) FROM embeddings ORDER BY last_used"
+        )
+        to_delete = []
+        for model, h, size in cursor:
+            if self._size_bytes <= target:
+                break
+            to_delete.append((model, h))
+            self._size_bytes -= size
+
+        self._conn.executemany(
+            "DELETE FROM embeddings WHERE model = ? AND text_hash = ?", to_delete
+        )
+        self.evictions += len(to_delete)
+
+    def clear(self):
+        """Vider le cache"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._size_bytes = 0
+
+    def stats(self) -> Dict:
+        """Statistiques du cache"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "size_bytes": self._size_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    def close(self):
+        """Fermer la connexion SQLite"""
+        with self._lock:
+            self._conn.close()
+
+
+def normalize_query(text: str) -> str:
+    """Forme canonique d'une question: minuscules, sans accents, espaces réduits"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.split())
+
+class QueryEmbeddingCache:
+    """Cache mémoire LRU + TTL des embeddings de requêtes
+
+    Les vecteurs sont gardés en float32 compact (array) et le nombre
+    d'entrées est borné par `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_seconds: float = None):
+        self.max_entries = max_entries or int(os.getenv('QUERY_CACHE_MAX_ENTRIES', 2048))
+        self.ttl_seconds = ttl_seconds or float(os.getenv('QUERY_CACHE_TTL', 3600))
+        self._entries = OrderedDict()  # clé -> (expiration, array('f'))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model: str, query: str) -> Optional[List[float]]:
+        """Retourner l'embedding en cache, ou None"""
+        key = (model, normalize_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1].tolist()
+
+            if entry is not None:
+                del self._entries[key]  # Expiré
+            self.misses += 1
+            return None
+
+    def put(self, model: str, query: str, embedding: List[float]):
+        """Mémoriser un embedding de requête"""
+        key = (model, normalize_query(query))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, array('f', embedding))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Vider le cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Statistiques du cache"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries
+        }
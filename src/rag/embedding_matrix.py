@@ -0,0 +1,116 @@
+import os
+import tempfile
+import threading
+from typing import Optional, Tuple
+import numpy as np
+
+from .chunk_store import save_npy
+
+EMBEDDING_DTYPES = ('float32', 'float16', 'int8')
+
+_BLOCK_ROWS = 65_536  # Copies et reconstructions par blocs (mémoire bornée)
+
+class EmbeddingMatrix:
+    """Copie de référence des embeddings, sur disque et mappée en mémoire
+
+    Sert au re-scoring, au MMR, aux recherches filtrées exactes et à la
+    reconstruction de l'index. Les lignes d'un index chargé restent dans
+    embeddings.npy; au premier ajout, elles sont recopiées par blocs dans
+    un fichier de travail temporaire, à la fin duquel les ajouts suivants
+    sont écrits avant de re-mapper le fichier. Les lignes ne bougent
+    jamais: un tableau déjà obtenu reste valide. En int8, chaque ligne a
+    son échelle (max |x| / 127).
+    """
+
+    def __init__(self, dimension: int, dtype: str = 'float32'):
+        if dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Encodage des embeddings inconnu: {dtype} (attendu: {', '.join(EMBEDDING_DTYPES)})")
+        self.dimension = dimension
+        self.dtype = dtype
+        self.data = np.zeros((0, dimension), dtype=dtype)
+        self.scales = np.zeros(0, dtype='float32') if dtype == 'int8' else None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self.dtype != 'int8':
+            return np.ascontiguousarray(vectors, dtype=self.dtype), None
+        scales = (np.abs(vectors).max(axis=1) / 127).astype('float32')
+        scales[scales == 0] = 1
+        codes = np.rint(vectors / scales[:, None]).astype('int8')
+        return codes, scales
+
+    def rows(self, rows) -> np.ndarray:
+        """Lignes décodées en float32"""
+        data, scales = self.data, self.scales
+        vectors = np.asarray(data[rows], dtype='float32')
+        if scales is not None:
+            vectors *= scales[rows][:, None]
+        return vectors
+
+    def make_appendable(self):
+        """Recopier les lignes mappées dans un fichier de travail (sans effet s'il existe)"""
+        with self._lock:
+            if self._file is not None:
+                return
+            f = tempfile.TemporaryFile(dir=os.getenv('VECTOR_TMP_DIR') or None)
+            data = self.data
+            for start in range(0, len(data), _BLOCK_ROWS):
+                f.write(np.ascontiguousarray(data[start:start + _BLOCK_ROWS]).tobytes())
+            f.flush()
+            self._file = f
+
+    def append(self, vectors: np.ndarray):
+        """Ajouter des lignes (float32) à la fin"""
+        if not len(vectors):
+            return
+        codes, scales = self._encode(vectors)
+        self.make_appendable()
+        with self._lock:
+            n = len(self.data)
+            self._file.seek(n * self.dimension * codes.itemsize)
+            self._file.write(codes.tobytes())
+            self._file.flush()
+            # Échelles d'abord: un lecteur qui a pris `data` avant l'ajout reste cohérent
+            if scales is not None:
+                self.scales = np.concatenate([self.scales, scales])
+            self.data = np.memmap(self._file, dtype=self.dtype, mode='r', shape=(n + len(codes), self.dimension))
+
+    def select(self, rows: np.ndarray, dtype: str = None) -> "EmbeddingMatrix":
+        """Nouvelle matrice avec `rows` (dans cet ordre), ré-encodée si `dtype` change"""
+        matrix = EmbeddingMatrix(self.dimension, dtype or self.dtype)
+        matrix.make_appendable()
+        for start in range(0, len(rows), _BLOCK_ROWS):
+            matrix.append(self.rows(rows[start:start + _BLOCK_ROWS]))
+        return matrix
+
+    def frozen(self) -> "EmbeddingMatrix":
+        """Vue figée des lignes actuelles (pour sauvegarder hors verrou)"""
+        matrix = EmbeddingMatrix(self.dimension, self.dtype)
+        matrix.data = self.data
+        if self.scales is not None:
+            matrix.scales = self.scales[:len(matrix.data)]
+        return matrix
+
+    def save(self, path: str):
+        """Écrire embeddings.npy (et embeddings_scale.npy en int8) sans copie en mémoire"""
+        save_npy(os.path.join(path, "embeddings.npy"), self.data)
+        if self.scales is not None:
+            save_npy(os.path.join(path, "embeddings_scale.npy"), self.scales)
+
+    @classmethod
+    def load(cls, path: str, dimension: int) -> "EmbeddingMatrix":
+        """Mapper embeddings.npy (l'encodage est celui du fichier)"""
+        data = np.load(os.path.join(path, "embeddings.npy"), mmap_mode='r')
+        matrix = cls(dimension, str(data.dtype))
+        matrix.data = data
+        if matrix.dtype == 'int8':
+            matrix.scales = np.load(os.path.join(path, "embeddings_scale.npy"))
+        return matrix
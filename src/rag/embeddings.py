@@ -1,43 +1,163 @@
 import os
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+from .embedding_cache import EmbeddingCache, QueryEmbeddingCache, text_hash
+
 load_dotenv()
 
+# Limite de caractères envoyés au modèle (évite les erreurs de contexte)
+MAX_EMBEDDING_CHARS = 2000
+
 class OllamaEmbeddings:
     """Génère des embeddings avec Ollama"""
-    
-    def __init__(self, model_name: str = None):
+
+    def __init__(
+        self,
+        model_name: str = None,
+        batch_size: int = None,
+        concurrency: int = None,
+        max_retries: int = None,
+        cache: EmbeddingCache = None,
+        query_cache: QueryEmbeddingCache = None
+    ):
         self.model_name = model_name or os.getenv('OLLAMA_EMBEDDING_MODEL', 'nomic-embed-text')
         self.base_url = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
-        print(f"🔌 Embeddings: {self.model_name}")
-    
+        self.batch_size = batch_size or int(os.getenv('EMBEDDING_BATCH_SIZE', 32))
+        self.concurrency = concurrency or int(os.getenv('EMBEDDING_CONCURRENCY', 4))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('EMBEDDING_MAX_RETRIES', 3))
+
+        # Session partagée: les connexions TCP sont réutilisées entre les appels
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(self.concurrency, 1))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Cache disque (désactivable avec EMBEDDING_CACHE_ENABLED=false)
+        if cache is None and os.getenv('EMBEDDING_CACHE_ENABLED', 'True').lower() == 'true':
+            cache = EmbeddingCache()
+        self.cache = cache
+        self.query_cache = query_cache or QueryEmbeddingCache()
+
+        # Passe à False si le serveur ne connaît pas /api/embed (Ollama < 0.3)
+        self._batch_endpoint = True
+        print(f"🔌 Embeddings: {self.model_name} (batch={self.batch_size}, concurrence={self.concurrency})")
+
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Générer embeddings pour plusieurs documents"""
-        embeddings = []
+        """Générer embeddings pour plusieurs documents (par lots concurrents)"""
+        if not texts:
+            return []
+        if self.cache is None:
+            return self._embed_uncached(texts)
+
+        # Seuls les textes absents du cache (et dédoublonnés) partent vers Ollama
+        hashes = [text_hash(text[:MAX_EMBEDDING_CHARS]) for text in texts]
+        known = self.cache.get_many(self.model_name, hashes)
+
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in known and h not in missing:
+                missing[h] = text
+
+        print(f"🗃️ Cache: {len(texts) - len(missing)}/{len(texts)} embeddings réutilisés")
+        if missing:
+            new_embeddings = self._embed_uncached(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_embeddings))
+            self.cache.put_many(self.model_name, computed.items())
+            known.update(computed)
+
+        return [known[h] for h in hashes]
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        """Embedder des textes par lots concurrents, sans passer par le cache"""
         total = len(texts)
-        
-        for i, text in enumerate(texts, 1):
-            print(f"📊 Embedding {i}/{total}...", end='\r')
-            embedding = self._get_embedding(text)
-            embeddings.append(embedding)
-        
+        batches = [
+            texts[start:start + self.batch_size]
+            for start in range(0, total, self.batch_size)
+        ]
+        embeddings = [None] * len(batches)
+        done = 0
+
+        # executor.map conserve l'ordre des lots, donc l'ordre des textes
+        with ThreadPoolExecutor(max_workers=max(self.concurrency, 1)) as executor:
+            for i, batch_embeddings in enumerate(executor.map(self._embed_batch, batches)):
+                embeddings[i] = batch_embeddings
+                done += len(batch_embeddings)
+                print(f"📊 Embedding {done}/{total}...", end='\r')
+
         print(f"\n✅ {total} embeddings générés")
-        return embeddings
-    
+        return [embedding for batch in embeddings for embedding in batch]
+
     def embed_query(self, text: str) -> List[float]:
         """Générer embedding pour une requête"""
-        return self._get_embedding(text)
-    
+        cached = self.query_cache.get(self.model_name, text)
+        if cached is not None:
+            return cached
+
+        # Même endpoint que les documents: /api/embed renvoie des vecteurs normalisés
+        embedding = self._embed_batch([text])[0]
+        self.query_cache.put(self.model_name, text, embedding)
+        return embedding
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Générer embeddings pour plusieurs requêtes (cache puis un seul lot pour les absentes)"""
+        embeddings = [self.query_cache.get(self.model_name, text) for text in texts]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+        if missing:
+            computed = self._embed_uncached([texts[i] for i in missing])
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+                self.query_cache.put(self.model_name, texts[i], embedding)
+
+        return embeddings
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embedder un lot via /api/embed, avec réessais sur le lot entier"""
+        if not self._batch_endpoint:
+            return [self._get_embedding(text) for text in texts]
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/api/embed",
+                    json={
+                        "model": self.model_name,
+                        "input": [text[:MAX_EMBEDDING_CHARS] for text in texts]
+                    },
+                    timeout=30 + 2 * len(texts)
+                )
+                if response.status_code == 404:
+                    # Ancienne version d'Ollama: repli sur l'endpoint unitaire
+                    print("\n⚠️ /api/embed indisponible, repli sur /api/embeddings")
+                    self._batch_endpoint = False
+                    return [self._get_embedding(text) for text in texts]
+
+                response.raise_for_status()
+                embeddings = response.json()["embeddings"]
+                if len(embeddings) != len(texts):
+                    raise ValueError(
+                        f"{len(embeddings)} embeddings reçus pour {len(texts)} textes"
+                    )
+                return embeddings
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    print(f"\n❌ Erreur embedding (lot de {len(texts)}): {e}")
+                    raise
+                time.sleep(0.5 * 2 ** attempt)
+
     def _get_embedding(self, text: str) -> List[float]:
         """Appel API Ollama"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/embeddings",
                 json={
                     "model": self.model_name,
-                    "prompt": text[:2000]  # Limite pour éviter erreurs
+                    "prompt": text[:MAX_EMBEDDING_CHARS]  # Limite pour éviter erreurs
                 },
                 timeout=30
             )
@@ -45,4 +165,4 @@ class OllamaEmbeddings:
             return response.json()["embedding"]
         except Exception as e:
             print(f"\n❌ Erreur embedding: {e}")
-            raise
\ No newline at end of file
+            raise
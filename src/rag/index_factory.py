@@ -0,0 +1,176 @@
+import os
+import math
+from typing import Dict, Optional
+import faiss
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INDEX_TYPES = ('auto', 'flat', 'hnsw', 'ivf', 'ivfpq')
+METRICS = ('cosine', 'ip', 'l2')
+# Encodage des vecteurs dans l'index: 4, 2, 1 octet(s) par dimension, ou pq_m octets par vecteur
+STORAGE_MODES = ('float32', 'float16', 'int8', 'pq')
+
+# Sélection automatique selon le nombre de chunks
+AUTO_FLAT_MAX = 5_000      # En dessous: recherche exacte, déjà sous la milliseconde
+AUTO_HNSW_MAX = 300_000    # En dessous: HNSW; au-delà: IVF-PQ (mémoire bornée)
+MIN_TRAINING_VECTORS = 10_000  # Minimum pour entraîner IVF / PQ correctement
+MAX_TRAINING_VECTORS = 100_000  # Échantillon d'entraînement au-delà
+MIN_SQ8_TRAINING_VECTORS = 1_000  # Bornes par dimension de l'int8 estimées sur au moins ce nombre
+DEFAULT_PQ_M = 48
+
+DEFAULT_PARAMS = {
+    'hnsw': {'M': 32, 'efConstruction': 80, 'efSearch': 64},
+    'ivf': {'nprobe': 16},
+    'ivfpq': {'nprobe': 16, 'pq_m': 48},
+}
+
+def default_spec(index_type: str = None, metric: str = None, storage: str = None) -> Dict:
+    """Spécification d'index lue depuis l'environnement"""
+    index_type = (index_type or os.getenv('VECTOR_INDEX_TYPE', 'auto')).lower()
+    metric = (metric or os.getenv('VECTOR_METRIC', 'cosine')).lower()
+    storage = (storage or os.getenv('VECTOR_STORAGE', 'float32')).lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Type d'index inconnu: {index_type} (attendu: {', '.join(INDEX_TYPES)})")
+    if metric not in METRICS:
+        raise ValueError(f"Métrique inconnue: {metric} (attendu: {', '.join(METRICS)})")
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Stockage inconnu: {storage} (attendu: {', '.join(STORAGE_MODES)})")
+
+    params = {}
+    for key in ('efSearch', 'nprobe', 'M', 'nlist', 'pq_m'):
+        value = os.getenv(f'VECTOR_INDEX_{key.upper()}')
+        if value:
+            params[key] = int(value)
+    return {'type': index_type, 'metric': metric, 'storage': storage, 'params': params}
+
+def choose_index_type(count: int) -> str:
+    """Type d'index adapté à la taille du corpus"""
+    if count <= AUTO_FLAT_MAX:
+        return 'flat'
+    if count <= AUTO_HNSW_MAX:
+        return 'hnsw'
+    return 'ivfpq'
+
+def resolve_spec(spec: Dict, count: int, dimension: int) -> Dict:
+    """Spécification concrète (type choisi, paramètres complétés) pour `count` vecteurs"""
+    index_type = spec['type']
+    if index_type == 'auto':
+        index_type = choose_index_type(count)
+    elif index_type in ('ivf', 'ivfpq') and count < MIN_TRAINING_VECTORS:
+        # Pas assez de vecteurs pour entraîner: index exact en attendant
+        index_type = 'flat'
+
+    # Les index sans stockage (sauvegardés avant son ajout) sont en float32
+    storage = 'pq' if index_type == 'ivfpq' else spec.get('storage', 'float32')
+    if storage == 'pq' and count < MIN_TRAINING_VECTORS:
+        storage = 'int8'  # Pas assez de vecteurs pour entraîner les sous-quantificateurs
+    if storage == 'int8' and count < MIN_SQ8_TRAINING_VECTORS:
+        storage = 'float16'  # Sans entraînement
+    if index_type == 'flat' and storage == 'pq':
+        # IndexPQ seul refuse les SearchParameters (tombstones, filtres): codes PQ sous IVF
+        index_type = 'ivfpq'
+
+    params = {**DEFAULT_PARAMS.get(index_type, {}), **spec.get('params', {})}
+    if storage == 'pq':
+        params.setdefault('pq_m', DEFAULT_PQ_M)
+    if index_type in ('ivf', 'ivfpq'):
+        # ~4·sqrt(n) listes, avec au moins 39 vecteurs d'entraînement par liste
+        nlist = params.get('nlist') or int(4 * math.sqrt(max(count, 1)))
+        params['nlist'] = max(1, min(nlist, count // 39 or 1))
+        params['nprobe'] = min(params['nprobe'], params['nlist'])
+    if storage == 'pq' and dimension % params['pq_m'] != 0:
+        raise ValueError(f"pq_m={params['pq_m']} doit diviser la dimension {dimension}")
+
+    return {
+        'type': index_type,
+        'metric': spec['metric'],
+        'storage': storage,
+        'params': params,
+        'auto': spec['type'] == 'auto'
+    }
+
+def codes_description(storage: str, params: Dict) -> str:
+    """Partie « codes » de la description index_factory pour un stockage"""
+    if storage == 'float16':
+        return "SQfp16"
+    if storage == 'int8':
+        return "SQ8"
+    if storage == 'pq':
+        return f"PQ{params['pq_m']}"
+    return "Flat"
+
+def uses_inner_product(spec: Dict) -> bool:
+    return spec['metric'] in ('cosine', 'ip')
+
+def build_index(spec: Dict, dimension: int, training_vectors: Optional[np.ndarray] = None):
+    """Construire (et entraîner si besoin) un index FAISS à IDs stables"""
+    metric = faiss.METRIC_INNER_PRODUCT if uses_inner_product(spec) else faiss.METRIC_L2
+    params = spec['params']
+    index_type = spec['type']
+
+    codes = codes_description(spec.get('storage', 'float32'), params)
+    if index_type == 'flat':
+        description = codes
+    elif index_type == 'hnsw':
+        description = f"HNSW{params['M']},{codes}"
+    elif index_type in ('ivf', 'ivfpq'):
+        description = f"IVF{params['nlist']},{codes}"
+    else:
+        raise ValueError(f"Type d'index non résolu: {index_type}")
+
+    inner = faiss.index_factory(dimension, description, metric)
+    if index_type == 'hnsw':
+        inner.hnsw.efConstruction = params['efConstruction']
+        inner.hnsw.efSearch = params['efSearch']
+    if index_type in ('ivf', 'ivfpq'):
+        inner.nprobe = params['nprobe']
+
+    if not inner.is_trained:
+        if training_vectors is None or len(training_vectors) == 0:
+            raise ValueError(f"L'index {index_type} doit être entraîné sur des vecteurs")
+        if len(training_vectors) > MAX_TRAINING_VECTORS:
+            rng = np.random.default_rng(0)
+            rows = np.sort(rng.choice(len(training_vectors), MAX_TRAINING_VECTORS, replace=False))
+            training_vectors = training_vectors[rows]
+        inner.train(np.ascontiguousarray(training_vectors, dtype='float32'))
+
+    return faiss.IndexIDMap2(inner)
+
+def search_parameters(spec: Dict, selector=None):
+    """Paramètres de recherche du bon type pour l'index (efSearch, nprobe, sélecteur)"""
+    params = spec['params']
+    kwargs = {'sel': selector} if selector is not None else {}
+    if spec['type'] == 'hnsw':
+        return faiss.SearchParametersHNSW(efSearch=params['efSearch'], **kwargs)
+    if spec['type'] in ('ivf', 'ivfpq'):
+        return faiss.SearchParametersIVF(nprobe=params['nprobe'], **kwargs)
+    return faiss.SearchParameters(**kwargs) if kwargs else None
+
+def read_index_mapped(file_path: str):
+    """Lire un index FAISS en lecture seule, mappé en mémoire si FAISS le permet
+
+    Plusieurs processus qui mappent le même fichier partagent ses pages
+    (cache du système). IO_FLAG_MMAP_IFC (FAISS >= 1.11) mappe aussi les
+    vecteurs des index flat et HNSW; IO_FLAG_MMAP, les listes IVF.
+    """
+    index = None
+    for flag_name in ('IO_FLAG_MMAP_IFC', 'IO_FLAG_MMAP'):
+        flag = getattr(faiss, flag_name, None)
+        if flag is None:
+            continue
+        try:
+            index = faiss.read_index(file_path, flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            continue  # Type d'index non mappable avec ce drapeau
+        if flag_name == 'IO_FLAG_MMAP_IFC' or faiss.try_extract_index_ivf(index) is not None:
+            return index
+        break  # Flat / HNSW: IO_FLAG_MMAP n'en mappe pas les vecteurs
+
+    size_mb = os.path.getsize(file_path) / 1e6
+    print(
+        f"⚠️ Index non mappé (FAISS {faiss.__version__}, IO_FLAG_MMAP_IFC requis): "
+        f"chaque worker en garde une copie privée (~{size_mb:.0f} Mo)"
+    )
+    return index if index is not None else faiss.read_index(file_path)
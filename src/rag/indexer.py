@@ -0,0 +1,205 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Callable, Dict, List
+from dotenv import load_dotenv
+
+from .document_loader import DocumentLoader
+
+load_dotenv()
+
+MANIFEST_FILENAME = "files_manifest.json"
+
+def file_hash(file_path: str) -> str:
+    """Empreinte SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class Indexer:
+    """Indexation incrémentale d'un dossier de documents
+
+    Un manifeste (chemin → hash du contenu → IDs des chunks) est gardé à
+    côté de l'index: seuls les fichiers nouveaux ou modifiés sont
+    re-découpés et re-embeddés, et les chunks des fichiers supprimés sont
+    retirés du vector store.
+    """
+
+    def __init__(self, vector_store, text_splitter, data_dir: str = None, index_path: str = None):
+        self.vector_store = vector_store
+        self.text_splitter = text_splitter
+        self.data_dir = data_dir or os.getenv('DATA_DIR', './data/raw')
+        self.index_path = index_path or os.getenv('VECTOR_DB_PATH', './data/embeddings/faiss_index')
+        self.manifest = self._load_manifest()
+        # Chunks accumulés avant un appel d'embedding pendant le chargement
+        self.embed_batch_chunks = int(os.getenv('INDEX_EMBED_BATCH_CHUNKS', 512))
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.index_path, MANIFEST_FILENAME)
+
+    def _load_manifest(self) -> Dict:
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {"version": 1, "files": {}}
+
+    def _save_manifest(self):
+        Path(self.index_path).mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _key(self, file_path: Path) -> str:
+        """Clé du manifeste: chemin relatif au dossier de données"""
+        return Path(file_path).resolve().relative_to(Path(self.data_dir).resolve()).as_posix()
+
+    def run(self, full: bool = False) -> Dict:
+        """Synchroniser l'index avec le dossier de données
+
+        Avec `full=True`, tous les fichiers sont ré-indexés.
+        """
+        files = self.manifest["files"]
+        current = {
+            self._key(file_path): file_path
+            for file_path in DocumentLoader.list_files(self.data_dir)
+        }
+        stats = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0,
+                 "chunks_added": 0, "chunks_removed": 0, "errors": []}
+
+        # Index construit sans manifeste: impossible de savoir quoi garder
+        if not files and self.vector_store.documents:
+            print("⚠️ Index existant sans manifeste: reconstruction complète")
+            self.vector_store.delete([doc.id for doc in self.vector_store.documents])
+
+        # 1. Fichiers supprimés du dossier
+        for key in sorted(set(files) - set(current)):
+            stats["chunks_removed"] += self.vector_store.delete(files[key]["chunk_ids"])
+            del files[key]
+            stats["deleted"] += 1
+            print(f"➖ {key}")
+
+        # 2. Fichiers nouveaux ou modifiés
+        to_load = []  # (clé, chemin, hash, ancienne entrée)
+        for key, file_path in current.items():
+            digest = file_hash(str(file_path))
+            entry = files.get(key)
+            indexed = entry is not None and all(
+                chunk_id in self.vector_store.docstore for chunk_id in entry["chunk_ids"]
+            )
+            if indexed and entry["hash"] == digest and not full:
+                stats["unchanged"] += 1
+                continue
+            to_load.append((key, file_path, digest, entry))
+
+        # Pipeline: les fichiers sont lus en parallèle pendant que les
+        # précédents sont découpés et embeddés
+        pending = []  # (clé, hash, ancienne entrée, chunks)
+        chunks, embeddings = [], []
+        batch = []
+        loaded = DocumentLoader.iter_load(file_path for _, file_path, _, _ in to_load)
+        for (key, _, digest, entry), result in zip(to_load, loaded):
+            if not result.ok:
+                # L'ancienne version (s'il y en a une) reste indexée
+                stats["errors"].append({"file": key, "error": result.error})
+                print(f"❌ {key}: {result.error}")
+                continue
+
+            if entry:
+                stats["updated"] += 1
+                print(f"✏️ {key}")
+            else:
+                stats["added"] += 1
+                print(f"➕ {key}")
+
+            self._tag(result.documents, key)
+            file_chunks = self.text_splitter.split_documents(result.documents)
+            pending.append((key, digest, entry, file_chunks))
+            batch.extend(file_chunks)
+            # Lots d'embedding pleins: plusieurs fichiers par appel
+            if len(batch) >= self.embed_batch_chunks:
+                embeddings.extend(self._embed(batch))
+                chunks.extend(batch)
+                batch = []
+        if batch:
+            embeddings.extend(self._embed(batch))
+            chunks.extend(batch)
+
+        # Remplacer les anciennes versions, puis un seul ajout au vector store
+        for _, _, entry, _ in pending:
+            if entry:
+                stats["chunks_removed"] += self.vector_store.delete(entry["chunk_ids"])
+        ids = self.vector_store.add_documents(chunks, embeddings) if chunks else []
+
+        offset = 0
+        for key, digest, _, file_chunks in pending:
+            files[key] = {
+                "hash": digest,
+                "chunk_ids": ids[offset:offset + len(file_chunks)]
+            }
+            offset += len(file_chunks)
+        stats["chunks_added"] = len(chunks)
+
+        if pending or stats["deleted"]:
+            self.save()
+        return stats
+
+    @staticmethod
+    def _tag(documents: List, key: str):
+        """Catégorie (filtrable) = premier sous-dossier du dossier de données, ex: isic/plan.pdf"""
+        parts = key.split('/')
+        if len(parts) > 1:
+            for doc in documents:
+                doc.metadata['category'] = parts[0]
+
+    def _embed(self, chunks: List) -> List[List[float]]:
+        return self.vector_store.embedding_function.embed_documents(
+            [chunk.page_content for chunk in chunks]
+        )
+
+    def index_file(self, file_path: str, on_progress: Callable[[str], None] = None) -> List[int]:
+        """Indexer (ou ré-indexer) un seul fichier du dossier de données
+
+        `on_progress` est appelé avec le nom de chaque étape.
+        """
+        on_progress = on_progress or (lambda stage: None)
+        path = Path(file_path)
+        key = self._key(path)
+
+        on_progress("loading")
+        # Une erreur de lecture fait échouer la tâche (ancienne version conservée)
+        documents = DocumentLoader.read_file(str(path))
+        self._tag(documents, key)
+        on_progress("splitting")
+        chunks = self.text_splitter.split_documents(documents)
+
+        # L'ancienne version n'est retirée qu'une fois la nouvelle prête
+        on_progress("embedding")
+        embeddings = self.vector_store.embedding_function.embed_documents(
+            [chunk.page_content for chunk in chunks]
+        ) if chunks else []
+
+        on_progress("indexing")
+        entry = self.manifest["files"].get(key)
+        if entry:
+            self.vector_store.delete(entry["chunk_ids"])
+        ids = self.vector_store.add_documents(chunks, embeddings) if chunks else []
+        self.manifest["files"][key] = {"hash": file_hash(str(path)), "chunk_ids": ids}
+        return ids
+
+    def remove_file(self, file_path: str) -> int:
+        """Retirer du vector store les chunks d'un fichier"""
+        key = self._key(Path(file_path))
+        entry = self.manifest["files"].pop(key, None)
+        if entry is None:
+            return 0
+        return self.vector_store.delete(entry["chunk_ids"])
+
+    def save(self):
+        """Sauvegarder l'index puis le manifeste"""
+        self.vector_store.save(self.index_path)
+        self._save_manifest()
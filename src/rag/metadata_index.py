@@ -0,0 +1,97 @@
+import os
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def filter_key(filters: Dict) -> Optional[Tuple]:
+    """Forme canonique (hashable) d'un filtre {clé: valeur ou [valeurs]}"""
+    if not filters:
+        return None
+    normalized = []
+    for key, values in sorted(filters.items()):
+        if not isinstance(values, (list, tuple, set)):
+            values = [values]
+        normalized.append((key, tuple(values)))
+    return tuple(normalized)
+
+class MetadataIndex:
+    """Index inversé des métadonnées: (clé, valeur) → ids des chunks
+
+    Sert à restreindre une recherche (source, type, catégorie...) avant
+    FAISS et BM25 plutôt qu'après. Un filtre {clé: valeur ou [valeurs]}
+    garde les chunks qui ont l'une des valeurs pour chaque clé (OU entre
+    les valeurs, ET entre les clés); il est évalué en masque booléen sur
+    l'espace des ids.
+    """
+
+    def __init__(self, keys: Iterable[str] = None):
+        if keys is None:
+            keys = os.getenv('METADATA_INDEX_KEYS', 'source,type,category').split(',')
+        self.keys = tuple(key.strip() for key in keys if key.strip())
+        self._postings: Dict[str, Dict[object, np.ndarray]] = {key: {} for key in self.keys}
+
+    @classmethod
+    def build(cls, docstore, keys: Iterable[str] = None) -> "MetadataIndex":
+        """Construire l'index à partir d'un ChunkStore (colonnes de métadonnées)"""
+        index = cls(keys)
+        for key in index.keys:
+            for value, ids in docstore.ids_by_value(key).items():
+                index._postings[key][value] = np.unique(np.asarray(ids, dtype='int64'))
+        return index
+
+    def _group(self, items: Iterable[Tuple[int, Dict]]) -> Dict[Tuple, np.ndarray]:
+        grouped: Dict[Tuple, list] = {}
+        for doc_id, metadata in items:
+            for key in self.keys:
+                if key in metadata:
+                    grouped.setdefault((key, metadata[key]), []).append(doc_id)
+        return {pair: np.asarray(ids, dtype='int64') for pair, ids in grouped.items()}
+
+    def add(self, items: Iterable[Tuple[int, Dict]]):
+        """Indexer des chunks (id, métadonnées)"""
+        for (key, value), ids in self._group(items).items():
+            current = self._postings[key].get(value)
+            self._postings[key][value] = np.unique(ids) if current is None else np.union1d(current, ids)
+
+    def remove(self, items: Iterable[Tuple[int, Dict]]):
+        """Retirer des chunks (id, métadonnées)"""
+        for (key, value), ids in self._group(items).items():
+            current = self._postings[key].get(value)
+            if current is None:
+                continue
+            remaining = np.setdiff1d(current, ids, assume_unique=True)
+            if len(remaining):
+                self._postings[key][value] = remaining
+            else:
+                del self._postings[key][value]
+
+    def validate(self, filters: Dict):
+        """Lever ValueError si le filtre porte sur une clé non indexée"""
+        unknown = sorted(set(filters or {}) - set(self.keys))
+        if unknown:
+            raise ValueError(
+                f"Métadonnée(s) non filtrable(s): {', '.join(unknown)} "
+                f"(filtrables: {', '.join(self.keys)})"
+            )
+
+    def values(self, key: str) -> list:
+        """Valeurs présentes pour une clé indexée"""
+        return list(self._postings.get(key, {}))
+
+    def mask(self, filters: Dict, size: int) -> np.ndarray:
+        """Masque booléen (taille `size`, indexé par id) des chunks qui passent le filtre"""
+        self.validate(filters)
+        mask = None
+        for key, values in filter_key(filters):
+            key_mask = np.zeros(size, dtype=bool)
+            for value in values:
+                ids = self._postings[key].get(value)
+                if ids is not None:
+                    key_mask[ids[ids < size]] = True
+            if mask is None:
+                mask = key_mask
+            else:
+                mask &= key_mask
+        return mask if mask is not None else np.ones(size, dtype=bool)
@@ -0,0 +1,102 @@
+import time
+from typing import Dict, Iterable, List
+import faiss
+import numpy as np
+
+from .index_factory import (
+    DEFAULT_PQ_M,
+    MAX_TRAINING_VECTORS,
+    STORAGE_MODES,
+    codes_description
+)
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    """Part moyenne des k vrais voisins retrouvés"""
+    hits = sum(len(set(row_found.tolist()) & set(row_truth.tolist())) for row_found, row_truth in zip(found, truth))
+    return round(hits / truth.size, 4) if truth.size else 1.0
+
+def _rerank(queries: np.ndarray, base: np.ndarray, candidates: np.ndarray, k: int, inner_product: bool) -> np.ndarray:
+    """Re-classer les candidats avec les vecteurs float32 (comme VectorStore._rescore)"""
+    safe = np.maximum(candidates, 0)
+    vectors = base[safe]  # (requêtes, candidats, dimension)
+    if inner_product:
+        scores = np.einsum('qd,qcd->qc', queries, vectors)
+    else:
+        scores = -((vectors - queries[:, None, :]) ** 2).sum(axis=2)
+    scores[candidates < 0] = -np.inf
+    order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(candidates, order, axis=1)
+
+def evaluate_storage(
+    vectors: np.ndarray,
+    metric: str = 'cosine',
+    modes: Iterable[str] = STORAGE_MODES,
+    k: int = 10,
+    n_queries: int = 200,
+    rescore_factor: int = 4,
+    pq_m: int = DEFAULT_PQ_M,
+    seed: int = 0
+) -> List[Dict]:
+    """Rappel@k de chaque encodage par rapport à la recherche exacte en float32
+
+    Des vecteurs du corpus servent de requêtes (retirés de la base pour ne
+    pas se retrouver eux-mêmes). Les encodages sont mesurés sur des index
+    flat, pour isoler la perte due à la compression de celle de HNSW/IVF;
+    `recall_rescored` est le rappel après re-scoring de k × `rescore_factor`
+    candidats.
+    """
+    vectors = np.array(vectors, dtype='float32')
+    if metric == 'cosine':
+        faiss.normalize_L2(vectors)
+    n, dimension = vectors.shape
+    if n < 2:
+        raise ValueError("Pas assez de vecteurs pour l'évaluation")
+
+    rng = np.random.default_rng(seed)
+    n_queries = max(1, min(n_queries, n // 5))
+    query_rows = rng.choice(n, n_queries, replace=False)
+    is_base = np.ones(n, dtype=bool)
+    is_base[query_rows] = False
+    queries, base = vectors[query_rows], np.ascontiguousarray(vectors[is_base])
+    k = min(k, len(base))
+
+    inner_product = metric in ('cosine', 'ip')
+    faiss_metric = faiss.METRIC_INNER_PRODUCT if inner_product else faiss.METRIC_L2
+    exact = faiss.IndexFlat(dimension, faiss_metric)
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+
+    training = base
+    if len(training) > MAX_TRAINING_VECTORS:
+        training = base[np.sort(rng.choice(len(base), MAX_TRAINING_VECTORS, replace=False))]
+
+    rows = []
+    for storage in modes:
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Stockage inconnu: {storage} (attendu: {', '.join(STORAGE_MODES)})")
+        if storage == 'pq' and (dimension % pq_m or len(training) < 256):
+            rows.append({"storage": storage, "skipped": f"pq_m={pq_m} / {len(training)} vecteurs d'entraînement"})
+            continue
+
+        index = faiss.index_factory(dimension, codes_description(storage, {'pq_m': pq_m}), faiss_metric)
+        if not index.is_trained:
+            index.train(training)
+        index.add(base)
+
+        start = time.perf_counter()
+        _, found = index.search(queries, k)
+        search_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        code_size = index.sa_code_size()
+        row = {
+            "storage": storage,
+            "bytes_per_vector": code_size,
+            "compression": round(4 * dimension / code_size, 1),
+            "recall": _recall(found, truth),
+            "search_ms": round(search_ms, 3)
+        }
+        if storage != 'float32':
+            _, candidates = index.search(queries, k * max(rescore_factor, 1))
+            row["recall_rescored"] = _recall(_rerank(queries, base, candidates, k, inner_product), truth)
+        rows.append(row)
+    return rows
@@ -1,45 +1,229 @@
 import os
-from typing import List, Tuple
+from typing import Dict, List, Tuple
+import numpy as np
 from dotenv import load_dotenv
 
+from .context_packer import count_tokens, pack_segments
+from .metrics import timed
+
 load_dotenv()
 
+RETRIEVAL_MODES = ('vector', 'hybrid', 'lexical')
+
 class Retriever:
-    """Récupère les documents pertinents"""
+    """Récupère les documents pertinents
+
+    Modes:
+    - vector: similarité d'embeddings (FAISS)
+    - lexical: BM25 seul (fonctionne sans service d'embeddings)
+    - hybrid: fusion des deux classements par Reciprocal Rank Fusion
+
+    Une re-sélection MMR (Maximal Marginal Relevance) optionnelle écarte
+    les chunks quasi identiques (chevauchement du découpage) à partir des
+    embeddings déjà stockés, sans nouvel appel d'embedding.
+    """
     
-    def __init__(self, vector_store, top_k: int = None, score_threshold: float = None):
+    def __init__(self, vector_store, top_k: int = None, score_threshold: float = None, mode: str = None):
         self.vector_store = vector_store
         self.top_k = top_k or int(os.getenv('RAG_TOP_K', 5))
         self.score_threshold = score_threshold or float(os.getenv('RAG_SCORE_THRESHOLD', 0.7))
-        print(f"🔍 Retriever: top_k={self.top_k}, threshold={self.score_threshold}")
+        self.mode = (mode or os.getenv('RAG_RETRIEVAL_MODE', 'hybrid')).lower()
+        if self.mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Mode de recherche inconnu: {self.mode} (attendu: {', '.join(RETRIEVAL_MODES)})")
+        self.rrf_k = int(os.getenv('RAG_RRF_K', 60))
+        self.hybrid_fetch = int(os.getenv('RAG_HYBRID_FETCH', 20))
+        self.use_mmr = os.getenv('RAG_USE_MMR', 'True').lower() == 'true'
+        self.mmr_lambda = float(os.getenv('RAG_MMR_LAMBDA', 0.7))
+        self.mmr_fetch_factor = max(int(os.getenv('RAG_MMR_FETCH_FACTOR', 3)), 1)
+        # Budget de tokens du contexte envoyé au LLM
+        self.context_tokens = int(os.getenv('RAG_CONTEXT_TOKENS', 1500))
+        print(
+            f"🔍 Retriever: top_k={self.top_k}, threshold={self.score_threshold}, mode={self.mode}"
+            + (f", mmr λ={self.mmr_lambda}" if self.use_mmr else "")
+        )
+    
+    @property
+    def _candidate_k(self) -> int:
+        """Nombre de candidats avant re-sélection MMR"""
+        return self.top_k * self.mmr_fetch_factor if self.use_mmr else self.top_k
     
-    def retrieve(self, query: str) -> List[Tuple]:
-        """Récupérer documents pertinents"""
+    @property
+    def needs_embedding(self) -> bool:
+        """La recherche utilise-t-elle l'embedding de la requête ?"""
+        return self.mode != 'lexical'
+    
+    def retrieve(
+        self,
+        query: str,
+        query_embedding: List[float] = None,
+        use_vector: bool = True,
+        filters: Dict = None
+    ) -> List[Tuple]:
+        """Récupérer documents pertinents
+
+        `use_vector=False` force la recherche lexicale (ex: service
+        d'embeddings indisponible) en mode hybrid. `filters` limite la
+        recherche à des métadonnées, ex: {"category": "isic"}.
+        """
+        with timed("retrieve"):
+            return self._retrieve(query, query_embedding, use_vector, filters)
+    
+    def _retrieve(
+        self,
+        query: str,
+        query_embedding: List[float] = None,
+        use_vector: bool = True,
+        filters: Dict = None
+    ) -> List[Tuple]:
+        if self.mode == 'lexical' or (self.mode == 'hybrid' and not use_vector):
+            results = self._mmr(self.vector_store.lexical_search(query, k=self._candidate_k, filters=filters))
+            print(f"📋 {len(results)} documents (BM25)")
+            return results
+        
+        if self.mode == 'hybrid':
+            return self._retrieve_hybrid(query, query_embedding, filters)
+        
         # Recherche par similarité
-        results = self.vector_store.similarity_search(query, k=self.top_k)
+        results = self.vector_store.similarity_search(
+            query, k=self._candidate_k, query_embedding=query_embedding, filters=filters
+        )
         
         # Filtrer par score
-        filtered_results = [
+        filtered_results = self._mmr([
             (doc, score) for doc, score in results 
             if score >= self.score_threshold
-        ]
+        ])
         
         print(f"📋 {len(filtered_results)}/{len(results)} documents pertinents")
         return filtered_results
     
-    def format_context(self, results: List[Tuple]) -> str:
-        """Formater le contexte pour le LLM"""
+    def _retrieve_hybrid(self, query: str, query_embedding: List[float] = None, filters: Dict = None) -> List[Tuple]:
+        """Fusionner classements vectoriel et BM25 (Reciprocal Rank Fusion)"""
+        if filters:
+            # Filtre invalide: erreur, pas un repli silencieux sur BM25
+            self.vector_store.metadata_index.validate(filters)
+        try:
+            vector_results = self.vector_store.similarity_search(
+                query, k=self._hybrid_fetch_k, query_embedding=query_embedding, filters=filters
+            )
+        except Exception as e:
+            print(f"⚠️ Recherche vectorielle indisponible, BM25 seul: {e}")
+            vector_results = []
+        
+        results = self._mmr(self._fuse(query, vector_results, filters))
+        print(f"📋 {len(results)} documents (hybride)")
+        return results
+    
+    @property
+    def _hybrid_fetch_k(self) -> int:
+        return max(self.hybrid_fetch, self._candidate_k)
+    
+    def _fuse(self, query: str, vector_results: List[Tuple], filters: Dict = None) -> List[Tuple]:
+        """Reciprocal Rank Fusion des résultats vectoriels et BM25"""
+        # Les voisins vectoriels sous le seuil ne sont pas promus par la fusion
+        vector_results = [(doc, score) for doc, score in vector_results if score >= self.score_threshold]
+        lexical_results = self.vector_store.lexical_search(query, k=self._hybrid_fetch_k, filters=filters)
+        
+        fused = {}
+        for results in (vector_results, lexical_results):
+            for rank, (doc, _) in enumerate(results, 1):
+                entry = fused.setdefault(doc.id, [doc, 0.0])
+                entry[1] += 1.0 / (self.rrf_k + rank)
+        
+        # Score ramené dans ]0, 1]: 1 = premier dans les deux classements
+        best_possible = 2.0 / (self.rrf_k + 1)
+        ranked = sorted(fused.values(), key=lambda entry: entry[1], reverse=True)[:self._candidate_k]
+        return [(doc, score / best_possible) for doc, score in ranked]
+    
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        query_embeddings: List[List[float]] = None,
+        filters: Dict = None
+    ) -> List[List[Tuple]]:
+        """Récupérer les documents pertinents pour plusieurs requêtes à la fois"""
+        if self.mode == 'lexical':
+            return [
+                self._mmr(self.vector_store.lexical_search(query, k=self._candidate_k, filters=filters))
+                for query in queries
+            ]
+        
+        k = self._hybrid_fetch_k if self.mode == 'hybrid' else self._candidate_k
+        all_results = self.vector_store.similarity_search_batch(
+            queries, k=k, query_embeddings=query_embeddings, filters=filters
+        )
+        
+        if self.mode == 'hybrid':
+            return [self._mmr(self._fuse(query, results, filters)) for query, results in zip(queries, all_results)]
+        
+        return [
+            self._mmr([(doc, score) for doc, score in results if score >= self.score_threshold])
+            for results in all_results
+        ]
+    
+    def _mmr(self, results: List[Tuple]) -> List[Tuple]:
+        """Re-sélection MMR: top_k résultats pertinents et peu redondants
+
+        Pertinence = score de recherche ramené à [0, 1] par le meilleur;
+        redondance = cosinus maximal avec un chunk déjà retenu, calculé sur
+        les embeddings stockés (une seule matrice de similarités).
+        """
+        if not self.use_mmr or len(results) <= self.top_k:
+            return results[:self.top_k]
+        with timed("mmr"):
+            return self._select_mmr(results)
+    
+    def _select_mmr(self, results: List[Tuple]) -> List[Tuple]:
+        vectors = self.vector_store.get_embeddings([doc.id for doc, _ in results])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        similarities = vectors @ vectors.T
+        
+        scores = np.array([score for _, score in results], dtype='float32')
+        relevance = scores / max(float(scores.max()), 1e-12)
+        
+        # Le meilleur résultat est toujours retenu en premier
+        selected = [0]
+        max_similarity = similarities[0].copy()
+        available = np.ones(len(results), dtype=bool)
+        available[0] = False
+        for _ in range(self.top_k - 1):
+            mmr_scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * max_similarity
+            mmr_scores[~available] = -np.inf
+            best = int(np.argmax(mmr_scores))
+            selected.append(best)
+            available[best] = False
+            np.maximum(max_similarity, similarities[best], out=max_similarity)
+        
+        return [results[i] for i in selected]
+    
+    def pack_context(self, results: List[Tuple], max_tokens: int = None) -> Tuple[str, List[Tuple], int]:
+        """Construire le contexte dans un budget de tokens
+
+        Les chunks contigus d'une même page sont fusionnés (recouvrement
+        envoyé une seule fois). Retourne (contexte, résultats utilisés,
+        tokens estimés du contexte).
+        """
         if not results:
-            return "Aucun document pertinent trouvé."
+            text = "Aucun document pertinent trouvé."
+            return text, [], count_tokens(text)
+        
+        max_tokens = self.context_tokens if max_tokens is None else max_tokens
+        with timed("pack_context"):
+            segments, _ = pack_segments(results, max_tokens)
         
         context_parts = []
-        for i, (doc, score) in enumerate(results, 1):
-            source = doc.metadata.get('source', 'Unknown')
-            page = doc.metadata.get('page', '')
-            page_info = f" (page {page})" if page else ""
-            
+        used = []
+        for i, segment in enumerate(segments, 1):
+            page_info = f" (page {segment.page})" if segment.page else ""
             context_parts.append(
-                f"[Document {i} - {source}{page_info}]:\n{doc.page_content}\n"
+                f"[Document {i} - {segment.source}{page_info}]:\n{segment.text}\n"
             )
+            used.extend((doc, segment.score) for doc in segment.docs)
         
-        return "\n".join(context_parts)
\ No newline at end of file
+        text = "\n".join(context_parts)
+        return text, used, count_tokens(text)
+    
+    def format_context(self, results: List[Tuple]) -> str:
+        """Formater le contexte pour le LLM"""
+        return self.pack_context(results)[0]
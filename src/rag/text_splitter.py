@@ -1,57 +1,213 @@
 import os
-from typing import List
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 
+from .context_packer import count_tokens
+
 load_dotenv()
 
+SPLITTER_MODES = ('structured', 'fixed')
+
+# Frontières candidates, de la plus forte à la plus faible
+_BOUNDARY_RE = re.compile(
+    r"(?P<paragraph>[ \t]*\n[ \t]*\n\s*)"
+    r"|(?P<line>[ \t]*\n[ \t]*)"
+    # Fin de phrase après un mot (pas "1." ni "M.")
+    r"|(?<=[^\W\d_]{2}[.!?…])(?P<sentence>[ \t]+)"
+)
+_STRENGTH = {'paragraph': 3, 'sentence': 2, 'line': 1}
+
+# Lignes de titre: "# Titre", "=== Titre ===", "1. Titre", "II- Titre", "Article 3", "ADMISSION"
+_HEADING_RE = re.compile(
+    r"#{1,6}\s|={2,}|(\d+(\.\d+)*|[IVXLC]+|[A-Z])[.)-]\s|(chapitre|article|section|partie|titre|annexe)\b",
+    re.IGNORECASE
+)
+MAX_HEADING_CHARS = 100
+
 class TextSplitter:
-    """Découpe les documents en chunks"""
-    
-    def __init__(self, chunk_size: int = None, chunk_overlap: int = None):
+    """Découpe les documents en chunks
+
+    Modes:
+    - structured: coupe de préférence aux fins de paragraphe, puis de
+      phrase, puis de ligne; un titre commence un nouveau chunk. Un seul
+      passage sur le texte, en positions (aucune copie du recouvrement).
+    - fixed: tranches de `chunk_size` caractères
+    """
+
+    def __init__(self, chunk_size: int = None, chunk_overlap: int = None, mode: str = None):
         self.chunk_size = chunk_size or int(os.getenv('RAG_CHUNK_SIZE', 1000))
-        self.chunk_overlap = chunk_overlap or int(os.getenv('RAG_CHUNK_OVERLAP', 200))
-        print(f"✂️ Splitter: {self.chunk_size} chars, overlap {self.chunk_overlap}")
-    
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else int(os.getenv('RAG_CHUNK_OVERLAP', 200))
+        self.mode = (mode or os.getenv('RAG_SPLITTER_MODE', 'structured')).lower()
+        if self.mode not in SPLITTER_MODES:
+            raise ValueError(f"Mode de découpage inconnu: {self.mode} (attendu: {', '.join(SPLITTER_MODES)})")
+        if not 0 <= self.chunk_overlap < self.chunk_size:
+            raise ValueError(
+                f"chunk_overlap ({self.chunk_overlap}) doit être compris entre 0 et chunk_size ({self.chunk_size})"
+            )
+        print(f"✂️ Splitter: {self.chunk_size} chars, overlap {self.chunk_overlap}, mode {self.mode}")
+
     def split_documents(self, documents: List) -> List:
         """Découper les documents en chunks"""
         chunks = []
-        
+
         for doc in documents:
-            text = doc.page_content
-            doc_chunks = self._split_text(text)
-            
-            for i, chunk_text in enumerate(doc_chunks):
-                # Créer un nouveau document pour chaque chunk
-                chunk = type(doc)(
-                    page_content=chunk_text,
-                    metadata={
-                        **doc.metadata,
-                        "chunk_id": i,
-                        "total_chunks": len(doc_chunks)
-                    }
-                )
-                chunks.append(chunk)
-        
+            doc_chunks = list(self._chunks(doc))
+            for chunk in doc_chunks:
+                chunk.metadata["total_chunks"] = len(doc_chunks)
+            chunks.extend(doc_chunks)
+
         print(f"📦 {len(documents)} docs → {len(chunks)} chunks\n")
         return chunks
-    
-    def _split_text(self, text: str) -> List[str]:
-        """Découper un texte en morceaux avec overlap"""
-        chunks = []
+
+    def iter_chunks(self, documents: Iterable) -> Iterator:
+        """Découper au fil de l'eau (générateur, sans `total_chunks`)"""
+        for doc in documents:
+            yield from self._chunks(doc)
+
+    def _chunks(self, doc) -> Iterator:
+        text = doc.page_content
+        for i, (start, end) in enumerate(self._iter_spans(text)):
+            chunk_text = text[start:end]
+            # Créer un nouveau document pour chaque chunk
+            yield type(doc)(
+                page_content=chunk_text,
+                metadata={
+                    **doc.metadata,
+                    "chunk_id": i,
+                    # Position dans le texte source (fusion des chunks contigus)
+                    "start_index": start,
+                    # Tokens précalculés (budget du contexte)
+                    "token_count": count_tokens(chunk_text)
+                }
+            )
+
+    def _split_text(self, text: str) -> List[Tuple[int, str]]:
+        """Découper un texte en morceaux avec overlap: (position, texte)"""
+        return [(start, text[start:end]) for start, end in self._iter_spans(text)]
+
+    def _iter_spans(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Positions (début, fin) des chunks, sans espaces aux bords"""
+        spans = self._iter_structured(text) if self.mode == 'structured' else self._iter_fixed(text)
+        for start, end in spans:
+            span = _trim(text, start, end)
+            if span is not None:
+                yield span
+
+    def _iter_fixed(self, text: str) -> Iterator[Tuple[int, int]]:
         start = 0
         text_length = len(text)
-        
+
         while start < text_length:
             end = min(start + self.chunk_size, text_length)
-            chunk = text[start:end]
-            
-            if chunk.strip():
-                chunks.append(chunk)
-            
-            start = end - self.chunk_overlap
-            
-            # Éviter boucle infinie
-            if start >= text_length:
+            yield start, end
+            if end == text_length:
                 break
-        
-        return chunks
\ No newline at end of file
+            start = end - self.chunk_overlap
+
+    def _iter_structured(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Regroupement glouton d'unités (phrases, lignes) jusqu'à `chunk_size`
+
+        `units` contient les unités du chunk en cours: d'abord celles
+        reprises du chunk précédent (recouvrement), puis les `fresh`
+        unités pas encore émises.
+        """
+        size = self.chunk_size
+        units: List[Tuple[int, int, int]] = []  # (début, fin, force de la frontière finale)
+        fresh = 0
+
+        for start, end, strength, heading in _iter_units(text):
+            if heading:
+                # Un titre ouvre un chunk, sauf si le chunk en cours est trop court
+                if fresh and units[-1][1] - units[0][0] >= size // 4:
+                    yield units[0][0], units[-1][1]
+                    fresh = 0
+                if not fresh:
+                    units = []
+
+            for piece in self._fit(text, start, end, strength):
+                while units and piece[1] - units[0][0] > size:
+                    if fresh < len(units):
+                        units.pop(0)  # Recouvrement sacrifié pour tenir dans la taille
+                        continue
+                    cut = _best_cut(units, size)
+                    yield units[0][0], units[cut][1]
+                    emitted, rest = units[:cut + 1], units[cut + 1:]
+                    units = self._overlap(emitted) + rest
+                    fresh = len(rest)
+                units.append(piece)
+                fresh += 1
+
+        if fresh:
+            yield units[0][0], units[-1][1]
+
+    def _overlap(self, emitted: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+        """Dernières unités émises à reprendre en tête du chunk suivant"""
+        end = emitted[-1][1]
+        i = len(emitted)
+        while i > 0 and end - emitted[i - 1][0] <= self.chunk_overlap:
+            i -= 1
+        return emitted[i:]
+
+    def _fit(self, text: str, start: int, end: int, strength: int) -> Iterator[Tuple[int, int, int]]:
+        """Redécouper une unité plus longue que `chunk_size` (aux espaces si possible)"""
+        size = self.chunk_size
+        while end - start > size:
+            cut = text.rfind(' ', start + size // 2, start + size)
+            cut = cut + 1 if cut != -1 else start + size
+            yield start, cut, 0
+            start = cut
+        yield start, end, strength
+
+
+def _iter_units(text: str) -> Iterator[Tuple[int, int, int, bool]]:
+    """Unités (début, fin, force de la frontière finale, est un titre)
+
+    La fin inclut les espaces de la frontière; une seule passe regex.
+    """
+    position = 0
+    line_start = True
+    for match in _BOUNDARY_RE.finditer(text):
+        kind = match.lastgroup
+        heading = (
+            line_start
+            and kind in ('paragraph', 'line')
+            and _is_heading(text, position, match.start())
+        )
+        yield position, match.end(), _STRENGTH[kind], heading
+        position = match.end()
+        line_start = kind != 'sentence'
+    if position < len(text):
+        yield position, len(text), _STRENGTH['paragraph'], line_start and _is_heading(text, position, len(text))
+
+def _is_heading(text: str, start: int, end: int) -> bool:
+    if end <= start or end - start > MAX_HEADING_CHARS:
+        return False
+    line = text[start:end]
+    if _HEADING_RE.match(line):
+        return True
+    letters = sum(1 for c in line if c.isalpha())
+    return letters >= 3 and line.isupper()
+
+def _best_cut(units: List[Tuple[int, int, int]], size: int) -> int:
+    """Indice de la dernière unité du chunk à émettre
+
+    Frontière la plus forte parmi celles qui laissent un chunk d'au moins
+    la moitié de `chunk_size` (la plus tardive à force égale).
+    """
+    start = units[0][0]
+    best: Optional[int] = None
+    for i, (_, end, strength) in enumerate(units):
+        if end - start < size // 2:
+            continue
+        if best is None or strength >= units[best][2]:
+            best = i
+    return best if best is not None else len(units) - 1
+
+def _trim(text: str, start: int, end: int) -> Optional[Tuple[int, int]]:
+    """Retirer les espaces aux bords d'une plage; None si elle est vide"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
@@ -1,89 +1,731 @@
 import os
-import pickle
-from typing import List, Tuple
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Set, Tuple
 import faiss
 import numpy as np
 from pathlib import Path
+from dotenv import load_dotenv
+
+from .chunk_store import ChunkStore
+from .embedding_matrix import EMBEDDING_DTYPES, EmbeddingMatrix
+from .bm25 import BM25Index, LexicalIndex
+from .metadata_index import MetadataIndex, filter_key
+from .metrics import timed
+from .index_factory import (
+    MAX_TRAINING_VECTORS,
+    build_index,
+    default_spec,
+    read_index_mapped,
+    resolve_spec,
+    search_parameters,
+    uses_inner_product
+)
+
+load_dotenv()
+
+STORE_FILENAME = "store.json"
+STORE_FORMAT = "ensaj-vector-store"
+STORE_FORMAT_VERSION = 2
 
 class VectorStore:  # ← BADELT MEN FAISSVectorStore L VectorStore
-    """Store vectoriel avec FAISS"""
-    
-    def __init__(self, embedding_function, dimension: int = 768):
+    """Store vectoriel avec FAISS
+
+    Chaque chunk a un identifiant stable, utilisé comme ID dans l'index
+    FAISS (IndexIDMap2). Les suppressions posent des tombstones: le chunk
+    disparaît immédiatement des résultats, et les vecteurs sont retirés
+    physiquement par une compaction en arrière-plan.
+
+    Le type d'index (flat, hnsw, ivf, ivfpq ou auto selon la taille du
+    corpus), la métrique (cosine, ip, l2) et l'encodage des vecteurs dans
+    l'index (float32, float16, int8 ou pq) sont configurables; ils sont
+    sauvegardés avec l'index. Avec un encodage compressé, les candidats
+    peuvent être re-classés avec la copie de référence des embeddings
+    (EmbeddingMatrix: sur disque, mappée en mémoire, int8 par défaut quand
+    ni le re-scoring ni le MMR ne s'en servent).
+    """
+
+    def __init__(self, embedding_function, dimension: int = 768, index_type: str = None, metric: str = None):
         self.embedding_function = embedding_function
         self.dimension = dimension
-        self.index = faiss.IndexFlatL2(dimension)
-        self.documents = []
-        self.doc_embeddings = []
-        print(f"🗄️ FAISS Vector Store initialisé (dim={dimension})")
-    
-    def add_documents(self, documents: List, embeddings: List[List[float]] = None):
-        """Ajouter des documents au store"""
+        self.index_config = default_spec(index_type, metric)  # Demandé (peut être "auto")
+        self.index_spec = resolve_spec(self.index_config, 0, dimension)  # Effectif
+        self.index = build_index(self.index_spec, dimension)
+        self.docstore = ChunkStore()                # id -> Document (chunks vivants)
+        self.source_ids: Dict[str, Set[int]] = {}   # source -> ids
+        # Re-scoring exact des candidats d'un index compressé (k × facteur candidats)
+        self.rescore = os.getenv('VECTOR_RESCORE', 'True').lower() == 'true'
+        self.rescore_factor = max(int(os.getenv('VECTOR_RESCORE_FACTOR', 4)), 1)
+        # Copie de référence des vecteurs (reconstructions, MMR, re-scoring, filtres exacts)
+        self._configure_embeddings_dtype()
+        self.embeddings = EmbeddingMatrix(dimension, self.embeddings_dtype)
+        self.row_ids = np.zeros(0, dtype='int64')   # id du chunk de chaque ligne
+        self._tombstones: Set[int] = set()          # ids supprimés encore dans l'index
+        self._tombstone_selector = None
+        self._next_id = 0
+        self.compact_ratio = float(os.getenv('VECTOR_COMPACT_RATIO', 0.2))
+        self.compact_min = int(os.getenv('VECTOR_COMPACT_MIN', 64))
+        self._compacting = False
+        self._generation = 0  # Incrémenté à chaque reconstruction de l'index
+        # Index lexical BM25 (recherche hybride): un segment par ajout, fusionnés en arrière-plan
+        self.lexical_enabled = os.getenv('LEXICAL_INDEX_ENABLED', 'True').lower() == 'true'
+        self.lexical_index = LexicalIndex()
+        self.lexical_merge_ratio = float(os.getenv('LEXICAL_MERGE_RATIO', 0.2))
+        self.lexical_max_segments = int(os.getenv('LEXICAL_MAX_SEGMENTS', 8))
+        self._lexical_merging = False
+        # Index inversé des métadonnées (recherches filtrées) et masques déjà calculés
+        self.metadata_index = MetadataIndex()
+        self.filter_exact_max = int(os.getenv('VECTOR_FILTER_EXACT_MAX', 4096))
+        self._filter_cache = OrderedDict()
+        # Protège l'index lors des ajouts/suppressions concurrents aux recherches
+        self._lock = threading.RLock()
+        # Une sauvegarde à la fois (écrite hors de `_lock`)
+        self._save_lock = threading.Lock()
+        # Instantané partagé entre workers: ni ajout, ni suppression, ni sauvegarde
+        self.read_only = False
+        print(
+            f"🗄️ FAISS Vector Store initialisé (dim={dimension}, "
+            f"index={self.index_config['type']}, métrique={self.index_config['metric']}, "
+            f"stockage={self.index_config['storage']})"
+        )
+
+    def _configure_embeddings_dtype(self):
+        """Encodage de la copie de référence (VECTOR_EMBEDDINGS_DTYPE)
+
+        Par défaut float32, sauf index compressé sans re-scoring ni MMR:
+        int8 (4× plus petit), qui suffit aux filtres exacts et à la
+        reconstruction de l'index. Appliqué aux lignes existantes à la
+        prochaine compaction.
+        """
+        dtype = os.getenv('VECTOR_EMBEDDINGS_DTYPE', '').lower()
+        if not dtype:
+            exact_needed = self.rescore or os.getenv('RAG_USE_MMR', 'True').lower() == 'true'
+            compressed = self.index_config.get('storage', 'float32') != 'float32'
+            dtype = 'int8' if compressed and not exact_needed else 'float32'
+        if dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"VECTOR_EMBEDDINGS_DTYPE inconnu: {dtype} (attendu: {', '.join(EMBEDDING_DTYPES)})")
+        self.embeddings_dtype = dtype
+
+    def _prepare(self, vectors) -> np.ndarray:
+        """Convertir en float32 contigu, normalisé en mode cosine"""
+        vectors = np.array(vectors, dtype='float32').reshape(-1, self.dimension)
+        if self.index_spec['metric'] == 'cosine':
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _to_score(self, distance: float) -> float:
+        """Score de similarité: produit scalaire (cosine en [-1, 1]) ou 1/(1+d) en L2"""
+        if uses_inner_product(self.index_spec):
+            return float(distance)
+        return 1 / (1 + float(distance))
+
+    def _build_index(self, embeddings: EmbeddingMatrix, ids: np.ndarray):
+        """Construire un index adapté à `len(ids)` vecteurs et les y ajouter (par blocs)"""
+        spec = resolve_spec(self.index_config, len(ids), self.dimension)
+        rows = np.arange(len(ids))
+        if len(rows) > MAX_TRAINING_VECTORS:
+            rows = np.sort(np.random.default_rng(0).choice(len(rows), MAX_TRAINING_VECTORS, replace=False))
+        index = build_index(spec, self.dimension, embeddings.rows(rows))
+        for start in range(0, len(ids), 65_536):
+            block = np.arange(start, min(start + 65_536, len(ids)))
+            index.add_with_ids(embeddings.rows(block), ids[block])
+        return index, spec
+
+    @property
+    def documents(self) -> List:
+        """Documents (chunks) présents dans le store"""
+        return list(self.docstore.values())
+
+    def __len__(self) -> int:
+        return len(self.docstore)
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("Vector store en lecture seule (instantané partagé entre workers)")
+
+    def add_documents(self, documents: List, embeddings: List[List[float]] = None) -> List[int]:
+        """Ajouter des documents au store
+
+        Retourne les identifiants stables attribués aux documents.
+        """
+        self._check_writable()
         if embeddings is None:
             texts = [doc.page_content for doc in documents]
             embeddings = self.embedding_function.embed_documents(texts)
-        
+
         # Convertir en numpy array
-        embeddings_np = np.array(embeddings).astype('float32')
-        
-        # Ajouter à l'index FAISS
-        self.index.add(embeddings_np)
-        
-        # Sauvegarder documents et embeddings
-        self.documents.extend(documents)
-        self.doc_embeddings.extend(embeddings)
-        
+        embeddings_np = self._prepare(embeddings)
+        # Recopie éventuelle des lignes mappées, hors verrou (une fois par chargement)
+        self.embeddings.make_appendable()
+
+        with self._lock:
+            # Attribuer des identifiants stables
+            ids = np.arange(self._next_id, self._next_id + len(documents), dtype='int64')
+            self._next_id += len(documents)
+
+            # Sauvegarder documents et embeddings
+            self.embeddings.append(embeddings_np)
+            self.row_ids = np.concatenate([self.row_ids, ids])
+
+            # Ajouter à l'index FAISS, ou changer de type d'index si le
+            # corpus a franchi un seuil (entraînement sur tous les vecteurs)
+            target = resolve_spec(self.index_config, len(self.row_ids) - len(self._tombstones), self.dimension)
+            current = (self.index_spec['type'], self.index_spec.get('storage', 'float32'))
+            if (target['type'], target['storage']) != current:
+                print(f"🔁 Index {'/'.join(current)} → {target['type']}/{target['storage']}")
+                self.compact()
+            else:
+                self.index.add_with_ids(embeddings_np, ids)
+            for doc, doc_id in zip(documents, ids.tolist()):
+                doc.id = doc_id
+                self.docstore[doc_id] = doc
+                source = doc.metadata.get('source', 'Unknown')
+                self.source_ids.setdefault(source, set()).add(doc_id)
+            self.metadata_index.add((doc.id, doc.metadata) for doc in documents)
+            self._filter_cache.clear()
+
+        self._index_lexical(documents)
         print(f"✅ {len(documents)} documents ajoutés au vector store")
-    
-    def similarity_search(self, query: str, k: int = 5) -> List[Tuple]:
-        """Rechercher les documents les plus similaires"""
-        # Générer embedding de la requête
-        query_embedding = self.embedding_function.embed_query(query)
-        query_np = np.array([query_embedding]).astype('float32')
-        
-        # Rechercher dans FAISS
-        distances, indices = self.index.search(query_np, k)
-        
-        # Retourner documents avec scores
+        return ids.tolist()
+
+    def _index_lexical(self, documents: List):
+        """Indexer un lot en BM25 dans un nouveau segment (hors verrou, coût proportionnel au lot)"""
+        if not self.lexical_enabled:
+            return
+        with self._lock:
+            main = self.lexical_index.main
+        segment = BM25Index.build(((doc.id, doc.page_content) for doc in documents), stats=main)
+        with self._lock:
+            self.lexical_index = self.lexical_index.with_segment(segment)
+            self._maybe_merge_lexical()
+
+    def _maybe_merge_lexical(self):
+        """Lancer une fusion des segments BM25 en arrière-plan (appelé sous verrou)
+
+        Fusion complète quand les ajouts et suppressions en attente dépassent
+        `lexical_merge_ratio` du corpus; sinon, au-delà de
+        `lexical_max_segments`, seuls les petits segments sont fusionnés.
+        """
+        index = self.lexical_index
+        if self._lexical_merging or not index.pending:
+            return
+        if index.pending >= self.lexical_merge_ratio * index.size:
+            full = True
+        elif len(index.segments) > self.lexical_max_segments:
+            full = False
+        else:
+            return
+        self._lexical_merging = True
+        threading.Thread(target=self.merge_lexical_index, args=(full,), daemon=True).start()
+
+    def merge_lexical_index(self, full: bool = True):
+        """Fusionner les segments BM25 (tous, ou seulement les petits) hors verrou
+
+        Les segments ajoutés et les suppressions survenus pendant la fusion
+        sont rattrapés au moment de l'échange.
+        """
+        try:
+            with self._lock:
+                snapshot = self.lexical_index
+                docstore = self.docstore
+            merged_segments = snapshot.segments if full else snapshot.segments[1:]
+            ids = snapshot.live_ids(merged_segments)
+
+            def texts():
+                for doc_id in ids:
+                    doc = docstore.get(doc_id)
+                    if doc is not None:
+                        yield doc_id, doc.page_content
+
+            merged = BM25Index.build(texts(), stats=None if full else snapshot.main)
+
+            with self._lock:
+                current = self.lexical_index
+                n = len(snapshot.segments)
+                if len(current.segments) < n or any(a is not b for a, b in zip(current.segments, snapshot.segments)):
+                    return  # Index remplacé entre-temps (load)
+                kept = () if full else snapshot.segments[:1]
+                deleted = current.deleted - snapshot.deleted if full else current.deleted
+                self.lexical_index = LexicalIndex(kept + (merged,) + current.segments[n:], deleted)
+            print(f"🧩 Index BM25 fusionné ({'complet' if full else 'segments récents'}): {merged.size} chunks")
+        finally:
+            self._lexical_merging = False
+
+    def rebuild_lexical_index(self):
+        """Reconstruire l'index BM25 à partir des chunks vivants (hors verrou)"""
+        if not self.lexical_enabled:
+            return
+        with self._lock:
+            docstore = self.docstore
+            ids = list(docstore.keys())
+
+        def texts():
+            for doc_id in ids:
+                doc = docstore.get(doc_id)
+                if doc is not None:
+                    yield doc_id, doc.page_content
+
+        lexical_index = LexicalIndex([BM25Index.build(texts())])
+        with self._lock:
+            self.lexical_index = lexical_index
+
+    def lexical_search(self, query: str, k: int = 5, filters: Dict = None) -> List[Tuple]:
+        """Recherche lexicale BM25 (ne nécessite pas le service d'embeddings)"""
+        mask = None
+        lexical_index = self.lexical_index
+        if filters:
+            with self._lock:
+                mask, _, _ = self._filter(filters)
+        with timed("bm25_search"):
+            hits = lexical_index.search(query, k, mask=mask)
         results = []
-        for i, idx in enumerate(indices[0]):
-            if idx < len(self.documents):
-                # Convertir distance L2 en score de similarité
-                score = 1 / (1 + distances[0][i])
-                results.append((self.documents[idx], score))
-        
+        for doc_id, score in hits:
+            doc = self.docstore.get(doc_id)
+            if doc is not None:
+                results.append((doc, score))
         return results
-    
+
+    def get_embeddings(self, ids: List[int]) -> np.ndarray:
+        """Embeddings stockés (n, dimension) pour des ids de chunks
+
+        Les ids absents de l'index donnent une ligne de zéros.
+        """
+        ids = np.asarray(ids, dtype='int64')
+        with self._lock:
+            row_ids = self.row_ids
+            embeddings = self.embeddings
+        # row_ids est croissant: ids attribués dans l'ordre, compaction stable
+        rows = np.minimum(np.searchsorted(row_ids, ids), max(len(row_ids) - 1, 0))
+        found = (row_ids[rows] == ids) if len(row_ids) else np.zeros(len(ids), dtype=bool)
+        vectors = np.zeros((len(ids), self.dimension), dtype='float32')
+        vectors[found] = embeddings.rows(rows[found])
+        return vectors
+
+    def delete(self, ids: List[int]) -> int:
+        """Supprimer des documents par identifiant
+
+        Coût proportionnel au nombre d'ids: les chunks sont retirés du
+        docstore et marqués comme tombstones dans l'index.
+        """
+        self._check_writable()
+        removed = []
+        with self._lock:
+            for doc_id in ids:
+                doc = self.docstore.pop(doc_id, None)
+                if doc is None:
+                    continue
+                source = doc.metadata.get('source', 'Unknown')
+                source_set = self.source_ids.get(source)
+                if source_set is not None:
+                    source_set.discard(doc_id)
+                    if not source_set:
+                        del self.source_ids[source]
+                self._tombstones.add(doc_id)
+                removed.append((doc_id, doc.metadata))
+
+            if removed:
+                self.metadata_index.remove(removed)
+                self._tombstone_selector = None
+                self._filter_cache.clear()
+                self._maybe_compact()
+                if self.lexical_enabled:
+                    self.lexical_index = self.lexical_index.without(doc_id for doc_id, _ in removed)
+                    self._maybe_merge_lexical()
+
+        if removed:
+            print(f"🗑️ {len(removed)} documents supprimés du vector store")
+        return len(removed)
+
+    def delete_source(self, source: str) -> int:
+        """Supprimer tous les chunks d'une source (nom de fichier)"""
+        with self._lock:
+            ids = list(self.source_ids.get(source, ()))
+        return self.delete(ids)
+
+    def _maybe_compact(self):
+        """Lancer une compaction en arrière-plan si les tombstones s'accumulent"""
+        if self._compacting or len(self._tombstones) < self.compact_min:
+            return
+        if len(self._tombstones) < self.compact_ratio * len(self.row_ids):
+            return
+        self._compacting = True
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """Reconstruire l'index sans les chunks supprimés
+
+        L'index est reconstruit hors verrou à partir des embeddings gardés;
+        les ajouts et suppressions survenus entre-temps sont rattrapés avant
+        l'échange.
+        """
+        try:
+            with self._lock:
+                generation = self._generation
+                embeddings = self.embeddings
+                row_ids = self.row_ids
+                tombstones = set(self._tombstones)
+
+            keep = ~np.isin(row_ids, np.fromiter(tombstones, dtype='int64', count=len(tombstones)))
+            new_embeddings = embeddings.select(np.flatnonzero(keep), self.embeddings_dtype)
+            new_row_ids = row_ids[keep]
+            new_index, new_spec = self._build_index(new_embeddings, new_row_ids)
+
+            with self._lock:
+                if self._generation != generation:
+                    return  # Index reconstruit entre-temps (load, autre compaction)
+
+                # Lignes ajoutées pendant la reconstruction
+                n_snapshot = len(row_ids)
+                if len(self.row_ids) > n_snapshot:
+                    extra_embeddings = self.embeddings.rows(np.arange(n_snapshot, len(self.row_ids)))
+                    extra_ids = self.row_ids[n_snapshot:]
+                    new_index.add_with_ids(extra_embeddings, extra_ids)
+                    new_embeddings.append(extra_embeddings)
+                    new_row_ids = np.concatenate([new_row_ids, extra_ids])
+
+                self.index = new_index
+                self.index_spec = new_spec
+                self.embeddings = new_embeddings
+                self.row_ids = new_row_ids
+                # Tombstones posés pendant la reconstruction: toujours dans l'index
+                self._tombstones -= tombstones
+                self._tombstone_selector = None
+                self._filter_cache.clear()
+                self._generation += 1
+
+            print(
+                f"🧹 Index reconstruit ({new_spec['type']}/{new_spec['storage']}): "
+                f"{len(tombstones)} vecteurs retirés"
+            )
+        finally:
+            self._compacting = False
+
+    def _search_params(self):
+        """Paramètres de recherche (efSearch / nprobe) excluant les tombstones"""
+        if not self._tombstones:
+            return search_parameters(self.index_spec)
+        if self._tombstone_selector is None:
+            deleted = np.fromiter(self._tombstones, dtype='int64', count=len(self._tombstones))
+            batch = faiss.IDSelectorBatch(len(deleted), faiss.swig_ptr(deleted))
+            # Garder une référence: IDSelectorNot ne copie pas `batch`
+            self._tombstone_selector = (batch, faiss.IDSelectorNot(batch))
+        return search_parameters(self.index_spec, self._tombstone_selector[1])
+
+    def _filter(self, filters: Dict) -> Tuple:
+        """Chunks vivants qui passent `filters` (appelé sous verrou)
+
+        Retourne (masque sur les ids, ids ou None, bitmap FAISS ou None):
+        un filtre sélectif donne la liste des ids (recherche exacte sur
+        leurs embeddings), sinon un bitmap pour IDSelectorBitmap. Le
+        résultat est gardé jusqu'au prochain ajout ou suppression.
+        """
+        key = filter_key(filters)
+        cached = self._filter_cache.get(key)
+        if cached is not None:
+            self._filter_cache.move_to_end(key)
+            return cached
+
+        mask = self.metadata_index.mask(filters, self._next_id)
+        if self._tombstones:
+            mask = mask.copy()
+            mask[np.fromiter(self._tombstones, dtype='int64', count=len(self._tombstones))] = False
+        count = int(np.count_nonzero(mask))
+        if count <= self.filter_exact_max:
+            entry = (mask, np.flatnonzero(mask), None)
+        else:
+            entry = (mask, None, np.packbits(mask, bitorder='little'))
+
+        self._filter_cache[key] = entry
+        while len(self._filter_cache) > 64:
+            self._filter_cache.popitem(last=False)
+        return entry
+
+    def filter_values(self, key: str) -> List:
+        """Valeurs disponibles pour une métadonnée filtrable"""
+        with self._lock:
+            return self.metadata_index.values(key)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 5,
+        query_embedding: List[float] = None,
+        filters: Dict = None
+    ) -> List[Tuple]:
+        """Rechercher les documents les plus similaires
+
+        `query_embedding` permet de fournir un embedding déjà calculé
+        (par exemple par le client async de l'API). `filters` restreint la
+        recherche, ex: {"source": "isic.pdf"} ou {"type": ["pdf", "txt"]}.
+        """
+        if filters:
+            self.metadata_index.validate(filters)
+        # Générer embedding de la requête
+        if query_embedding is None:
+            with timed("embed_query"):
+                query_embedding = self.embedding_function.embed_query(query)
+        return self._search_vectors(self._prepare([query_embedding]), k, filters)[0]
+
+    def similarity_search_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        query_embeddings: List[List[float]] = None,
+        filters: Dict = None
+    ) -> List[List[Tuple]]:
+        """Rechercher plusieurs requêtes en un seul appel d'embedding et une seule recherche FAISS
+
+        Retourne une liste de résultats (doc, score) par requête, dans l'ordre.
+        """
+        if not queries:
+            return []
+        if filters:
+            self.metadata_index.validate(filters)
+        if query_embeddings is None:
+            with timed("embed_query"):
+                query_embeddings = self.embedding_function.embed_queries(queries)
+        return self._search_vectors(self._prepare(query_embeddings), k, filters)
+
+    @property
+    def _rescoring(self) -> bool:
+        """Re-classer les candidats: seulement si l'index stocke des vecteurs compressés"""
+        return self.rescore and self.index_spec.get('storage', 'float32') != 'float32'
+
+    def _search_vectors(self, query_np: np.ndarray, k: int, filters: Dict = None) -> List[List[Tuple]]:
+        """Recherche FAISS sur une matrice de requêtes (n, dimension)"""
+        with self._lock, timed("faiss_search"):
+            rescoring = self._rescoring
+            fetch_k = k * self.rescore_factor if rescoring else k
+            if filters:
+                _, ids, bitmap = self._filter(filters)
+                if ids is not None:
+                    # Peu de candidats: recherche exacte sur leurs embeddings
+                    distances, indices = self._search_ids(query_np, ids, k)
+                    rescoring = False
+                else:
+                    # Filtre appliqué pendant le parcours de l'index (bitmap sur les ids)
+                    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+                    distances, indices = self.index.search(
+                        query_np, fetch_k, params=search_parameters(self.index_spec, selector)
+                    )
+            else:
+                # Rechercher dans FAISS (les chunks supprimés sont exclus)
+                distances, indices = self.index.search(query_np, fetch_k, params=self._search_params())
+            if rescoring:
+                distances, indices = self._rescore(query_np, indices, k)
+
+            # Retourner documents avec scores
+            all_results = []
+            for row_distances, row_indices in zip(distances, indices):
+                results = []
+                for distance, doc_id in zip(row_distances, row_indices):
+                    doc = self.docstore.get(int(doc_id))
+                    if doc is not None:
+                        results.append((doc, self._to_score(distance)))
+                all_results.append(results)
+
+        return all_results
+
+    def _rescore(self, query_np: np.ndarray, indices: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-classer les candidats de chaque requête avec les embeddings stockés"""
+        distances = np.full((len(query_np), k), -1.0, dtype='float32')
+        rescored = np.full((len(query_np), k), -1, dtype='int64')
+        for i, candidates in enumerate(indices):
+            row_distances, row_indices = self._search_ids(query_np[i:i + 1], candidates[candidates >= 0], k)
+            distances[i], rescored[i] = row_distances[0], row_indices[0]
+        return distances, rescored
+
+    def set_storage(self, storage: str):
+        """Changer l'encodage des vecteurs de l'index (reconstruit l'index)"""
+        self._check_writable()
+        config = default_spec(self.index_config['type'], self.index_config['metric'], storage)
+        config['params'] = self.index_config.get('params', {})
+        self.index_config = config
+        self._configure_embeddings_dtype()
+        self.compact()
+
+    def _search_ids(self, query_np: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Recherche exacte restreinte à `ids`, au format de `index.search`"""
+        rows = np.minimum(np.searchsorted(self.row_ids, ids), max(len(self.row_ids) - 1, 0))
+        found = (self.row_ids[rows] == ids) if len(self.row_ids) else np.zeros(len(ids), dtype=bool)
+        ids, vectors = ids[found], self.embeddings.rows(rows[found])
+
+        if uses_inner_product(self.index_spec):
+            scores = query_np @ vectors.T
+        else:
+            # Distance L2 au carré, comme FAISS (plus petit = plus proche)
+            scores = -(
+                (query_np ** 2).sum(axis=1, keepdims=True)
+                - 2 * query_np @ vectors.T
+                + (vectors ** 2).sum(axis=1)
+            )
+
+        distances = np.full((len(query_np), k), -1.0, dtype='float32')
+        indices = np.full((len(query_np), k), -1, dtype='int64')
+        n = min(k, len(ids))
+        if n:
+            top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            indices[:, :n] = ids[top]
+            distances[:, :n] = top_scores if uses_inner_product(self.index_spec) else -top_scores
+        return distances, indices
+
     def save(self, path: str):
-        """Sauvegarder l'index"""
+        """Sauvegarder l'index
+
+        Format (version STORE_FORMAT_VERSION), sans pickle:
+        - store.json: description du store et schéma des métadonnées
+        - index.faiss: index FAISS
+        - embeddings.npy: embeddings float32, float16 ou int8 (n, dimension),
+          avec embeddings_scale.npy (échelle par ligne) en int8
+        - chunk_ids.npy, texts.bin, text_offsets.npy, meta_*.npy: chunks
+
+        Un instantané cohérent est pris sous verrou (index FAISS sérialisé,
+        références aux tableaux); l'écriture sur disque se fait hors verrou,
+        les recherches continuent pendant ce temps.
+        """
+        self._check_writable()
         Path(path).mkdir(parents=True, exist_ok=True)
-        
-        # Sauvegarder l'index FAISS
-        faiss.write_index(self.index, os.path.join(path, "index.faiss"))
-        
-        # Sauvegarder documents et métadonnées
-        with open(os.path.join(path, "documents.pkl"), 'wb') as f:
-            pickle.dump(self.documents, f)
-        
-        with open(os.path.join(path, "embeddings.pkl"), 'wb') as f:
-            pickle.dump(self.doc_embeddings, f)
-        
+
+        with self._save_lock:
+            snapshot = self._snapshot()
+            ids = snapshot["row_ids"].tolist()
+            columns = snapshot["docstore"].save(path, ids)
+            if snapshot["lexical_index"] is not None:
+                snapshot["lexical_index"].save(path)
+            snapshot["embeddings"].save(path)
+            with open(os.path.join(path, "index.faiss.tmp"), 'wb') as f:
+                f.write(snapshot["index_bytes"].tobytes())
+            os.replace(os.path.join(path, "index.faiss.tmp"), os.path.join(path, "index.faiss"))
+
+            # store.json est écrit en dernier: il valide l'ensemble
+            store_info = {
+                "format": STORE_FORMAT,
+                "version": STORE_FORMAT_VERSION,
+                "dimension": self.dimension,
+                "count": len(ids),
+                **snapshot["info"],
+                "metadata_columns": columns
+            }
+            tmp_path = os.path.join(path, STORE_FILENAME + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(store_info, f, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(path, STORE_FILENAME))
+
         print(f"💾 Vector store sauvegardé: {path}")
-    
-    def load(self, path: str):
-        """Charger l'index"""
-        # Charger l'index FAISS
-        self.index = faiss.read_index(os.path.join(path, "index.faiss"))
-        
-        # Charger documents
-        with open(os.path.join(path, "documents.pkl"), 'rb') as f:
-            self.documents = pickle.load(f)
-        
-        # Charger embeddings
-        with open(os.path.join(path, "embeddings.pkl"), 'rb') as f:
-            self.doc_embeddings = pickle.load(f)
-        
-        print(f"📂 Vector store chargé: {len(self.documents)} documents")
+
+    def _snapshot(self, attempts: int = 3) -> Dict:
+        """État à sauvegarder, sans tombstones (compactés d'abord, hors verrou)"""
+        for attempt in range(attempts):
+            if self._tombstones:
+                self.compact()
+            with self._lock:
+                if self._tombstones and attempt < attempts - 1:
+                    continue  # Suppressions pendant la compaction: recommencer
+                if self._tombstones:
+                    self.compact()  # Suppressions en continu: compacter sous verrou
+                return {
+                    "row_ids": self.row_ids,
+                    "embeddings": self.embeddings.frozen(),
+                    "docstore": self.docstore.snapshot(),
+                    "lexical_index": self.lexical_index if self.lexical_enabled else None,
+                    "index_bytes": faiss.serialize_index(self.index),
+                    "info": {
+                        "next_id": self._next_id,
+                        "index": self.index_spec,
+                        "index_config": self.index_config
+                    }
+                }
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """Vérifier qu'un index au format actuel existe dans `path`"""
+        return os.path.exists(os.path.join(path, STORE_FILENAME))
+
+    @staticmethod
+    def snapshot_version(path: str):
+        """Version de l'index sauvegardé dans `path` (None s'il n'y en a pas)
+
+        store.json est écrit en dernier par `save`: sa date change à chaque
+        sauvegarde complète.
+        """
+        try:
+            return os.stat(os.path.join(path, STORE_FILENAME)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self, path: str, read_only: bool = False):
+        """Charger l'index
+
+        Les embeddings et les chunks sont mappés en mémoire, pas copiés.
+        Avec `read_only=True`, l'index FAISS l'est aussi quand FAISS le
+        permet, et le store refuse ensuite toute modification: plusieurs
+        workers partagent ainsi une seule copie physique de l'index.
+        """
+        store_path = os.path.join(path, STORE_FILENAME)
+        if not os.path.exists(store_path):
+            if os.path.exists(os.path.join(path, "documents.pkl")):
+                raise ValueError(
+                    f"Index au format pickle dans {path}: non supporté, "
+                    f"reconstruire avec 'python scripts/index_documents.py --full'"
+                )
+            raise FileNotFoundError(f"Aucun index dans {path}")
+
+        with open(store_path, 'r', encoding='utf-8') as f:
+            store_info = json.load(f)
+        if store_info.get("format") != STORE_FORMAT or store_info.get("version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Format d'index non supporté: {store_info.get('format')} v{store_info.get('version')}")
+        if store_info["dimension"] != self.dimension:
+            raise ValueError(f"Dimension de l'index ({store_info['dimension']}) != {self.dimension}")
+
+        docstore = ChunkStore.load(path, store_info["metadata_columns"])
+        embeddings = EmbeddingMatrix.load(path, self.dimension)
+        row_ids = np.load(os.path.join(path, "chunk_ids.npy"), mmap_mode='r')
+        if len(row_ids) != store_info["count"]:
+            # Une sauvegarde a commencé depuis la lecture de store.json
+            raise ValueError(f"Index en cours d'écriture dans {path}, réessayer")
+        index_file = os.path.join(path, "index.faiss")
+        index = read_index_mapped(index_file) if read_only else faiss.read_index(index_file)
+
+        source_ids = {
+            source: set(ids)
+            for source, ids in docstore.ids_by_value('source').items()
+        }
+        metadata_index = MetadataIndex.build(docstore, self.metadata_index.keys)
+        lexical_index = LexicalIndex.load(path) if LexicalIndex.exists(path) else None
+
+        with self._lock:
+            self.index = index
+            self.embeddings = embeddings
+            self.row_ids = row_ids
+            self.docstore = docstore
+            self.source_ids = source_ids
+            self._tombstones = set()
+            self._tombstone_selector = None
+            self._next_id = store_info["next_id"]
+            # Type d'index et paramètres (efSearch, nprobe) sauvegardés avec l'index
+            self.index_spec = store_info.get("index", {"type": "flat", "metric": "l2", "params": {}})
+            self.index_config = {
+                "storage": "float32",
+                **store_info.get("index_config", {**self.index_spec, "params": {}})
+            }
+            self.lexical_index = lexical_index or LexicalIndex()
+            self.metadata_index = metadata_index
+            self._filter_cache.clear()
+            self.read_only = read_only
+            self._generation += 1
+            self._configure_embeddings_dtype()
+
+        if lexical_index is None:
+            self.rebuild_lexical_index()
+
+        mode = ", lecture seule" if read_only else ""
+        print(f"📂 Vector store chargé: {len(self.docstore)} documents (index {self.index_spec['type']}/{self.index_spec.get('storage', 'float32')}{mode})")
 
 
 # Alias pour compatibilité
-FAISSVectorStore = VectorStore
\ No newline at end of file
+FAISSVectorStore = VectorStore
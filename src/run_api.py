@@ -1,65 +1,53 @@
 """
 Script pour lancer l'API
+Exécuter: python src/run_api.py [--workers 4]
+
+Le système RAG est chargé dans le lifespan de chaque worker (voir
+src/api/rag_system.py). Avec plusieurs workers, l'index est ouvert en
+lecture seule et mappé en mémoire: les workers partagent une seule copie
+physique, et les documents sont ajoutés avec scripts/index_documents.py.
+Les index flat et HNSW ne sont mappés qu'avec FAISS >= 1.11 (voir
+requirements.txt); avec une version plus ancienne, chaque worker charge sa
+propre copie et la mémoire est multipliée par le nombre de workers.
 """
 
 import os
+import argparse
 import uvicorn
 from dotenv import load_dotenv
 
 # Charger les variables d'environnement
 load_dotenv()
 
-# Initialiser le système RAG avant de lancer l'API
-from src.rag import (
-    OllamaEmbeddings,
-    DocumentLoader,
-    TextSplitter,
-    FAISSVectorStore,
-    Retriever
-)
-from src.api.routes import initialize_rag_system
+def main():
+    parser = argparse.ArgumentParser(description="Lancer l'API ENSA Chatbot")
+    parser.add_argument("--host", default=os.getenv('API_HOST', '0.0.0.0'))
+    parser.add_argument("--port", type=int, default=int(os.getenv('API_PORT', 8080)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv('API_WORKERS', 1)),
+                        help="Nombre de processus uvicorn (index partagé en lecture seule si > 1)")
+    parser.add_argument("--reload", action=argparse.BooleanOptionalAction,
+                        default=os.getenv('API_RELOAD', 'True').lower() == 'true',
+                        help="Recharger l'API quand le code change (un seul worker)")
+    args = parser.parse_args()
 
-def setup_rag():
-    """Configurer le système RAG"""
-    print("\n🔧 Configuration du système RAG...")
-    
-    # Embeddings
-    embeddings = OllamaEmbeddings()
-    
-    # Vector store
-    vector_store = FAISSVectorStore(embeddings)
-    
-    # Vérifier si un index existe
-    index_path = os.getenv('VECTOR_DB_PATH', './data/embeddings/faiss_index')
-    
-    if os.path.exists(os.path.join(index_path, 'index.faiss')):
-        print("📂 Chargement de l'index existant...")
-        vector_store.load(index_path)
-    else:
-        print("⚠️ Aucun index trouvé. Ajoutez des documents avec 'python scripts/index_documents.py'")
-    
-    # Retriever
-    retriever = Retriever(vector_store)
-    
-    # Initialiser dans l'API
-    initialize_rag_system(vector_store, retriever)
-    
-    print("✅ Système RAG prêt!\n")
-    return vector_store, retriever
+    if args.workers > 1:
+        if args.reload:
+            print("⚠️ --reload ignoré avec plusieurs workers")
+            args.reload = False
+        # Hérité par les workers: chacun mappe le même index sans le modifier
+        os.environ['RAG_READ_ONLY'] = 'true'
+        if os.getenv('CONVERSATION_STORE', 'memory').lower() == 'memory':
+            print("⚠️ CONVERSATION_STORE=memory: l'historique n'est pas partagé entre workers (utiliser sql)")
+        print(f"👥 {args.workers} workers, index en lecture seule")
 
-if __name__ == "__main__":
-    # Setup RAG
-    setup_rag()
-    
-    # Configuration
-    host = os.getenv('API_HOST', '0.0.0.0')
-    port = int(os.getenv('API_PORT', 8080))
-    reload = os.getenv('API_RELOAD', 'True').lower() == 'true'
-    
     # Lancer l'API
     uvicorn.run(
         "src.api.main:app",
-        host=host,
-        port=port,
-        reload=reload
+        host=args.host,
+        port=args.port,
+        reload=args.reload,
+        workers=args.workers
     )
+
+if __name__ == "__main__":
+    main()
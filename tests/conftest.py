@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Importer `src` comme les scripts
+sys.path.append(str(Path(__file__).parent.parent))
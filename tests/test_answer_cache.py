@@ -0,0 +1,72 @@
+"""
+Cache sémantique des réponses: seuil de similarité, invalidation par source, LRU, TTL
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("fastapi")  # src.api importe l'application FastAPI
+
+from src.api import answer_cache as answer_cache_module
+from src.api.answer_cache import SemanticAnswerCache
+
+def _vector(angle: float) -> list:
+    """Vecteur unitaire dont le cosinus avec [1, 0, 0] vaut cos(angle)"""
+    return [float(np.cos(angle)), float(np.sin(angle)), 0.0]
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setenv('ANSWER_CACHE_ENABLED', 'True')
+    return SemanticAnswerCache(max_entries=3, ttl_seconds=60, threshold=0.95)
+
+def test_threshold(cache):
+    cache.put([1, 0, 0], "Conditions d'admission ?", "Sur concours.", [{"source": "admission.pdf"}])
+
+    hit = cache.lookup(_vector(np.arccos(0.96)))
+    assert hit is not None and hit.answer == "Sur concours."
+    assert cache.lookup(_vector(np.arccos(0.94))) is None
+    # Même direction, autre norme: la similarité est un cosinus
+    assert cache.lookup([5, 0, 0]) is not None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+def test_invalidate_source(cache):
+    cache.put([1, 0, 0], "q1", "a1", [{"source": "admission.pdf"}, {"source": "reglement.pdf"}])
+    cache.put([0, 1, 0], "q2", "a2", [{"source": "stages.pdf"}])
+    cache.put([0, 0, 1], "q3", "a3", [])  # Sans source: invalidée à chaque changement
+
+    assert cache.invalidate_source("reglement.pdf") == 2
+    assert cache.lookup([1, 0, 0]) is None
+    assert cache.lookup([0, 0, 1]) is None
+    assert cache.lookup([0, 1, 0]).answer == "a2"
+    assert cache.stats()["invalidations"] == 2 and cache.stats()["entries"] == 1
+
+    assert cache.invalidate_source("inconnu.pdf") == 0
+    # Les places libérées sont réutilisées
+    cache.put([1, 0, 0], "q1", "a1 bis", [{"source": "admission.pdf"}])
+    assert cache.lookup([1, 0, 0]).answer == "a1 bis"
+
+def test_lru_eviction(cache):
+    for i, vector in enumerate(np.eye(3).tolist()):
+        cache.put(vector, f"q{i}", f"a{i}", [{"source": f"doc{i}.pdf"}])
+    cache.lookup([1, 0, 0])  # q0 devient la plus récente
+    cache.put([1, 1, 0], "q3", "a3", [{"source": "doc3.pdf"}])
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.lookup([0, 1, 0]) is None  # q1, la moins récente, est évincée
+    assert cache.lookup([1, 0, 0]).answer == "a0"
+
+def test_ttl_and_disabled(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    cache.put([1, 0, 0], "q", "a", [{"source": "doc.pdf"}])
+    now[0] += 59
+    assert cache.lookup([1, 0, 0]) is not None
+    now[0] += 2
+    assert cache.lookup([1, 0, 0]) is None
+
+    monkeypatch.setenv('ANSWER_CACHE_ENABLED', 'False')
+    disabled = SemanticAnswerCache(max_entries=3)
+    disabled.put([1, 0, 0], "q", "a", [])
+    assert disabled.lookup([1, 0, 0]) is None
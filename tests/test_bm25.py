@@ -0,0 +1,127 @@
+"""
+Index BM25 incrémental (segments, suppressions, fusion, sauvegarde) et fusion hybride RRF
+"""
+
+import numpy as np
+import pytest
+
+from src.rag.bm25 import BM25Index, LexicalIndex
+from src.rag.document_loader import Document
+from src.rag.retriever import Retriever
+from src.rag.vector_store import VectorStore
+
+DIMENSION = 4
+TEXTS = [
+    "admission au cycle ingénieur sur concours national",
+    "règlement pédagogique et système d'évaluation des modules",
+    "absences justifiées et session de rattrapage",
+    "dossier de candidature pour l'admission parallèle",
+    "filière génie informatique ISIC et stage PFE",
+    "bibliothèque ouverte du lundi au vendredi",
+]
+
+class NoEmbeddings:
+    """Les tests fournissent les embeddings"""
+    model_name = "test"
+    cache = None
+
+    def embed_query(self, text):
+        raise RuntimeError("embeddings fournis par le test")
+
+@pytest.fixture
+def make_store(monkeypatch):
+    # Pas de fusion en arrière-plan: les tests la déclenchent eux-mêmes
+    monkeypatch.setenv('LEXICAL_MERGE_RATIO', '1000')
+    monkeypatch.setenv('LEXICAL_MAX_SEGMENTS', '1000')
+    monkeypatch.setenv('RAG_USE_MMR', 'False')
+
+    def make(texts, embeddings=None, **metadata):
+        vector_store = VectorStore(NoEmbeddings(), dimension=DIMENSION, index_type='flat')
+        if embeddings is None:
+            embeddings = np.random.default_rng(0).normal(size=(len(texts), DIMENSION))
+        documents = [Document(text, {"source": f"doc{i}.txt", **metadata}) for i, text in enumerate(texts)]
+        vector_store.add_documents(documents, np.asarray(embeddings, dtype='float32').tolist())
+        return vector_store
+    return make
+
+def _full_rebuild(vector_store):
+    return BM25Index.build((doc_id, vector_store.docstore[doc_id].page_content) for doc_id in vector_store.docstore.keys())
+
+def _scores(hits):
+    return {doc_id: round(score, 5) for doc_id, score in hits}
+
+def test_add_creates_segment_and_merge_matches_rebuild(make_store):
+    vector_store = make_store(TEXTS[:4])
+    vector_store.add_documents([Document(text, {"source": "new.txt"}) for text in TEXTS[4:]], np.eye(2, DIMENSION).tolist())
+    assert len(vector_store.lexical_index.segments) == 2
+
+    hits = vector_store.lexical_index.search("stage PFE", k=3)
+    assert hits and hits[0][0] == 4  # Chunk du nouveau segment
+
+    vector_store.delete([0])
+    assert 0 not in _scores(vector_store.lexical_index.search("admission concours", k=10))
+
+    vector_store.merge_lexical_index(full=True)
+    lexical_index = vector_store.lexical_index
+    assert len(lexical_index.segments) == 1 and not lexical_index.deleted
+    expected = _full_rebuild(vector_store)
+    for query in ("admission concours", "stage PFE", "rattrapage absences", "règlement modules"):
+        assert _scores(lexical_index.search(query, k=10)) == pytest.approx(_scores(expected.search(query, k=10)))
+
+def test_partial_merge_keeps_main_segment(make_store):
+    vector_store = make_store(TEXTS[:3])
+    for text in TEXTS[3:]:
+        vector_store.add_documents([Document(text, {"source": "new.txt"})], np.ones((1, DIMENSION)).tolist())
+    main = vector_store.lexical_index.main
+    assert len(vector_store.lexical_index.segments) == 4
+
+    vector_store.merge_lexical_index(full=False)
+    lexical_index = vector_store.lexical_index
+    assert len(lexical_index.segments) == 2 and lexical_index.main is main
+    assert sorted(lexical_index.live_ids()) == list(range(len(TEXTS)))
+
+def test_save_load_keeps_segments_and_deletions(make_store, tmp_path):
+    vector_store = make_store(TEXTS[:4])
+    vector_store.add_documents([Document(TEXTS[4], {"source": "new.txt"})], np.ones((1, DIMENSION)).tolist())
+    vector_store.delete([3])
+    vector_store.save(str(tmp_path))
+
+    loaded = LexicalIndex.load(str(tmp_path))
+    assert len(loaded.segments) == 2 and loaded.deleted == {3}
+    for query in ("admission", "ISIC", "dossier candidature"):
+        assert loaded.search(query, k=10) == vector_store.lexical_index.search(query, k=10)
+
+    # Une fusion puis une nouvelle sauvegarde retire les fichiers du segment fusionné
+    vector_store.merge_lexical_index(full=True)
+    vector_store.save(str(tmp_path))
+    assert not list(tmp_path.glob("bm25_seg1_*"))
+    assert len(LexicalIndex.load(str(tmp_path)).segments) == 1
+
+def test_lexical_search_with_filters(make_store):
+    vector_store = make_store(TEXTS)
+    results = vector_store.lexical_search("admission", k=10, filters={"source": "doc3.txt"})
+    assert [doc.id for doc, _ in results] == [3]
+
+def test_hybrid_fusion(make_store):
+    query = np.array([1, 0, 0, 0], dtype='float32')
+    embeddings = [
+        [1, 0, 0, 0],      # 0: premier en vectoriel et en BM25
+        [0.9, 0.1, 0, 0],  # 1: vectoriel seul (pas de terme commun)
+        [0, 1, 0, 0],      # 2: sous le seuil
+        [0, 0, 1, 0],      # 3: BM25 seul
+        [0, 0, 0, 1],
+        [0, 0, 0, 1],
+    ]
+    vector_store = make_store(TEXTS, embeddings)
+    retriever = Retriever(vector_store, top_k=4, score_threshold=0.5, mode='hybrid')
+
+    results = retriever.retrieve("admission concours", query_embedding=query.tolist())
+    ids = [doc.id for doc, _ in results]
+    scores = [score for _, score in results]
+    assert ids[0] == 0 and scores[0] == pytest.approx(1.0)
+    assert set(ids) == {0, 1, 3}  # 2: voisin vectoriel sous le seuil, non promu
+    assert scores == sorted(scores, reverse=True)
+
+    # Sans embedding (service indisponible): BM25 seul
+    lexical_only = retriever.retrieve("admission concours", use_vector=False)
+    assert [doc.id for doc, _ in lexical_only] == [0, 3]
@@ -0,0 +1,132 @@
+"""
+Stockage des conversations: écritures SQL par lots, lecture du tampon, limites
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")  # src.api importe l'application FastAPI
+pytest.importorskip("sqlalchemy")
+
+from src.api.conversation_store import InMemoryConversationStore, SQLConversationStore
+
+@pytest.fixture
+def make_store(tmp_path, monkeypatch):
+    monkeypatch.setenv('CONVERSATION_FLUSH_INTERVAL', '60')  # Écriture au lot plein ou à la fermeture
+    monkeypatch.setenv('CONVERSATION_BATCH_SIZE', '4')
+
+    def make(**kwargs):
+        store = SQLConversationStore(url=f"sqlite:///{tmp_path / 'conversations.db'}", **kwargs)
+        batches = []
+        write = store._write
+
+        def recording_write(rows):
+            batches.append(len(rows))
+            write(rows)
+        store._write = recording_write
+        return store, batches
+    return make
+
+def _contents(history):
+    return [message["content"] for message in history]
+
+async def _wait_for(condition, timeout: float = 5):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition non atteinte")
+        await asyncio.sleep(0.01)
+
+def test_writes_are_batched_and_pending_rows_are_readable(make_store):
+    async def scenario():
+        store, batches = make_store()
+        await store.start()
+        await store.save_exchange("c1", "q1", "r1")
+        # Encore en tampon: lu quand même par ce worker
+        assert batches == []
+        assert _contents(await store.get_history("c1")) == ["q1", "r1"]
+
+        await store.save_exchange("c1", "q2", "r2")  # 4 messages: lot plein
+        await _wait_for(lambda: batches)
+        assert batches == [4] and not store._pending
+        assert _contents(await store.get_history("c1")) == ["q1", "r1", "q2", "r2"]
+
+        await store.append("c2", "user", "autre conversation")
+        await store.close()
+        return batches
+
+    assert asyncio.run(scenario()) == [4, 1]  # Le reste est écrit à la fermeture
+
+    async def reopen():
+        store, _ = make_store()
+        await store.start()
+        try:
+            return await store.get_history("c1", limit=3), await store.get_history("c2")
+        finally:
+            await store.close()
+
+    c1, c2 = asyncio.run(reopen())
+    assert _contents(c1) == ["r1", "q2", "r2"]
+    assert [m["role"] for m in c1] == ["assistant", "user", "assistant"]
+    assert _contents(c2) == ["autre conversation"]
+
+def test_max_messages_trimmed_on_write(make_store):
+    async def scenario():
+        store, _ = make_store(max_messages=3)
+        await store.start()
+        for i in range(5):
+            await store.append("c1", "user", f"m{i}")
+        await store.close()
+
+        store, _ = make_store(max_messages=10)
+        await store.start()
+        try:
+            return await store.get_history("c1")
+        finally:
+            await store.close()
+
+    assert _contents(asyncio.run(scenario())) == ["m2", "m3", "m4"]
+
+def test_failed_batch_is_retried_in_order(make_store):
+    async def scenario():
+        store, batches = make_store()
+        write = store._write
+        failures = [RuntimeError("base indisponible")]
+
+        def flaky_write(rows):
+            if failures:
+                raise failures.pop()
+            write(rows)
+        store._write = flaky_write
+        await store.start()
+
+        for i in range(4):
+            await store.append("c1", "user", f"m{i}")
+        await _wait_for(lambda: not failures)
+        await store.append("c1", "user", "m4")
+        # Le lot refusé est remis en tête du tampon, toujours lisible
+        assert _contents(await store.get_history("c1")) == ["m0", "m1", "m2", "m3", "m4"]
+        await store.close()
+
+        store, _ = make_store()
+        await store.start()
+        try:
+            return await store.get_history("c1")
+        finally:
+            await store.close()
+
+    assert _contents(asyncio.run(scenario())) == ["m0", "m1", "m2", "m3", "m4"]
+
+def test_in_memory_store_bounds():
+    async def scenario():
+        store = InMemoryConversationStore(max_conversations=2, max_messages=2, ttl_seconds=60)
+        for conv_id in ("a", "b", "c"):
+            await store.save_exchange(conv_id, f"q {conv_id}", f"r {conv_id}")
+        await store.append("c", "user", "suite")
+        return store, await store.get_history("a"), await store.get_history("c"), await store.get_history("c", limit=1)
+
+    store, a, c, last = asyncio.run(scenario())
+    assert len(store) == 2 and a == []  # "a", la moins récente, est évincée
+    assert _contents(c) == ["r c", "suite"]
+    assert _contents(last) == ["suite"]
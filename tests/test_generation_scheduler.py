@@ -0,0 +1,141 @@
+"""
+Ordonnanceur des générations: single-flight, file pleine (503), départ du premier demandeur
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")  # src.api importe l'application FastAPI
+
+from src.api import generation_scheduler as scheduler_module
+from src.api.generation_scheduler import GenerationRejected, GenerationScheduler
+
+class FakeOllama:
+    """stream_generate bloqué jusqu'à `release(prompt)`; compte les appels"""
+
+    def __init__(self):
+        self.calls = []
+        self._gates = {}
+
+    def gate(self, prompt: str) -> asyncio.Event:
+        return self._gates.setdefault(prompt, asyncio.Event())
+
+    def release(self, prompt: str):
+        self.gate(prompt).set()
+
+    async def stream_generate(self, prompt: str, options=None):
+        self.calls.append(prompt)
+        await self.gate(prompt).wait()
+        for word in prompt.split():
+            yield {"response": word.upper() + " "}
+
+@pytest.fixture
+def ollama(monkeypatch):
+    fake = FakeOllama()
+    monkeypatch.setattr(scheduler_module.ollama_client, "stream_generate", fake.stream_generate)
+    return fake
+
+async def _answer(scheduler, prompt: str) -> str:
+    flight = await scheduler.submit(prompt)
+    return await flight.text()
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_identical_prompts_share_one_generation(ollama):
+    async def scenario():
+        scheduler = GenerationScheduler(max_concurrent=2, max_queue=0, queue_timeout=5, retry_after=3)
+        answers = [asyncio.create_task(_answer(scheduler, "conditions admission")) for _ in range(3)]
+        await _settle()
+        ollama.release("conditions admission")
+        return await asyncio.gather(*answers), scheduler
+
+    answers, scheduler = asyncio.run(scenario())
+    assert answers == ["CONDITIONS ADMISSION "] * 3
+    assert ollama.calls == ["conditions admission"]
+    assert scheduler.active == 0 and scheduler.waiting == 0 and not scheduler._flights
+
+def test_queue_full_is_rejected_but_identical_prompt_joins(ollama):
+    async def scenario():
+        scheduler = GenerationScheduler(max_concurrent=1, max_queue=1, queue_timeout=5, retry_after=7)
+        running = asyncio.create_task(_answer(scheduler, "a"))
+        queued = asyncio.create_task(_answer(scheduler, "b"))
+        await _settle()
+        assert scheduler.active == 1 and scheduler.waiting == 1
+
+        with pytest.raises(GenerationRejected) as rejected:
+            await scheduler.submit("c")
+        joined = asyncio.create_task(_answer(scheduler, "b"))  # File pleine, mais génération déjà en attente
+
+        ollama.release("a")
+        ollama.release("b")
+        return rejected.value, await asyncio.gather(running, queued, joined)
+
+    rejection, answers = asyncio.run(scenario())
+    assert rejection.reason == "queue_full" and rejection.retry_after == 7
+    assert answers == ["A ", "B ", "B "]
+    assert ollama.calls == ["a", "b"]
+
+def test_queue_timeout_rejects_every_waiting_request(ollama):
+    async def scenario():
+        scheduler = GenerationScheduler(max_concurrent=1, max_queue=4, queue_timeout=0.05, retry_after=2)
+        running = asyncio.create_task(_answer(scheduler, "a"))
+        await _settle()
+        waiting = [asyncio.create_task(_answer(scheduler, "b")) for _ in range(2)]
+        results = await asyncio.gather(*waiting, return_exceptions=True)
+        ollama.release("a")
+        await running
+        return results, scheduler
+
+    results, scheduler = asyncio.run(scenario())
+    assert all(isinstance(r, GenerationRejected) and r.reason == "queue_timeout" for r in results)
+    assert "b" not in ollama.calls
+    assert scheduler.waiting == 0 and not scheduler._flights
+
+def test_leader_disconnect_keeps_joined_requests_queued(ollama):
+    async def scenario():
+        scheduler = GenerationScheduler(max_concurrent=1, max_queue=2, queue_timeout=5, retry_after=2)
+        running = asyncio.create_task(_answer(scheduler, "a"))
+        await _settle()
+        leader = asyncio.create_task(_answer(scheduler, "b"))
+        await _settle()
+        joined = asyncio.create_task(_answer(scheduler, "b"))
+        await _settle()
+
+        leader.cancel()  # Client parti pendant l'attente
+        await _settle()
+        assert scheduler.waiting == 1  # La génération garde sa place pour `joined`
+
+        ollama.release("a")
+        ollama.release("b")
+        await running
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await joined
+
+    assert asyncio.run(scenario()) == "B "
+    assert ollama.calls == ["a", "b"]
+
+def test_last_subscriber_leaving_frees_the_queue_slot(ollama):
+    async def scenario():
+        scheduler = GenerationScheduler(max_concurrent=1, max_queue=1, queue_timeout=5, retry_after=2)
+        running = asyncio.create_task(_answer(scheduler, "a"))
+        await _settle()
+        queued = asyncio.create_task(_answer(scheduler, "b"))
+        await _settle()
+        queued.cancel()
+        await _settle()
+        waiting_after_cancel = scheduler.waiting
+
+        follower = asyncio.create_task(_answer(scheduler, "c"))  # La place libérée est réutilisable
+        ollama.release("a")
+        ollama.release("c")
+        await running
+        return waiting_after_cancel, await follower
+
+    waiting_after_cancel, answer = asyncio.run(scenario())
+    assert waiting_after_cancel == 0
+    assert answer == "C "
+    assert "b" not in ollama.calls
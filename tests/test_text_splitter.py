@@ -0,0 +1,87 @@
+"""
+Découpage structuré et fixe: validation du recouvrement, positions (start_index), tailles
+"""
+
+import pytest
+
+from src.rag.document_loader import Document
+from src.rag.text_splitter import TextSplitter
+
+SENTENCES = [
+    "L'admission au cycle ingénieur se fait sur concours national.",
+    "Les candidats déposent leur dossier en ligne avant la date limite.",
+    "Le règlement pédagogique fixe la validation des modules.",
+    "Une absence non justifiée entraîne la note zéro au contrôle.",
+    "La session de rattrapage concerne les modules non validés.",
+]
+
+def _text(paragraphs: int = 12) -> str:
+    parts = []
+    for p in range(paragraphs):
+        if p % 4 == 0:
+            parts.append(f"ARTICLE {p // 4 + 1}")
+        parts.append(" ".join(SENTENCES[(p + i) % len(SENTENCES)] for i in range(3)))
+    # Une unité sans frontière plus longue que chunk_size
+    parts.append("x" * 120 + " " + "y" * 400)
+    return "\n\n".join(parts)
+
+@pytest.mark.parametrize("overlap", [-1, 300, 400])
+def test_invalid_overlap(overlap):
+    with pytest.raises(ValueError):
+        TextSplitter(chunk_size=300, chunk_overlap=overlap)
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        TextSplitter(chunk_size=300, chunk_overlap=0, mode="semantic")
+
+@pytest.mark.parametrize("mode", ["structured", "fixed"])
+@pytest.mark.parametrize("overlap", [0, 60])
+def test_start_index_and_sizes(mode, overlap):
+    text = _text()
+    splitter = TextSplitter(chunk_size=300, chunk_overlap=overlap, mode=mode)
+    chunks = splitter.split_documents([Document(text, {"source": "reglement.txt"})])
+
+    assert len(chunks) > 3
+    covered = set()
+    for i, chunk in enumerate(chunks):
+        start = chunk.metadata["start_index"]
+        assert text[start:start + len(chunk.page_content)] == chunk.page_content
+        assert chunk.page_content == chunk.page_content.strip()
+        assert len(chunk.page_content) <= 300
+        assert chunk.metadata["chunk_id"] == i
+        assert chunk.metadata["total_chunks"] == len(chunks)
+        assert chunk.metadata["source"] == "reglement.txt"
+        covered.update(range(start, start + len(chunk.page_content)))
+    # Tout le texte (hors espaces) est couvert
+    assert all(i in covered for i, c in enumerate(text) if not c.isspace())
+
+    starts = [chunk.metadata["start_index"] for chunk in chunks]
+    assert starts == sorted(starts)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        shared = previous.metadata["start_index"] + len(previous.page_content) - chunk.metadata["start_index"]
+        assert shared <= overlap
+
+def test_structured_overlap_and_headings():
+    text = _text()
+    chunks = TextSplitter(chunk_size=300, chunk_overlap=100, mode="structured").split_documents([Document(text, {})])
+
+    # Le recouvrement reprend des phrases entières
+    overlapping = [
+        (previous, chunk) for previous, chunk in zip(chunks, chunks[1:])
+        if chunk.metadata["start_index"] < previous.metadata["start_index"] + len(previous.page_content)
+    ]
+    assert overlapping
+    for _, chunk in overlapping:
+        assert chunk.page_content[0].isupper()
+
+    # Chaque titre (sauf le premier, qui ouvre le texte) commence un chunk
+    for n in (2, 3):
+        assert any(chunk.page_content.startswith(f"ARTICLE {n}") for chunk in chunks)
+
+def test_iter_chunks_matches_split_documents():
+    documents = [Document(_text(4), {"source": "a.txt"}), Document(_text(6), {"source": "b.txt"})]
+    splitter = TextSplitter(chunk_size=250, chunk_overlap=50)
+    streamed = list(splitter.iter_chunks(documents))
+    split = splitter.split_documents(documents)
+    assert [(c.page_content, c.metadata["start_index"]) for c in streamed] == \
+        [(c.page_content, c.metadata["start_index"]) for c in split]
@@ -0,0 +1,69 @@
+"""
+Recherches après suppression et recherches filtrées pour chaque type d'index × encodage
+"""
+
+import numpy as np
+import pytest
+
+from src.rag.document_loader import Document
+from src.rag.index_factory import INDEX_TYPES, STORAGE_MODES
+from src.rag.vector_store import VectorStore
+
+N_VECTORS = 12_000  # Au-delà de MIN_TRAINING_VECTORS: IVF et PQ sont vraiment entraînés
+DIMENSION = 16
+
+class NoEmbeddings:
+    """Les tests fournissent les embeddings"""
+    model_name = "test"
+    cache = None
+
+    def embed_query(self, text):
+        raise RuntimeError("embeddings fournis par le test")
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(N_VECTORS, DIMENSION)).astype('float32')
+    documents = [
+        Document(f"chunk {i}", {"source": f"doc{i % 20}.pdf", "category": "a" if i % 2 else "b"})
+        for i in range(N_VECTORS)
+    ]
+    return documents, embeddings
+
+@pytest.fixture(
+    scope="module",
+    params=[(t, s) for t in INDEX_TYPES if t != 'auto' for s in STORAGE_MODES],
+    ids=lambda param: "-".join(param)
+)
+def store(request, corpus):
+    """Un store par couple (type, encodage), partagé par les tests (ids supprimés distincts)"""
+    index_type, storage = request.param
+    documents, embeddings = corpus
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv('VECTOR_STORAGE', storage)
+        monkeypatch.setenv('VECTOR_INDEX_PQ_M', '2')  # Entraînement PQ rapide
+        monkeypatch.setenv('LEXICAL_INDEX_ENABLED', 'False')
+        vector_store = VectorStore(NoEmbeddings(), dimension=DIMENSION, index_type=index_type)
+        vector_store.add_documents(documents, embeddings.tolist())
+    return vector_store
+
+def _search(vector_store, embeddings, row, **kwargs):
+    results = vector_store.similarity_search("", k=5, query_embedding=embeddings[row].tolist(), **kwargs)
+    return [doc.id for doc, _ in results]
+
+def test_search_after_delete(store, corpus):
+    _, embeddings = corpus
+    assert _search(store, embeddings, 42)[0] == 42
+
+    store.delete([42, 43])
+    found = _search(store, embeddings, 42)
+    assert found and 42 not in found and 43 not in found
+
+def test_large_filtered_search(store, corpus):
+    _, embeddings = corpus
+    store.filter_exact_max = 100  # Forcer le filtre par bitmap pendant le parcours de l'index
+    store.delete([7])
+
+    found = _search(store, embeddings, 8, filters={"category": "b"})
+    assert found and found[0] == 8
+    assert all(store.docstore.get(doc_id).metadata["category"] == "b" for doc_id in found)